@@ -0,0 +1,143 @@
+"""Contadores do painel (progresso, status, responsáveis), mantidos por delta.
+
+Em vez de somar as etapas de todos os estabelecimentos a cada rerun, o app
+guarda estes totais junto com os dados e, a cada save, tira a contribuição
+da versão anterior do registro e soma a da nova. A recontagem completa
+(`de_registros`) só roda para conferir o que veio do disco/GitHub.
+
+Formato persistido (chave "agregados" do documento):
+
+    {"meta": 20, "total": 12, "etapas": {"Captação": 3, ...},
+     "status": {"Pendente": 9, ...}, "responsaveis": {"Neo": {"total": 4, "concluidos": 1}}}
+"""
+
+from models import ETAPAS_PADRAO
+
+META_PADRAO = 20
+
+
+def _incrementar(contagem: dict, chave: str, delta: int) -> None:
+    valor = contagem.get(chave, 0) + delta
+    if valor:
+        contagem[chave] = valor
+    else:
+        contagem.pop(chave, None)
+
+
+class Agregados:
+    def __init__(self, meta: int = META_PADRAO) -> None:
+        self.meta = meta
+        self.total = 0
+        self.etapas: dict[str, int] = {}
+        self.status: dict[str, int] = {}
+        self.responsaveis: dict[str, dict[str, int]] = {}
+
+    @classmethod
+    def de_registros(cls, data: list[dict], meta: int = META_PADRAO) -> "Agregados":
+        """Recontagem completa (O(n))."""
+        agregados = cls(meta)
+        for item in data:
+            agregados.adicionar(item)
+        return agregados
+
+    def adicionar(self, item: dict | None, sinal: int = 1) -> None:
+        if not isinstance(item, dict):
+            return
+        self.total += sinal
+        for etapa, feito in (item.get("etapas") or {}).items():
+            if feito:
+                _incrementar(self.etapas, etapa, sinal)
+        status = item.get("status") or "Pendente"
+        _incrementar(self.status, status, sinal)
+        responsavel = (item.get("responsavel") or "").strip()
+        por_resp = self.responsaveis.setdefault(responsavel, {"total": 0, "concluidos": 0})
+        por_resp["total"] += sinal
+        if status == "Concluído":
+            por_resp["concluidos"] += sinal
+        if not por_resp["total"]:
+            del self.responsaveis[responsavel]
+
+    def atualizar(self, anterior: dict | None, novo: dict | None) -> None:
+        """Troca a contribuição de `anterior` pela de `novo` (None = inexistente)."""
+        self.adicionar(anterior, -1)
+        self.adicionar(novo)
+
+    def atualizar_lista(self, anteriores: list[dict] | None, novos: list[dict]) -> None:
+        """Aplica a diferença entre duas versões da lista (por id).
+
+        Sem `anteriores` não há base para o delta: recomeça do zero.
+        """
+        if anteriores is None:
+            recontado = Agregados.de_registros(novos, self.meta)
+            self.total, self.etapas = recontado.total, recontado.etapas
+            self.status, self.responsaveis = recontado.status, recontado.responsaveis
+            return
+        por_id = {item.get("id"): item for item in anteriores if isinstance(item, dict)}
+        for item in novos:
+            if not isinstance(item, dict):
+                continue
+            anterior = por_id.pop(item.get("id"), None)
+            if anterior is None or anterior != item:
+                self.atualizar(anterior, item)
+        for removido in por_id.values():
+            self.adicionar(removido, -1)
+
+    # Leituras O(1) (ou O(etapas)) para o painel
+
+    @property
+    def etapas_concluidas(self) -> int:
+        return sum(self.etapas.values())
+
+    @property
+    def meta_total_etapas(self) -> int:
+        return self.meta * len(ETAPAS_PADRAO)
+
+    @property
+    def concluidos(self) -> int:
+        return self.status.get("Concluído", 0)
+
+    @property
+    def progresso(self) -> float:
+        total = self.meta_total_etapas
+        return min(self.etapas_concluidas / total, 1.0) if total > 0 else 0.0
+
+    def contagens(self) -> dict:
+        return {
+            "total": self.total,
+            "etapas": dict(self.etapas),
+            "status": dict(self.status),
+            "responsaveis": {k: dict(v) for k, v in self.responsaveis.items()},
+        }
+
+    def to_dict(self) -> dict:
+        return {"meta": self.meta, **self.contagens()}
+
+    @classmethod
+    def from_dict(cls, d: dict | None, meta: int = META_PADRAO) -> "Agregados | None":
+        if not isinstance(d, dict):
+            return None
+        agregados = cls(int(d.get("meta") or meta))
+        agregados.total = int(d.get("total") or 0)
+        agregados.etapas = {k: int(v) for k, v in (d.get("etapas") or {}).items()}
+        agregados.status = {k: int(v) for k, v in (d.get("status") or {}).items()}
+        agregados.responsaveis = {
+            k: {"total": int(v.get("total") or 0), "concluidos": int(v.get("concluidos") or 0)}
+            for k, v in (d.get("responsaveis") or {}).items()
+        }
+        return agregados
+
+    def copy(self) -> "Agregados":
+        return Agregados.from_dict(self.to_dict(), self.meta)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Agregados) and self.to_dict() == other.to_dict()
+
+
+def verificar(data: list[dict], salvos: dict | None, meta: int = META_PADRAO) -> tuple[Agregados, bool]:
+    """Confere os agregados salvos contra uma recontagem.
+
+    Retorna (agregados corretos, batia). A meta salva é mantida.
+    """
+    guardados = Agregados.from_dict(salvos, meta)
+    recontado = Agregados.de_registros(data, guardados.meta if guardados else meta)
+    return recontado, guardados is not None and guardados == recontado
@@ -1,15 +1,32 @@
-import json
 import os
+import threading
 import uuid
-import base64
-import urllib.error
-import urllib.parse
-import urllib.request
-from datetime import datetime
+from collections import deque
+from datetime import date, datetime
+from typing import NamedTuple
 
 import pandas as pd
 import streamlit as st
 
+import datahora
+import exportacoes
+import importar
+from agregados import Agregados, verificar
+from busca import IndiceBusca
+from github_client import API_URL, GithubClient
+from models import ETAPAS_PADRAO
+from storage import (
+    GithubStorage,
+    GithubSyncWorker,
+    ShardedGithubStorage,
+    Storage,
+    backend_from_env,
+    create_storage,
+    document_meta,
+    from_document,
+    to_document,
+)
+
 # Usuários hard-coded (simples / uso interno)
 USUARIOS = {
     "Neo": "pedeja2025",
@@ -22,16 +39,35 @@ os.makedirs(DATA_DIR, exist_ok=True)
 
 DATA_FILE = os.path.join(DATA_DIR, "dados.json")
 
+# Backend local: json (padrão), journal ou sqlite (ver storage.py). Com
+# DATA_JOURNAL=true, cada alteração vira uma linha em dados.journal.jsonl e o
+# dados.json só é reescrito na compactação (ver journal.py)
+DATA_BACKEND, DATA_JOURNAL_MAX_BYTES = backend_from_env()
+
 # Persistência opcional via GitHub (útil em hosts com disco efêmero, ex: Render Free)
 GITHUB_SYNC = (os.environ.get("GITHUB_SYNC") or "").strip().lower() in {"1", "true", "yes"}
 GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN") or ""
 GITHUB_REPO = (os.environ.get("GITHUB_REPO") or "").strip()  # ex: "projetoescolaparatodos/pedegenda"
 GITHUB_BRANCH = (os.environ.get("GITHUB_BRANCH") or "main").strip() or "main"
 GITHUB_DATA_PATH = (os.environ.get("GITHUB_DATA_PATH") or "dados.json").lstrip("/")
+# Se definido (ex: "dados"), grava um arquivo por estabelecimento nesse diretório
+# em vez do GITHUB_DATA_PATH único (que só é lido uma vez, para migrar)
+GITHUB_SHARD_DIR = (os.environ.get("GITHUB_SHARD_DIR") or "").strip().strip("/")
+# Permite apontar para um servidor local que imite a API (testes/benchmarks)
+GITHUB_API_URL = (os.environ.get("GITHUB_API_URL") or API_URL).strip().rstrip("/")
+# Saves são juntados e enviados em um commit a cada N segundos (em segundo plano)
+GITHUB_SYNC_INTERVAL = float(os.environ.get("GITHUB_SYNC_INTERVAL") or 10)
 
-_github_last_sha: str | None = None
+# Meta de estabelecimentos do painel (só vale até alguém mudar na tela; depois
+# fica salva junto com os dados)
+META_ESTABELECIMENTOS = max(1, int(os.environ.get("META_ESTABELECIMENTOS") or 20))
 
-ETAPAS_PADRAO = ["Captação", "Cadastro Produtos", "Vinculação Conta"]
+# Estabelecimentos por página na lista (só a página visível cria widgets)
+PAGE_SIZE = max(1, int(os.environ.get("PAGE_SIZE") or 25))
+PAGE_SIZE_OPCOES = sorted({10, 25, 50, 100, PAGE_SIZE})
+
+# De quantos em quantos segundos cada sessão confere se outra sessão salvou algo (0 = não confere)
+ATUALIZAR_A_CADA = float(os.environ.get("ATUALIZAR_A_CADA") or 10)
 
 
 def _rerun() -> None:
@@ -41,102 +77,283 @@ def _rerun() -> None:
     st.experimental_rerun()
 
 
-def _github_api_request(url: str, method: str = "GET", payload: dict | None = None) -> dict:
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "User-Agent": "pedegenda",
-    }
-    if GITHUB_TOKEN:
-        headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
+_MISSAO_FEITA = {"feito", "concluído", "concluido"}
 
-    data_bytes = None
-    if payload is not None:
-        data_bytes = json.dumps(payload).encode("utf-8")
-        headers["Content-Type"] = "application/json"
 
-    req = urllib.request.Request(url=url, method=method, headers=headers, data=data_bytes)
-    try:
-        with urllib.request.urlopen(req, timeout=20) as resp:
-            body = resp.read().decode("utf-8")
-            return json.loads(body) if body else {}
-    except urllib.error.HTTPError as e:
-        try:
-            details = e.read().decode("utf-8")
-        except Exception:
-            details = ""
-        raise RuntimeError(f"GitHub API error {e.code}: {details or e.reason}")
+def _missao_feita(m: dict) -> bool:
+    return (m.get("status", "Pendente") or "Pendente").strip().lower() in _MISSAO_FEITA
 
 
-def github_load_json() -> list[dict] | None:
-    """Carrega dados do GitHub (Contents API). Retorna None se não existir."""
-    global _github_last_sha
+class _ResumoCard(NamedTuple):
+    """O que o card fechado mostra (sem copiar nem percorrer as missões de novo)."""
 
-    if not (GITHUB_SYNC and GITHUB_TOKEN and GITHUB_REPO):
-        return None
+    local: str
+    data_hora: str
+    status: str
+    missoes: int
+    pendentes: int
+    # data_hora da próxima missão pendente com data ("" se nenhuma)
+    proxima: str
 
-    encoded_path = urllib.parse.quote(GITHUB_DATA_PATH)
-    url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{encoded_path}?ref={urllib.parse.quote(GITHUB_BRANCH)}"
-    try:
-        resp = _github_api_request(url, method="GET")
-    except RuntimeError as e:
-        # 404 = arquivo não existe ainda
-        if "404" in str(e):
+
+def _resumir(item: dict) -> _ResumoCard:
+    missoes = item.get("missoes") or []
+    pendentes = [m for m in missoes if isinstance(m, dict) and not _missao_feita(m)]
+    datadas = [
+        (m.get("data_hora_iso") if m.get("data_hora_iso") is not None else datahora.normalizar(m.get("data_hora"))[0], i)
+        for i, m in enumerate(pendentes)
+    ]
+    datadas = [d for d in datadas if d[0]]
+    proxima = pendentes[min(datadas)[1]].get("data_hora", "") if datadas else ""
+    return _ResumoCard(
+        item.get("local", ""),
+        item.get("data_hora", ""),
+        item.get("status", "Pendente"),
+        len(missoes),
+        len(pendentes),
+        proxima,
+    )
+
+
+class _DataCache:
+    """Cache compartilhado (entre sessões e reruns) do que o load_data() já leu.
+
+    O Streamlit reexecuta este script a cada interação, então variáveis globais
+    do módulo não sobrevivem entre reruns; por isso o cache vive em
+    st.cache_resource. Guarda os dados já migrados junto com o "validador" de
+    cada origem: file_key() do backend local (ex: mtime/tamanho do dados.json)
+    e o sha do GitHub (o ETag de cada GET fica no GithubClient).
+
+    É também o estado compartilhado entre as sessões do processo: `local_data`
+    é a lista canônica, toda edição passa pelo `lock` e gera uma nova `versao`,
+    e `mudancas` lembra quais ids mudaram em cada versão (ver mudou_desde()).
+    """
+
+    # Versões lembradas em `mudancas`; quem ficou mais para trás recarrega tudo
+    HISTORICO = 512
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.local_key: tuple | None = None
+        self.local_data: list[dict] | None = None
+        # Contadores do painel, sempre correspondentes a `local_data`
+        self.agregados: Agregados | None = None
+        # Sobe a cada troca de `local_data`; valida o que é derivado dela
+        self.versao = 0
+        # (versao, ids alterados ou None = tudo)
+        self.mudancas: deque[tuple[int, frozenset[str] | None]] = deque(maxlen=self.HISTORICO)
+        # (versao, lista ordenada por data/hora) — ver registros_ordenados()
+        self.ordenados: tuple[int, list[dict]] | None = None
+        # (versao, visão geral, missões) — ver overview_tables()
+        self.tabelas: tuple[int, pd.DataFrame, pd.DataFrame] | None = None
+        # id -> posição em `local_data` (refeito quando a lista é trocada)
+        self.indice: dict[str, int] = {}
+        self.indice_de: list[dict] | None = None
+        # id -> resumo do card fechado (descartado quando o registro muda)
+        self.resumos: dict[str, _ResumoCard] = {}
+        # Busca por texto sobre `busca_de` (atualizada por registro nos saves)
+        self.busca: IndiceBusca | None = None
+        self.busca_de: list[dict] | None = None
+
+    def posicoes(self, records: list[dict]) -> dict[str, int]:
+        """Índice id -> posição de `records`. Chamar com `lock` na mão."""
+        if self.indice_de is not records:
+            self.indice = {
+                item.get("id"): i for i, item in enumerate(records) if isinstance(item, dict)
+            }
+            self.indice_de = records
+        return self.indice
+
+    def nova_versao(self, ids: frozenset[str] | None) -> None:
+        """Registra uma troca de `local_data` (`ids` alterados; None = tudo). Chamar com `lock` na mão."""
+        self.versao += 1
+        self.mudancas.append((self.versao, ids))
+        if ids is None:
+            self.resumos.clear()
+        else:
+            for est_id in ids:
+                self.resumos.pop(est_id, None)
+
+    def mudou_desde(self, versao: int) -> set[str] | None:
+        """Ids alterados depois de `versao` (vazio = nada); None = recarregar tudo.
+
+        Chamar com `lock` na mão.
+        """
+        if versao == self.versao:
+            return set()
+        if versao > self.versao or not self.mudancas or self.mudancas[0][0] > versao + 1:
             return None
-        raise
+        ids: set[str] = set()
+        for v, alterados in reversed(self.mudancas):
+            if v <= versao:
+                break
+            if alterados is None:
+                return None
+            ids |= alterados
+        return ids
+
+    def indice_busca(self, records: list[dict]) -> IndiceBusca:
+        """Índice de busca de `records` (montado na 1ª vez). Chamar com `lock` na mão."""
+        if self.busca is None or self.busca_de is not records:
+            self.busca = IndiceBusca.de_registros(records)
+            self.busca_de = records
+        return self.busca
+
+
+@st.cache_resource(show_spinner=False)
+def _data_cache() -> _DataCache:
+    return _DataCache()
+
+
+@st.cache_resource(show_spinner=False)
+def _storage() -> Storage:
+    return create_storage(
+        DATA_BACKEND, DATA_DIR, SCHEMA_VERSION, journal_max_bytes=DATA_JOURNAL_MAX_BYTES
+    )
 
-    _github_last_sha = resp.get("sha")
-    content_b64 = (resp.get("content") or "").encode("utf-8")
-    if not content_b64:
-        return None
 
-    decoded = base64.b64decode(content_b64).decode("utf-8")
-    return json.loads(decoded)
+@st.cache_resource(show_spinner=False)
+def _github() -> GithubStorage | ShardedGithubStorage:
+    client = GithubClient(GITHUB_TOKEN, base_url=GITHUB_API_URL)
+    single = GithubStorage(client, GITHUB_REPO, branch=GITHUB_BRANCH, path=GITHUB_DATA_PATH)
+    if GITHUB_SHARD_DIR:
+        return ShardedGithubStorage(
+            client, GITHUB_REPO, branch=GITHUB_BRANCH, directory=GITHUB_SHARD_DIR, legacy=single
+        )
+    return single
+
+
+@st.cache_resource(show_spinner=False)
+def _github_sync() -> GithubSyncWorker:
+    return GithubSyncWorker(_github(), interval=GITHUB_SYNC_INTERVAL)
+
 
+@st.cache_resource(show_spinner=False)
+def _exportador() -> exportacoes.Exportador:
+    return exportacoes.Exportador()
 
-def github_save_json(data: list[dict], commit_message: str) -> None:
-    """Salva dados no GitHub (Contents API)."""
-    global _github_last_sha
+
+def _copy_records(data: list[dict]) -> list[dict]:
+    """Cópia estrutural barata (strings são imutáveis; só dicts/listas são copiados).
+
+    O main_ui altera os registros in-place, então nunca devolvemos os objetos
+    do cache diretamente para uma sessão.
+    """
+
+    copied = []
+    for item in data:
+        if not isinstance(item, dict):
+            copied.append(item)
+            continue
+        novo = dict(item)
+        if isinstance(novo.get("etapas"), dict):
+            novo["etapas"] = dict(novo["etapas"])
+        if isinstance(novo.get("missoes"), list):
+            novo["missoes"] = [dict(m) if isinstance(m, dict) else m for m in novo["missoes"]]
+        copied.append(novo)
+    return copied
+
+
+def github_save_json(data: list[dict]) -> None:
+    """Agenda o envio dos dados ao GitHub (Contents API) e retorna na hora."""
 
     if not (GITHUB_SYNC and GITHUB_TOKEN and GITHUB_REPO):
         return
 
-    encoded_path = urllib.parse.quote(GITHUB_DATA_PATH)
-    url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{encoded_path}"
-    payload = {
-        "message": commit_message,
-        "content": base64.b64encode(json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")).decode("utf-8"),
-        "branch": GITHUB_BRANCH,
-    }
-    if _github_last_sha:
-        payload["sha"] = _github_last_sha
+    cache = _data_cache()
+    with cache.lock:
+        meta = _document_meta(cache)
+    # `data` é o que o GitHub vai ter quando o worker terminar, e é também o
+    # local_data do cache: o próximo GET vem completo (ETag novo), mas como o
+    # sha bate com o do worker, o load_data() usa o cache sem decodificar nada.
+    _github_sync().submit(to_document(data, SCHEMA_VERSION, meta))
+
+
+def sincronizar_github() -> list[dict] | None:
+    """Traz para o cache compartilhado o que mudou no GitHub (GITHUB_SYNC).
+
+    Retorna os registros só quando chega um documento novo. Sha igual (304),
+    envio pendente, GitHub desligado ou falha: None, sem montar registro
+    nenhum (o cache já tem o que o GitHub tem).
+    """
+
+    if not GITHUB_SYNC:
+        return None
+    if not (GITHUB_TOKEN and GITHUB_REPO):
+        st.warning(
+            "GITHUB_SYNC está ligado, mas faltam GITHUB_TOKEN e/ou GITHUB_REPO. "
+            "O app vai usar apenas o arquivo local."
+        )
+        return None
+    worker = _github_sync()
+    if worker.busy:
+        # Com envio pendente, o local é mais novo que o GitHub: nem consulta
+        return None
 
-    resp = _github_api_request(url, method="PUT", payload=payload)
-    _github_last_sha = (resp.get("content") or {}).get("sha") or _github_last_sha
+    cache = _data_cache()
+    try:
+        with cache.lock:
+            # Depois de um merge com conflito o GitHub tem o que o
+            # cache não tem: relê inteiro mesmo com o sha igual
+            reusar = cache.local_data is not None and not worker.needs_reload
+            known_sha = worker.sha if reusar else None
+        snap = _github().load(known_sha=known_sha)
+        # snap.data None = sha igual: o local_data do cache é o que o GitHub tem.
+        # busy de novo: alguém salvou durante o GET; o local é mais novo e não
+        # pode ser sobrescrito pelo que veio.
+        if snap is None or snap.data is None or worker.busy:
+            return None
+        worker.set_remote(snap.sha, snap.data)
+        gh, dirty = migrate_data(*from_document(snap.data))
+        # Conferência: os agregados que vieram batem com os registros?
+        agregados, _ = verificar(gh, document_meta(snap.data).get("agregados"), META_ESTABELECIMENTOS)
+        # O GitHub é a fonte: o arquivo local só espelha. Commit
+        # de volta apenas se a migração realmente mudou algo.
+        if dirty:
+            save_data(gh, agregados)
+        else:
+            _save_local(gh, agregados)
+        return gh
+    except Exception as e:
+        st.warning(f"Falha ao carregar do GitHub, usando arquivo local. ({e})")
+        return None
 
 
 def load_data() -> list[dict]:
+    cache = _data_cache()
+
     # 1) Tenta GitHub (se habilitado) — útil em host com disco efêmero
-    if GITHUB_SYNC:
-        if not (GITHUB_TOKEN and GITHUB_REPO):
-            st.warning(
-                "GITHUB_SYNC está ligado, mas faltam GITHUB_TOKEN e/ou GITHUB_REPO. "
-                "O app vai usar apenas o arquivo local."
-            )
+    gh = sincronizar_github()
+    if gh is not None:
+        return gh
+
+    # 2) Backend local (com o GitHub inalterado, é o espelho do que está lá)
+    storage = _storage()
+    key = storage.file_key()
+    if key is not None:
+        with cache.lock:
+            if key == cache.local_key and cache.local_data is not None:
+                return _copy_records(cache.local_data)
+
+    loaded = storage.load()
+    if loaded is not None:
+        data, dirty = migrate_data(*loaded)
+        # Única recontagem completa: conferir os agregados salvos com o que foi lido
+        agregados, conferem = verificar(data, storage.meta.get("agregados"), META_ESTABELECIMENTOS)
+        if dirty:
+            with cache.lock:
+                # Migração regrava tudo (não vira diário/UPDATEs incrementais)
+                cache.local_data = None
+            save_data(data, agregados)
         else:
-            try:
-                gh = github_load_json()
-                if gh is not None:
-                    gh = migrate_data(gh)
-                    save_data(gh)
-                    return gh
-            except Exception as e:
-                st.warning(f"Falha ao carregar do GitHub, usando arquivo local. ({e})")
-
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        data = migrate_data(data)
-        save_data(data)
+            with cache.lock:
+                cache.local_key = key if key is not None else storage.file_key()
+                cache.local_data = _copy_records(data)
+                cache.nova_versao(None)
+                cache.agregados = agregados
+            if not conferem:
+                # Faltavam (arquivo antigo) ou estavam errados: regrava só o meta
+                _save_local(data, agregados)
         return data
 
     initial_data = [
@@ -262,99 +479,472 @@ def load_data() -> list[dict]:
         },
     ]
 
-    initial_data = migrate_data(initial_data)
+    initial_data, _ = migrate_data(initial_data)
     save_data(initial_data)
     return initial_data
 
 
-def save_data(data: list[dict]) -> None:
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def _document_meta(cache: _DataCache) -> dict:
+    """Resto do documento salvo junto com os registros. Chamar com `cache.lock`."""
+    return {"agregados": cache.agregados.to_dict()} if cache.agregados is not None else {}
+
+
+def _ids_alterados(anteriores: list[dict] | None, novos: list[dict]) -> frozenset[str] | None:
+    """Ids incluídos, removidos ou diferentes entre as duas listas (None = sem base)."""
+    if anteriores is None:
+        return None
+    por_id = {item.get("id"): item for item in anteriores if isinstance(item, dict)}
+    ids = set()
+    for item in novos:
+        if isinstance(item, dict) and por_id.pop(item.get("id"), None) != item:
+            ids.add(item.get("id"))
+    ids.update(por_id)
+    return frozenset(ids)
+
+
+def _save_local(data: list[dict], agregados: Agregados | None = None) -> list[dict]:
+    """Grava a lista inteira. `agregados`, se vier, já corresponde a `data`.
 
-    # Também salva no GitHub (se habilitado)
+    Retorna a cópia gravada (a lista do cache, que ninguém altera).
+    """
+
+    cache = _data_cache()
+    snapshot = _copy_records(data)
+
+    with cache.lock:
+        _gravar_local(cache, snapshot, agregados)
+    return snapshot
+
+
+def _gravar_local(cache: _DataCache, snapshot: list[dict], agregados: Agregados | None = None) -> None:
+    """Corpo do _save_local: `snapshot` passa a ser a lista do cache. Chamar com `lock` na mão."""
+
+    if agregados is None:
+        agregados = cache.agregados.copy() if cache.agregados else Agregados(META_ESTABELECIMENTOS)
+        # Delta contra o último estado salvo (sem ele, reconta)
+        base = cache.local_data if cache.agregados is not None else None
+        agregados.atualizar_lista(base, snapshot)
+
+    # Com o último estado salvo em mãos, journal/sqlite gravam só a diferença
+    storage = _storage()
+    storage.meta = {"agregados": agregados.to_dict()}
+    storage.save(snapshot, previous=cache.local_data)
+
+    # O que acabamos de gravar já está em memória: atualiza o cache para o
+    # próximo load_data() não precisar reler/parsear o arquivo.
+    cache.local_key = storage.file_key()
+    if cache.busca is not None and cache.busca_de is cache.local_data is not None:
+        cache.busca.atualizar_lista(cache.local_data, snapshot)
+        cache.busca_de = snapshot
+    cache.nova_versao(_ids_alterados(cache.local_data, snapshot))
+    cache.local_data = snapshot
+    cache.agregados = agregados
+
+
+def save_data(data: list[dict], agregados: Agregados | None = None) -> None:
+    snapshot = _save_local(data, agregados)
+
+    # Também salva no GitHub (se habilitado) — em segundo plano, ver GithubSyncWorker.
+    # Vai a cópia do cache: quem chamou pode continuar alterando `data`.
     if GITHUB_SYNC and GITHUB_TOKEN and GITHUB_REPO:
-        try:
-            github_save_json(data, commit_message="Update dados.json")
-        except Exception as e:
-            # Não quebra o app por falha de rede/token; só avisa.
-            st.warning(f"Falha ao salvar no GitHub (dados locais ok). ({e})")
+        github_save_json(snapshot)
+
+
+def _records_atuais() -> list[dict]:
+    """Lista em cache (sem cópia; não alterar), relida se o backend mudou."""
+    cache = _data_cache()
+    key = _storage().file_key()
+    with cache.lock:
+        if key is not None and key == cache.local_key and cache.local_data is not None:
+            return cache.local_data
+    load_data()
+    with cache.lock:
+        return cache.local_data if cache.local_data is not None else []
+
+
+def load_record(est_id: str) -> dict | None:
+    """Um estabelecimento (cópia) pelo id, sem copiar a lista inteira.
+
+    Usa o espelho local: mudanças feitas direto no GitHub só aparecem no
+    próximo load_data() (rerun completo da página).
+    """
+
+    records = _records_atuais()
+    cache = _data_cache()
+    with cache.lock:
+        pos = cache.posicoes(records).get(est_id)
+        item = records[pos] if pos is not None else None
+    return _copy_records([item])[0] if item is not None else None
+
+
+def resumo_card(est_id: str) -> _ResumoCard | None:
+    """Cabeçalho do card (local, data, status e resumo das missões), sem cópia."""
+    records = _records_atuais()
+    cache = _data_cache()
+    with cache.lock:
+        resumo = cache.resumos.get(est_id)
+        if resumo is None:
+            pos = cache.posicoes(records).get(est_id)
+            if pos is None:
+                return None
+            resumo = cache.resumos[est_id] = _resumir(records[pos])
+        return resumo
+
+
+def buscar(consulta: str) -> set[str]:
+    """Ids dos estabelecimentos que casam com `consulta` (ver busca.py)."""
+    records = _records_atuais()
+    cache = _data_cache()
+    with cache.lock:
+        return cache.indice_busca(records).buscar(consulta)
+
+
+def importar_planilha(
+    arquivo, nome: str, usuario: str, encoding: str = "utf-8-sig", salvar: bool = True
+) -> importar.Resultado:
+    """Importa os estabelecimentos de uma planilha XLSX/CSV (ver importar.py).
+
+    As linhas são lidas em streaming e aplicadas de uma vez sobre a lista atual;
+    só os registros novos/alterados são normalizados, e tudo vai num único save
+    (um commit, com GITHUB_SYNC).
+
+    A leitura e a mescla (a parte lenta) ficam fora do `lock`, sem guardar as
+    linhas: só os tocados ficam em memória. Se outra sessão salvou no meio, as
+    diferenças dos tocados são reaplicadas sobre a lista nova já com o `lock`
+    na mão, como no save_record: o save da outra sessão não se perde.
+    """
+
+    carimbo = f"Por {usuario} em {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+    base = _records_atuais()
+    lista, tocados, resultado = importar.mesclar(base, importar.ler(arquivo, nome, encoding), carimbo)
+    if not salvar or not tocados:
+        return resultado
+
+    cache = _data_cache()
+    with cache.lock:
+        if cache.local_data is not base:
+            lista, tocados, _ = importar.mesclar(
+                cache.local_data or [], importar.diferencas(base, tocados), carimbo
+            )
+            if not tocados:
+                return resultado
+        migrate_data(tocados, 0)
+        # `lista` só tem cópias novas nos tocados; os demais são do cache (não mudam)
+        _gravar_local(cache, lista)
 
+    if GITHUB_SYNC and GITHUB_TOKEN and GITHUB_REPO:
+        github_save_json(lista)
+    return resultado
+
+
+def save_record(record: dict) -> int:
+    """Grava só este estabelecimento (por id) sobre o estado salvo mais recente.
+
+    Os demais registros vêm do cache, então edições de outras sessões em
+    outros estabelecimentos não são sobrescritas. Retorna a versão nova.
+    """
+
+    _records_atuais()
+    cache = _data_cache()
+    est_id = record.get("id")
+    # Data/hora pode ter mudado (no registro ou numa missão): só este é renormalizado
+    _normalizar_registro(record)
+    copia = _copy_records([record])[0]
+
+    with cache.lock:
+        atual = cache.local_data or []
+        posicoes = cache.posicoes(atual)
+        pos = posicoes.get(est_id)
+        novo = list(atual)
+        if pos is None:
+            novo.append(copia)
+        else:
+            novo[pos] = copia
+
+        if cache.agregados is not None:
+            agregados = cache.agregados.copy()
+            agregados.atualizar(atual[pos] if pos is not None else None, copia)
+        else:
+            agregados = Agregados.de_registros(novo, META_ESTABELECIMENTOS)
+
+        storage = _storage()
+        storage.meta = {"agregados": agregados.to_dict()}
+        # Só este registro é comparado com o anterior (não a lista inteira)
+        storage.save(novo, previous=atual, changed=[(atual[pos] if pos is not None else None, copia)])
+        cache.local_key = storage.file_key()
+        # Índice de busca: reindexa só este registro
+        if cache.busca is not None and cache.busca_de is atual:
+            cache.busca.atualizar(atual[pos] if pos is not None else None, copia)
+            cache.busca_de = novo
+        cache.local_data = novo
+        cache.nova_versao(frozenset({est_id}))
+        versao = cache.versao
+        cache.agregados = agregados
+        # Mesmas posições (mais a do registro novo): não precisa reindexar
+        if pos is None:
+            posicoes[est_id] = len(novo) - 1
+        cache.indice_de = novo
+
+    if GITHUB_SYNC and GITHUB_TOKEN and GITHUB_REPO:
+        github_save_json(novo)
+    return versao
+
+
+def registros_ordenados() -> tuple[list[dict], int]:
+    """(lista compartilhada ordenada por data/hora, versão). Sem cópia: não alterar.
+
+    A ordenação é refeita só quando a versão muda.
+    """
+    _records_atuais()
+    cache = _data_cache()
+    with cache.lock:
+        versao, records = cache.versao, cache.local_data or []
+        if cache.ordenados is not None and cache.ordenados[0] == versao:
+            return cache.ordenados[1], versao
+    ordenados = datahora.ordenar(records)
+    with cache.lock:
+        if cache.versao == versao:
+            cache.ordenados = (versao, ordenados)
+    return ordenados, versao
+
+
+_WIDGETS_CARD = ("etapa_", "notas_", "missao_feito_", "missao_titulo_", "missao_data_", "prioridade_", "resp_")
+
+
+def _esquecer_widgets(ids: set[str] | None) -> None:
+    """Tira da sessão o estado dos widgets dos cards `ids` (None = todos): eles
+    voltam a ser criados com o que está salvo."""
+    for key in list(st.session_state.keys()):
+        if isinstance(key, str) and key.startswith(_WIDGETS_CARD):
+            if ids is None or any(est_id in key for est_id in ids):
+                del st.session_state[key]
+
+
+def _acompanhar_versao(versao: int) -> None:
+    """Atualiza os cards que outra sessão mudou desde a última versão vista."""
+    vista = st.session_state.get("versao_vista")
+    if vista is not None and vista != versao:
+        cache = _data_cache()
+        with cache.lock:
+            ids = cache.mudou_desde(vista)
+        if ids is None or ids:
+            _esquecer_widgets(ids)
+    st.session_state.versao_vista = versao
+
+
+def _salvou_no_card(versao: int) -> None:
+    """Depois de um save desta sessão: se ninguém mais salvou no meio, a versão
+    nova já é a que esta sessão vê (não precisa redesenhar nada)."""
+    if st.session_state.get("versao_vista") == versao - 1:
+        st.session_state.versao_vista = versao
+
+
+@st.fragment(run_every=ATUALIZAR_A_CADA or None)
+def _mudancas_ui() -> None:
+    """Confere (barato: só compara a versão) se outra sessão salvou; se sim, rerun completo."""
+    cache = _data_cache()
+    with cache.lock:
+        versao = cache.versao
+    vista = st.session_state.get("versao_vista")
+    if vista is not None and vista != versao:
+        _rerun()
+
+
+def painel() -> Agregados:
+    """Contadores do painel (em memória; não percorre os estabelecimentos)."""
+    _records_atuais()
+    cache = _data_cache()
+    with cache.lock:
+        if cache.agregados is None:
+            cache.agregados = Agregados.de_registros(cache.local_data or [], META_ESTABELECIMENTOS)
+        return cache.agregados
+
+
+def definir_meta(meta: int) -> None:
+    """Muda a meta de estabelecimentos e grava (só o meta do documento muda)."""
+    _records_atuais()
+    cache = _data_cache()
+    with cache.lock:
+        atual = cache.local_data or []
+        agregados = (cache.agregados or Agregados.de_registros(atual)).copy()
+        agregados.meta = meta
+        storage = _storage()
+        storage.meta = {"agregados": agregados.to_dict()}
+        storage.save(atual, previous=atual, changed=[])
+        cache.local_key = storage.file_key()
+        cache.agregados = agregados
+
+    if GITHUB_SYNC and GITHUB_TOKEN and GITHUB_REPO:
+        github_save_json(atual)
 
-def migrate_data(data: list[dict]) -> list[dict]:
-    """Migra/normaliza dados para manter compatibilidade entre versões do app."""
 
+def _setdefault(d: dict, key: str, value) -> bool:
+    """Como dict.setdefault, mas diz se precisou preencher o campo."""
+    if key in d:
+        return False
+    d[key] = value
+    return True
+
+
+def _migrar_v1(data: list[dict]) -> bool:
+    """v0 -> v1: ids, etapas padrão, campos obrigatórios e missões."""
+
+    changed = False
     for idx, item in enumerate(data):
         if not isinstance(item, dict):
             continue
 
         if not item.get("id"):
             item["id"] = str(uuid.uuid4())
+            changed = True
 
         if "etapas" not in item or not isinstance(item.get("etapas"), dict):
             item["etapas"] = {k: False for k in ETAPAS_PADRAO}
+            changed = True
 
         # Garantir que todas as etapas padrão existam
         for etapa in ETAPAS_PADRAO:
-            item["etapas"].setdefault(etapa, False)
+            changed |= _setdefault(item["etapas"], etapa, False)
 
-        item.setdefault("local", f"Estabelecimento {idx + 1}")
-        item.setdefault("data_hora", "A Definir")
-        item.setdefault("status", _status_from_etapas(item["etapas"]))
-        item.setdefault("prioridade", "")
-        item.setdefault("responsavel", "")
-        item.setdefault("notas", "")
-        item.setdefault("ultima_atualizacao", "")
+        changed |= _setdefault(item, "local", f"Estabelecimento {idx + 1}")
+        changed |= _setdefault(item, "data_hora", "A Definir")
+        changed |= _setdefault(item, "status", _status_from_etapas(item["etapas"]))
+        changed |= _setdefault(item, "prioridade", "")
+        changed |= _setdefault(item, "responsavel", "")
+        changed |= _setdefault(item, "notas", "")
+        changed |= _setdefault(item, "ultima_atualizacao", "")
 
         # Missões (pendências/visitas extras) - não entram no progresso geral
         if "missoes" not in item or not isinstance(item.get("missoes"), list):
             item["missoes"] = []
+            changed = True
         for m in item["missoes"]:
             if not isinstance(m, dict):
                 continue
             if not m.get("id"):
                 m["id"] = str(uuid.uuid4())
-            m.setdefault("titulo", "")
-            m.setdefault("data_hora", "A Definir")
-            m.setdefault("status", "Pendente")
-            m.setdefault("notas", "")
-            m.setdefault("ultima_atualizacao", "")
-
-    return data
-
-
-def _parse_datahora_sort_key(value: str, original_index: int) -> tuple[int, str, int, int]:
-    value = (value or "").strip()
-    if not value or value.lower().startswith("a definir"):
-        return (1, "9999-12-31", 9999, original_index)
+                changed = True
+            changed |= _setdefault(m, "titulo", "")
+            changed |= _setdefault(m, "data_hora", "A Definir")
+            changed |= _setdefault(m, "status", "Pendente")
+            changed |= _setdefault(m, "notas", "")
+            changed |= _setdefault(m, "ultima_atualizacao", "")
 
-    if " - " not in value:
-        return (0, "9999-12-31", 9999, original_index)
+    return changed
 
-    date_part, period_part = value.split(" - ", 1)
-    date_part = date_part.strip()
-    period_part = period_part.strip().lower()
 
-    try:
-        date_iso = datetime.strptime(date_part, "%d/%m/%Y").date().isoformat()
-    except ValueError:
-        return (0, "9999-12-31", 9999, original_index)
-
-    # Horários aproximados
-    if ":" in period_part:
-        try:
-            hh, mm = period_part.split(":", 1)
-            minutes = int(hh) * 60 + int(mm)
-        except ValueError:
-            minutes = 12 * 60
-    else:
-        map_minutes = {
-            "manhã": 9 * 60,
-            "durante o dia": 13 * 60,
-            "fim do dia": 18 * 60,
-        }
-        minutes = map_minutes.get(period_part, 12 * 60)
-
-    return (0, date_iso, minutes, original_index)
+def _normalizar_todos(data: list[dict]) -> bool:
+    """_normalizar_registro para a base inteira, com o parse em lote."""
+    alvos = []
+    for item in data:
+        if isinstance(item, dict):
+            alvos.append(item)
+            alvos.extend(m for m in item.get("missoes") or [] if isinstance(m, dict))
+    isos, sem_datas = datahora.normalizar_lote([d.get("data_hora", "") for d in alvos])
+
+    changed = False
+    for d, iso, sem_data in zip(alvos, isos, sem_datas):
+        if d.get("data_hora_iso") != iso or d.get("sem_data") is not sem_data:
+            d["data_hora_iso"] = iso
+            d["sem_data"] = sem_data
+            changed = True
+    return changed
+
+
+# Passos de migração, em ordem. Cada passo leva os dados da versão anterior
+# para a sua e retorna True se alterou algo. Para mudar o formato, crie
+# _migrar_vN e acrescente (N, _migrar_vN) aqui.
+MIGRACOES = [
+    # ids, etapas padrão, campos obrigatórios e missões
+    (1, _migrar_v1),
+    # data/hora normalizada (data_hora_iso + sem_data) para ordenar sem parsear
+    (2, _normalizar_todos),
+    # recalcula com o datahora.py (faixas como "13 - 17 horas", "tarde", data sem período)
+    (3, _normalizar_todos),
+    # recalcula valores com quebra de linha (ex: importados de planilha), antes sem data
+    (4, _normalizar_todos),
+]
+SCHEMA_VERSION = MIGRACOES[-1][0]
+
+
+def migrate_data(data: list[dict], schema_version: int = 0) -> tuple[list[dict], bool]:
+    """Migra/normaliza dados para manter compatibilidade entre versões do app.
+
+    Só roda os passos acima de `schema_version`. Retorna (dados, sujo): sujo é
+    True se algum passo alterou os dados ou se a versão gravada está
+    desatualizada — ou seja, se vale a pena salvar.
+    """
+
+    dirty = schema_version < SCHEMA_VERSION
+    passos = [step for version, step in MIGRACOES if version > schema_version]
+    for i, step in enumerate(passos):
+        # O mesmo passo repetido em seguida (renormalizar a data/hora) roda uma vez só
+        if i + 1 < len(passos) and passos[i + 1] is step:
+            continue
+        dirty |= step(data)
+    return data, dirty
+
+
+def _normalizar_datahora(d: dict) -> bool:
+    """Grava data_hora_iso/sem_data a partir de data_hora. Diz se mudou algo."""
+    iso, sem_data = datahora.normalizar(d.get("data_hora", ""))
+    if d.get("data_hora_iso") == iso and d.get("sem_data") is sem_data:
+        return False
+    d["data_hora_iso"] = iso
+    d["sem_data"] = sem_data
+    return True
+
+
+def _normalizar_registro(item: dict) -> bool:
+    """Normaliza a data/hora do estabelecimento e das suas missões."""
+    changed = _normalizar_datahora(item)
+    for m in item.get("missoes") or []:
+        if isinstance(m, dict):
+            changed |= _normalizar_datahora(m)
+    return changed
+
+
+def _data_visita(d: dict) -> date | None:
+    """Dia da visita (de data_hora_iso); None para "A Definir" ou sem data."""
+    iso = d.get("data_hora_iso")
+    if iso is None:
+        iso, _ = datahora.normalizar(d.get("data_hora", ""))
+    return date.fromisoformat(iso[:10]) if iso else None
+
+
+def filter_records(
+    data: list[dict],
+    status: list[str] | None = None,
+    prioridades: list[str] | None = None,
+    responsaveis: list[str] | None = None,
+    inicio: date | None = None,
+    fim: date | None = None,
+) -> list[dict]:
+    """Estabelecimentos que passam em todos os filtros (lista vazia/None = sem filtro).
+
+    Com intervalo de datas, registros sem data definida ficam de fora. Devolve
+    os mesmos dicts (não cópias): o main_ui edita in-place e salva `data`.
+    """
+
+    status_set = set(status or ())
+    prioridades_set = set(prioridades or ())
+    responsaveis_set = {r.strip().lower() for r in responsaveis or ()}
+    por_data = inicio is not None or fim is not None
+
+    filtrados = []
+    for item in data:
+        if status_set and item.get("status", "Pendente") not in status_set:
+            continue
+        if prioridades_set and (item.get("prioridade") or "") not in prioridades_set:
+            continue
+        if responsaveis_set and (item.get("responsavel") or "").strip().lower() not in responsaveis_set:
+            continue
+        if por_data:
+            dia = _data_visita(item)
+            if dia is None or (inicio and dia < inicio) or (fim and dia > fim):
+                continue
+        filtrados.append(item)
+    return filtrados
 
 
 def _status_from_etapas(etapas: dict) -> str:
@@ -376,6 +966,214 @@ def _color_badge(text: str) -> str:
     return text
 
 
+def _sync_status_ui() -> None:
+    info = _github_sync().status()
+    st.caption("Sincronização com o GitHub")
+    ultimo = (
+        datetime.fromtimestamp(info["ultimo_sync"]).strftime("%d/%m/%Y %H:%M:%S")
+        if info["ultimo_sync"]
+        else "—"
+    )
+    st.write(f"Na fila: **{info['fila']}** · Último envio: {ultimo}")
+    lat = _github().client.latency_stats()
+    if lat["chamadas"]:
+        st.caption(
+            f"Latência da API: p50 {lat['p50_ms']:.0f} ms · p95 {lat['p95_ms']:.0f} ms "
+            f"({lat['chamadas']} chamadas)"
+        )
+    if info["conflitos"]:
+        with _data_cache().lock:
+            local = _data_cache().local_data or []
+            nomes = {item.get("id"): item.get("local") for item in local if isinstance(item, dict)}
+        st.warning(
+            "Outra pessoa alterou no GitHub os mesmos estabelecimentos; ficou a versão "
+            "local de: " + ", ".join(nomes.get(est_id) or est_id for est_id in info["conflitos"])
+        )
+    if info["erro"]:
+        st.warning(
+            "Falha ao enviar ao GitHub; as alterações continuam na fila e serão "
+            f"reenviadas. ({info['erro']})"
+        )
+
+
+_COLUNAS_VISAO = [
+    ("Local", "local"),
+    ("Data/Hora", "data_hora"),
+    ("Prioridade", "prioridade"),
+    ("Responsável", "responsavel"),
+    ("Status", "status"),
+    ("Última atualização", "ultima_atualizacao"),
+]
+_COLUNAS_MISSOES = [
+    ("Missão", "titulo"),
+    ("Data/Hora", "data_hora"),
+    ("Status", "status"),
+    ("Última atualização", "ultima_atualizacao"),
+]
+
+
+def build_overview_table(data: list[dict]) -> pd.DataFrame:
+    """Tabela "Visão geral": uma linha por estabelecimento, ordenada por data/hora."""
+    df = pd.DataFrame({col: [i.get(campo, "") for i in data] for col, campo in _COLUNAS_VISAO})
+    return df.take(datahora.ordem(data)).reset_index(drop=True)
+
+
+def build_missions_table(data: list[dict]) -> pd.DataFrame:
+    """Tabela "Panorama geral — Missões": todas as missões, ordenadas por data/hora."""
+    missoes: list[dict] = []
+    locais: list[str] = []
+    for item in data:
+        doc = item.get("missoes") or []
+        missoes.extend(doc)
+        locais.extend([item.get("local", "")] * len(doc))
+
+    df = pd.DataFrame(
+        {"Local": locais, **{col: [m.get(campo, "") for m in missoes] for col, campo in _COLUNAS_MISSOES}}
+    )
+    return df.take(datahora.ordem(missoes)).reset_index(drop=True)
+
+
+def overview_tables() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(visão geral, missões), refeitas só quando os dados mudam (versão do cache).
+
+    Sem mudança, devolve os mesmos DataFrames (não alterar).
+    """
+
+    _records_atuais()
+    cache = _data_cache()
+    with cache.lock:
+        versao, records = cache.versao, cache.local_data or []
+        if cache.tabelas is not None and cache.tabelas[0] == versao:
+            return cache.tabelas[1], cache.tabelas[2]
+
+    visao = build_overview_table(records)
+    missoes = build_missions_table(records)
+    with cache.lock:
+        if cache.versao == versao:
+            cache.tabelas = (versao, visao, missoes)
+    return visao, missoes
+
+
+def _versao_exportacao() -> tuple[tuple[int, int], list[dict]]:
+    """(chave da versão atual dos dados, lista compartilhada). Sem cópia: não alterar."""
+    _records_atuais()
+    cache = _data_cache()
+    with cache.lock:
+        return (id(cache), cache.versao), cache.local_data or []
+
+
+def _pedir_exportacao(formato: str) -> None:
+    chave, records = _versao_exportacao()
+    _exportador().pedir(formato, chave, records)
+
+
+@st.fragment(run_every=1)
+def _aguardar_exportacao() -> None:
+    """Enquanto algo é gerado, confere a cada segundo; quando termina, mostra os downloads."""
+    if not _exportador().gerando():
+        _rerun()
+
+
+def _exportar_ui() -> None:
+    """Downloads da agenda. Os arquivos são gerados fora do rerun (ver exportacoes.py)
+    e reaproveitados enquanto os dados não mudarem."""
+    exportador = _exportador()
+    chave, _ = _versao_exportacao()
+    colunas = st.columns(len(exportacoes.FORMATOS))
+    for col, (formato, f) in zip(colunas, exportacoes.FORMATOS.items()):
+        conteudo = exportador.pronta(formato, chave)
+        if conteudo is not None:
+            col.download_button(
+                f"Baixar {f.rotulo}",
+                data=conteudo,
+                file_name=f.arquivo,
+                mime=f.mime,
+                key=f"baixar_{formato}",
+                on_click="ignore",
+                use_container_width=True,
+            )
+        elif exportador.gerando(formato):
+            col.button(f"Gerando {f.rotulo}…", key=f"gerando_{formato}", disabled=True, use_container_width=True)
+        else:
+            col.button(
+                f"Preparar {f.rotulo}",
+                key=f"preparar_{formato}",
+                on_click=_pedir_exportacao,
+                args=(formato,),
+                use_container_width=True,
+            )
+        erro = exportador.erros.get(formato)
+        if erro:
+            col.caption(f"Erro: {erro}")
+    if exportador.gerando():
+        _aguardar_exportacao()
+
+
+def _filtros_e_pagina_ui(data: list[dict]) -> list[dict]:
+    """Busca, filtros e paginação da lista. Roda antes dos cards: só a página volta."""
+
+    consulta = st.text_input(
+        "Buscar", key="filtro_busca", placeholder="Local, notas, responsável ou missão (sem acento, início da palavra)"
+    ).strip()
+
+    with st.expander("Filtros", expanded=False):
+        c1, c2, c3 = st.columns(3)
+        status = c1.multiselect("Status", ["Pendente", "Em andamento", "Concluído"], key="filtro_status")
+        prioridades = c2.multiselect(
+            "Prioridade",
+            ["", "Alta", "Média", "Baixa"],
+            format_func=lambda p: p or "(sem prioridade)",
+            key="filtro_prioridade",
+        )
+        nomes = sorted({(i.get("responsavel") or "").strip() for i in data} - {""}, key=str.lower)
+        responsaveis = c3.multiselect("Responsável", nomes, key="filtro_responsavel")
+
+        c4, c5 = st.columns([1, 2])
+        por_data = c4.checkbox("Filtrar por data", key="filtro_por_data")
+        inicio = fim = None
+        if por_data:
+            hoje = date.today()
+            periodo = c5.date_input("Período", value=(hoje, hoje), format="DD/MM/YYYY", key="filtro_periodo")
+            if isinstance(periodo, (tuple, list)):
+                inicio = periodo[0] if len(periodo) > 0 else None
+                fim = periodo[1] if len(periodo) > 1 else inicio
+            else:
+                inicio = fim = periodo
+
+    if consulta:
+        encontrados = buscar(consulta)
+        data_busca = [i for i in data if i.get("id") in encontrados]
+    else:
+        data_busca = data
+    filtrados = filter_records(data_busca, status, prioridades, responsaveis, inicio, fim)
+
+    assinatura = (consulta, tuple(status), tuple(prioridades), tuple(responsaveis), inicio, fim)
+    if st.session_state.get("filtro_assinatura") != assinatura:
+        # Filtro novo: volta para a primeira página
+        st.session_state.filtro_assinatura = assinatura
+        st.session_state.pagina = 1
+
+    c1, c2, c3 = st.columns([1, 1, 2])
+    tamanho = c1.selectbox(
+        "Por página", PAGE_SIZE_OPCOES, index=PAGE_SIZE_OPCOES.index(PAGE_SIZE), key="page_size"
+    )
+    total_paginas = max(1, -(-len(filtrados) // tamanho))
+    if st.session_state.get("pagina", 1) > total_paginas:
+        st.session_state.pagina = total_paginas
+    pagina = c2.number_input("Página", min_value=1, max_value=total_paginas, step=1, key="pagina")
+
+    inicio_idx = (pagina - 1) * tamanho
+    visiveis = filtrados[inicio_idx : inicio_idx + tamanho]
+    if visiveis:
+        c3.caption(
+            f"Mostrando {inicio_idx + 1}–{inicio_idx + len(visiveis)} de {len(filtrados)} "
+            f"(total: {len(data)}) · página {pagina}/{total_paginas}"
+        )
+    else:
+        c3.caption("Nenhum estabelecimento com essa busca/filtros.")
+    return visiveis
+
+
 def login_ui() -> None:
     st.title("Login — Agenda de Visitas")
     user = st.selectbox("Usuário", list(USUARIOS.keys()))
@@ -390,186 +1188,306 @@ def login_ui() -> None:
             st.error("Senha incorreta.")
 
 
-def main_ui() -> None:
-    data = load_data()
+def _marcar_sujo(est_id: str, campo: str, widget_key: str, missao_id: str | None = None) -> None:
+    """on_change dos widgets do card: anota (registro, campo, valor novo).
+
+    `campo` é a chave do registro/missão; etapas usam "etapas/<etapa>" e o
+    "Feito" da missão usa "feito". Gravado depois por _salvar_sujos().
+    """
+    sujos = st.session_state.setdefault("sujos", {})
+    sujos.setdefault(est_id, {})[(missao_id, campo)] = st.session_state[widget_key]
+
+
+def _salvar_sujos(est_id: str) -> bool:
+    """Aplica e grava as mudanças anotadas para `est_id`. True se gravou."""
 
-    # Ordenar (data definida primeiro)
-    indexed = list(enumerate(data))
-    indexed.sort(
-        key=lambda pair: _parse_datahora_sort_key(pair[1].get("data_hora", ""), pair[0])
+    mudancas = st.session_state.get("sujos", {}).pop(est_id, None)
+    if not mudancas:
+        return False
+    item = load_record(est_id)
+    if item is None:
+        return False
+
+    assinatura = f"Por {st.session_state.user} em {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+    missoes = {m.get("id"): m for m in item.get("missoes") or []}
+    for (missao_id, campo), valor in mudancas.items():
+        if missao_id is not None:
+            m = missoes.get(missao_id)
+            if m is None:
+                continue
+            if campo == "feito":
+                m["status"] = "Feito" if valor else "Pendente"
+            else:
+                m[campo] = valor
+            m["ultima_atualizacao"] = assinatura
+        elif campo.startswith("etapas/"):
+            etapas = item.setdefault("etapas", {k: False for k in ETAPAS_PADRAO})
+            etapas[campo.split("/", 1)[1]] = bool(valor)
+            # Status acompanha as etapas
+            item["status"] = _status_from_etapas(etapas)
+        else:
+            item[campo] = valor
+
+    item["ultima_atualizacao"] = assinatura
+    _salvou_no_card(save_record(item))
+    return True
+
+
+def _adicionar_missao(est_id: str) -> None:
+    """on_click do "Adicionar missão" (campos do formulário do card)."""
+    titulo = (st.session_state.get(f"nova_missao_titulo_{est_id}") or "").strip()
+    if not titulo:
+        st.session_state[f"erro_missao_{est_id}"] = True
+        return
+    item = load_record(est_id)
+    if item is None:
+        return
+
+    assinatura = f"Por {st.session_state.user} em {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+    item.setdefault("missoes", []).append(
+        {
+            "id": str(uuid.uuid4()),
+            "titulo": titulo,
+            "data_hora": (st.session_state.get(f"nova_missao_data_{est_id}") or "A Definir").strip(),
+            "status": "Pendente",
+            "notas": "",
+            "ultima_atualizacao": assinatura,
+        }
     )
-    data = [row for _, row in indexed]
+    item["ultima_atualizacao"] = assinatura
+    _salvou_no_card(save_record(item))
 
-    st.title("Agenda de Visitas")
 
-    with st.sidebar:
-        st.write(f"Logado como: **{st.session_state.user}**")
-        if st.button("Sair", use_container_width=True):
-            st.session_state.logged_in = False
-            st.session_state.user = None
-            _rerun()
+def _salvar_todos_sujos() -> None:
+    """Grava o que ficou anotado de cards que não vão ser redesenhados (ex: troca de página)."""
+    for est_id in list(st.session_state.get("sujos", {})):
+        _salvar_sujos(est_id)
 
-    # Progresso
-    meta_estabelecimentos = 20
-    etapas_por_estab = len(ETAPAS_PADRAO)
-    meta_total_etapas = meta_estabelecimentos * etapas_por_estab
 
-    etapas_concluidas = sum(sum(item.get("etapas", {}).values()) for item in data)
-    progresso = (etapas_concluidas / meta_total_etapas) if meta_total_etapas > 0 else 0
+def _alternar_card(est_id: str) -> None:
+    st.session_state[f"aberto_{est_id}"] = bool(st.session_state.get(f"card_{est_id}"))
 
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Etapas concluídas", f"{etapas_concluidas}/{meta_total_etapas}")
-    concluidos = sum(1 for item in data if item.get("status") == "Concluído")
-    col2.metric("Estabelecimentos concluídos", f"{concluidos}/{meta_estabelecimentos}")
-    col3.metric("Progresso", f"{progresso * 100:.1f}%")
-    st.progress(progresso)
 
-    st.divider()
+@st.fragment
+def _card_ui(est_id: str) -> None:
+    """Card de um estabelecimento. Mexer nele reexecuta só este fragmento.
 
-    changed_any = False
-    agora = datetime.now().strftime("%d/%m/%Y %H:%M")
+    Os widgets só anotam o que mudou (on_change -> _marcar_sujo); no rerun
+    do fragmento isso é aplicado e gravado, e só este registro (e a missão
+    editada) recebe a data de atualização. Sem edição, nada é comparado.
+    """
 
-    for item in data:
-        item_changed = False
-        est_id = item.get("id", "")
-        local = item.get("local", "")
-        data_hora = item.get("data_hora", "")
-        status = item.get("status", "Pendente")
-
-        header = f"{local} — {data_hora} — {_color_badge(status)}"
-        with st.expander(header, expanded=False):
-            left, right = st.columns([2, 1])
-
-            with left:
-                # Etapas
-                etapas = item.get("etapas", {k: False for k in ETAPAS_PADRAO})
-                for etapa in ETAPAS_PADRAO:
-                    key = f"etapa_{est_id}_{etapa}"
-                    novo_valor = st.checkbox(etapa, value=bool(etapas.get(etapa, False)), key=key)
-                    if novo_valor != bool(etapas.get(etapa, False)):
-                        etapas[etapa] = novo_valor
-                        item_changed = True
-
-                # Notas
-                notas_key = f"notas_{est_id}"
-                novas_notas = st.text_area("Notas", value=item.get("notas", ""), key=notas_key)
-                if novas_notas != item.get("notas", ""):
-                    item["notas"] = novas_notas
-                    item_changed = True
-
-                st.markdown("---")
-                st.subheader("Missões (pendências/visitas extras)")
-
-                missoes = item.get("missoes", [])
-                # Ordenar missões por data/hora, mantendo ordem em empates
-                indexed_m = list(enumerate(missoes))
-                indexed_m.sort(
-                    key=lambda pair: _parse_datahora_sort_key(
-                        pair[1].get("data_hora", ""), pair[0]
-                    )
+    if _salvar_sujos(est_id):
+        st.toast("Salvo.")
+
+    resumo = resumo_card(est_id)
+    if resumo is None:
+        # Removido por outra sessão desde o último rerun completo
+        return
+
+    header = f"{resumo.local} — {resumo.data_hora} — {_color_badge(resumo.status)}"
+    if resumo.missoes:
+        header += f" — {resumo.missoes} {'missão' if resumo.missoes == 1 else 'missões'}"
+        if resumo.proxima:
+            header += f" · próxima: {resumo.proxima}"
+    # O label entra na identidade do expander: como ele muda (status, missões),
+    # o aberto/fechado fica guardado à parte e volta pelo `expanded`
+    card = st.expander(
+        header,
+        expanded=st.session_state.get(f"aberto_{est_id}", False),
+        key=f"card_{est_id}",
+        on_change=_alternar_card,
+        args=(est_id,),
+    )
+    if not card.open:
+        # Fechado: nenhum widget nem missão é montado; abrir reexecuta o fragmento
+        return
+
+    item = load_record(est_id)
+    if item is None:
+        return
+
+    with card:
+        left, right = st.columns([2, 1])
+
+        with left:
+            # Etapas
+            etapas = item.get("etapas", {k: False for k in ETAPAS_PADRAO})
+            for etapa in ETAPAS_PADRAO:
+                key = f"etapa_{est_id}_{etapa}"
+                st.checkbox(
+                    etapa,
+                    value=bool(etapas.get(etapa, False)),
+                    key=key,
+                    on_change=_marcar_sujo,
+                    args=(est_id, f"etapas/{etapa}", key),
                 )
-                missoes_sorted = [m for _, m in indexed_m]
 
-                if not missoes_sorted:
-                    st.caption("Nenhuma missão cadastrada ainda.")
+            # Notas
+            notas_key = f"notas_{est_id}"
+            st.text_area(
+                "Notas",
+                value=item.get("notas", ""),
+                key=notas_key,
+                on_change=_marcar_sujo,
+                args=(est_id, "notas", notas_key),
+            )
 
-                for m in missoes_sorted:
-                    mid = m.get("id", "")
-                    cols = st.columns([1, 3, 2, 4])
+            st.markdown("---")
+            st.subheader("Missões (pendências/visitas extras)")
 
-                    feito = (m.get("status", "Pendente") or "Pendente").strip().lower() in {
-                        "feito",
-                        "concluído",
-                        "concluido",
-                    }
-                    novo_feito = cols[0].checkbox(
-                        "Feito",
-                        value=feito,
-                        key=f"missao_feito_{est_id}_{mid}",
-                    )
-                    novo_titulo = cols[1].text_input(
-                        "Missão",
-                        value=m.get("titulo", ""),
-                        key=f"missao_titulo_{est_id}_{mid}",
-                        label_visibility="collapsed",
-                    )
-                    novo_data_m = cols[2].text_input(
-                        "Data/Hora",
-                        value=m.get("data_hora", "A Definir"),
-                        key=f"missao_data_{est_id}_{mid}",
-                        label_visibility="collapsed",
-                    )
-                    cols[3].caption(
-                        f"Status: {'Feito' if novo_feito else 'Pendente'} · {m.get('ultima_atualizacao', '') or '—'}"
-                    )
+            missoes = item.get("missoes", [])
+            # Ordenar missões por data/hora, mantendo ordem em empates
+            missoes_sorted = datahora.ordenar(missoes)
 
-                    novo_status = "Feito" if novo_feito else "Pendente"
-                    if (
-                        novo_status != m.get("status")
-                        or novo_titulo != m.get("titulo")
-                        or novo_data_m != m.get("data_hora")
-                    ):
-                        m["status"] = novo_status
-                        m["titulo"] = novo_titulo
-                        m["data_hora"] = novo_data_m
-                        m["ultima_atualizacao"] = f"Por {st.session_state.user} em {agora}"
-                        item_changed = True
-
-                with st.form(f"add_missao_{est_id}"):
-                    c1, c2 = st.columns([3, 2])
-                    nova_missao_titulo = c1.text_input("Nome da missão")
-                    nova_missao_data = c2.text_input(
-                        "Data/Hora",
-                        placeholder="Ex: 18/01/2026 - 14:00 ou A Definir",
-                    )
-                    add_m = st.form_submit_button("Adicionar missão")
-                    if add_m:
-                        if not nova_missao_titulo.strip():
-                            st.error("Informe o nome da missão.")
-                        else:
-                            item.setdefault("missoes", []).append(
-                                {
-                                    "id": str(uuid.uuid4()),
-                                    "titulo": nova_missao_titulo.strip(),
-                                    "data_hora": (nova_missao_data or "A Definir").strip(),
-                                    "status": "Pendente",
-                                    "notas": "",
-                                    "ultima_atualizacao": f"Por {st.session_state.user} em {agora}",
-                                }
-                            )
-                            item_changed = True
-
-            with right:
-                prioridade = st.selectbox(
-                    "Prioridade",
-                    options=["", "Alta", "Média", "Baixa"],
-                    index=["", "Alta", "Média", "Baixa"].index(item.get("prioridade", "") if item.get("prioridade", "") in {"", "Alta", "Média", "Baixa"} else ""),
-                    key=f"prioridade_{est_id}",
+            if not missoes_sorted:
+                st.caption("Nenhuma missão cadastrada ainda.")
+
+            for m in missoes_sorted:
+                mid = m.get("id", "")
+                cols = st.columns([1, 3, 2, 4])
+
+                feito = _missao_feita(m)
+                feito_key = f"missao_feito_{est_id}_{mid}"
+                cols[0].checkbox(
+                    "Feito",
+                    value=feito,
+                    key=feito_key,
+                    on_change=_marcar_sujo,
+                    args=(est_id, "feito", feito_key, mid),
+                )
+                titulo_key = f"missao_titulo_{est_id}_{mid}"
+                cols[1].text_input(
+                    "Missão",
+                    value=m.get("titulo", ""),
+                    key=titulo_key,
+                    label_visibility="collapsed",
+                    on_change=_marcar_sujo,
+                    args=(est_id, "titulo", titulo_key, mid),
+                )
+                data_key = f"missao_data_{est_id}_{mid}"
+                cols[2].text_input(
+                    "Data/Hora",
+                    value=m.get("data_hora", "A Definir"),
+                    key=data_key,
+                    label_visibility="collapsed",
+                    on_change=_marcar_sujo,
+                    args=(est_id, "data_hora", data_key, mid),
+                )
+                cols[3].caption(
+                    f"Status: {'Feito' if feito else 'Pendente'} · {m.get('ultima_atualizacao', '') or '—'}"
                 )
-                if prioridade != item.get("prioridade", ""):
-                    item["prioridade"] = prioridade
-                    item_changed = True
 
-                responsavel = st.text_input(
-                    "Responsável", value=item.get("responsavel", ""), key=f"resp_{est_id}"
+            with st.form(f"add_missao_{est_id}"):
+                c1, c2 = st.columns([3, 2])
+                c1.text_input("Nome da missão", key=f"nova_missao_titulo_{est_id}")
+                c2.text_input(
+                    "Data/Hora",
+                    placeholder="Ex: 18/01/2026 - 14:00 ou A Definir",
+                    key=f"nova_missao_data_{est_id}",
                 )
-                if responsavel != item.get("responsavel", ""):
-                    item["responsavel"] = responsavel
-                    item_changed = True
+                # Grava no callback, antes do card ser redesenhado (já com a missão nova)
+                st.form_submit_button("Adicionar missão", on_click=_adicionar_missao, args=(est_id,))
+                if st.session_state.pop(f"erro_missao_{est_id}", False):
+                    st.error("Informe o nome da missão.")
+
+        with right:
+            prioridades = ["", "Alta", "Média", "Baixa"]
+            prioridade_key = f"prioridade_{est_id}"
+            st.selectbox(
+                "Prioridade",
+                options=prioridades,
+                index=prioridades.index(item.get("prioridade", "") if item.get("prioridade", "") in prioridades else ""),
+                key=prioridade_key,
+                on_change=_marcar_sujo,
+                args=(est_id, "prioridade", prioridade_key),
+            )
+
+            resp_key = f"resp_{est_id}"
+            st.text_input(
+                "Responsável",
+                value=item.get("responsavel", ""),
+                key=resp_key,
+                on_change=_marcar_sujo,
+                args=(est_id, "responsavel", resp_key),
+            )
+
+            st.caption(f"Última atualização: {item.get('ultima_atualizacao', '') or '—'}")
+
+
+def main_ui() -> None:
+    # Edições de cards que saíram da tela (filtro/página) antes do rerun do fragmento
+    _salvar_todos_sujos()
+    if GITHUB_SYNC and GITHUB_TOKEN and GITHUB_REPO:
+        # Traz para o cache compartilhado o que mudou no GitHub (inalterado: só o 304)
+        sincronizar_github()
+    # Lista compartilhada entre as sessões, já ordenada (data definida primeiro)
+    data, versao = registros_ordenados()
+    _acompanhar_versao(versao)
+
+    st.title("Agenda de Visitas")
+
+    with st.sidebar:
+        st.write(f"Logado como: **{st.session_state.user}**")
+        if st.button("Sair", use_container_width=True):
+            st.session_state.logged_in = False
+            st.session_state.user = None
+            _rerun()
+
+        # Sempre mostra a meta salva (pode ter sido mudada em outra sessão)
+        st.session_state.meta_estabelecimentos = painel().meta
+        st.number_input(
+            "Meta de estabelecimentos",
+            min_value=1,
+            step=1,
+            key="meta_estabelecimentos",
+            on_change=lambda: definir_meta(int(st.session_state.meta_estabelecimentos)),
+        )
+
+        if GITHUB_SYNC and GITHUB_TOKEN and GITHUB_REPO:
+            _sync_status_ui()
+        if ATUALIZAR_A_CADA:
+            _mudancas_ui()
 
-                st.caption(f"Última atualização: {item.get('ultima_atualizacao', '') or '—'}")
+    # Progresso (contadores mantidos a cada save, ver agregados.py)
+    agregados = painel()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Etapas concluídas", f"{agregados.etapas_concluidas}/{agregados.meta_total_etapas}")
+    col2.metric("Estabelecimentos concluídos", f"{agregados.concluidos}/{agregados.meta}")
+    col3.metric("Progresso", f"{agregados.progresso * 100:.1f}%")
+    st.progress(agregados.progresso)
+
+    with st.expander("Resumo", expanded=False):
+        c1, c2, c3 = st.columns(3)
+        c1.caption("Por etapa")
+        c1.dataframe(
+            pd.DataFrame(
+                {"Etapa": ETAPAS_PADRAO, "Concluídas": [agregados.etapas.get(e, 0) for e in ETAPAS_PADRAO]}
+            ),
+            hide_index=True,
+        )
+        c2.caption("Por status")
+        c2.dataframe(
+            pd.DataFrame({"Status": list(agregados.status), "Qtde": list(agregados.status.values())}),
+            hide_index=True,
+        )
+        c3.caption("Por responsável")
+        c3.dataframe(
+            pd.DataFrame(
+                [
+                    {"Responsável": r or "(sem responsável)", "Total": v["total"], "Concluídos": v["concluidos"]}
+                    for r, v in sorted(agregados.responsaveis.items(), key=lambda kv: kv[0].lower())
+                ]
+            ),
+            hide_index=True,
+        )
 
-            # Atualizar status automaticamente
-            item["etapas"] = etapas
-            novo_status = _status_from_etapas(etapas)
-            if novo_status != item.get("status"):
-                item["status"] = novo_status
-                item_changed = True
+    st.divider()
 
-            if item_changed:
-                item["ultima_atualizacao"] = f"Por {st.session_state.user} em {agora}"
+    pagina = _filtros_e_pagina_ui(data)
 
-        changed_any = changed_any or item_changed
+    for item in pagina:
+        _card_ui(item.get("id", ""))
 
     st.divider()
 
@@ -585,7 +1503,8 @@ def main_ui() -> None:
             if not novo_local.strip():
                 st.error("Informe o Local.")
             else:
-                data.append(
+                agora = datetime.now().strftime("%d/%m/%Y %H:%M")
+                save_record(
                     {
                         "id": str(uuid.uuid4()),
                         "local": novo_local.strip(),
@@ -599,56 +1518,48 @@ def main_ui() -> None:
                         "missoes": [],
                     }
                 )
-                save_data(data)
                 st.success("Adicionado!")
                 _rerun()
 
-    if changed_any:
-        save_data(data)
-        st.toast("Salvo.")
+    st.subheader("Importar planilha")
+    if "importacao" in st.session_state:
+        st.success(st.session_state.pop("importacao"))
+    with st.form("importar_form", clear_on_submit=True):
+        arquivo = st.file_uploader(
+            "XLSX ou CSV com cabeçalho (Local, Data/Hora, Prioridade, Responsável, Status, Notas, id)",
+            type=["xlsx", "csv"],
+        )
+        importar_clicado = st.form_submit_button("Importar")
+
+        if importar_clicado:
+            if arquivo is None:
+                st.error("Escolha um arquivo.")
+            else:
+                try:
+                    r = importar_planilha(arquivo, arquivo.name, st.session_state.user)
+                except ValueError as e:
+                    st.error(f"Não deu para importar: {e}")
+                else:
+                    st.session_state.importacao = (
+                        f"{r.novos} novos, {r.alterados} alterados, {r.iguais} sem mudança"
+                        + (f", {r.ignoradas} linhas ignoradas (sem Local)" if r.ignoradas else "")
+                        + "."
+                    )
+                    _rerun()
 
+    visao, dfm = overview_tables()
     st.subheader("Visão geral")
-    df = pd.DataFrame(
-        [
-            {
-                "Local": i.get("local", ""),
-                "Data/Hora": i.get("data_hora", ""),
-                "Prioridade": i.get("prioridade", ""),
-                "Responsável": i.get("responsavel", ""),
-                "Status": i.get("status", ""),
-                "Última atualização": i.get("ultima_atualizacao", ""),
-            }
-            for i in data
-        ]
-    )
-    st.dataframe(df, use_container_width=True, hide_index=True)
+    st.dataframe(visao, use_container_width=True, hide_index=True)
 
     st.subheader("Panorama geral — Missões")
-    all_missoes: list[dict] = []
-    for item in data:
-        local = item.get("local", "")
-        for m in item.get("missoes", []) or []:
-            all_missoes.append(
-                {
-                    "Local": local,
-                    "Missão": m.get("titulo", ""),
-                    "Data/Hora": m.get("data_hora", ""),
-                    "Status": m.get("status", ""),
-                    "Última atualização": m.get("ultima_atualizacao", ""),
-                }
-            )
-
-    if not all_missoes:
+    if dfm.empty:
         st.caption("Nenhuma missão cadastrada ainda.")
     else:
-        indexed_pm = list(enumerate(all_missoes))
-        indexed_pm.sort(
-            key=lambda pair: _parse_datahora_sort_key(pair[1].get("Data/Hora", ""), pair[0])
-        )
-        all_missoes = [row for _, row in indexed_pm]
-        dfm = pd.DataFrame(all_missoes)
         st.dataframe(dfm, use_container_width=True, hide_index=True)
 
+    st.subheader("Exportar")
+    _exportar_ui()
+
 
 def main() -> None:
     st.set_page_config(page_title="Agenda de Visitas", layout="wide")
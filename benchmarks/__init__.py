@@ -0,0 +1 @@
+"""Benchmarks da Agenda de Visitas (rodar da raiz do repo: python -m benchmarks.<nome>)."""
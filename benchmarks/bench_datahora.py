@@ -0,0 +1,114 @@
+"""Parse/ordenação de data_hora: por linha (como era no app) x datahora.py em lote.
+
+    python -m benchmarks.bench_datahora                # 100k valores
+    python -m benchmarks.bench_datahora 1000000 --json resultado.json
+
+Os valores vêm do benchmarks.gerador (estabelecimentos e missões).
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+
+import datahora
+from benchmarks.gerador import gerar
+
+
+def _sort_key_por_linha(value: str, original_index: int) -> tuple[int, str, int, int]:
+    """Cópia do antigo app._parse_datahora_sort_key (sem cache), como referência."""
+    value = (value or "").strip()
+    if not value or value.lower().startswith("a definir"):
+        return (1, "9999-12-31", 9999, original_index)
+    if " - " not in value:
+        return (0, "9999-12-31", 9999, original_index)
+    date_part, period_part = value.split(" - ", 1)
+    period_part = period_part.strip().lower()
+    try:
+        date_iso = datetime.strptime(date_part.strip(), "%d/%m/%Y").date().isoformat()
+    except ValueError:
+        return (0, "9999-12-31", 9999, original_index)
+    if ":" in period_part:
+        try:
+            hh, mm = period_part.split(":", 1)
+            minutes = int(hh) * 60 + int(mm)
+        except ValueError:
+            minutes = 12 * 60
+    else:
+        minutes = {"manhã": 9 * 60, "durante o dia": 13 * 60, "fim do dia": 18 * 60}.get(period_part, 12 * 60)
+    return (0, date_iso, minutes, original_index)
+
+
+def _valores(n: int, seed: int) -> list[str]:
+    valores: list[str] = []
+    for r in gerar(max(1, n // 2), seed):
+        valores.append(r["data_hora"])
+        valores.extend(m["data_hora"] for m in r["missoes"])
+    while len(valores) < n:
+        valores.extend(valores[: n - len(valores)])
+    return valores[:n]
+
+
+def _tempo(fn, repeticoes: int) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def medir(n: int, repeticoes: int = 3, seed: int = 42) -> dict:
+    valores = _valores(n, seed)
+    registros = [{"data_hora": v} for v in valores]
+    normalizados = []
+    isos, sem_datas = datahora.normalizar_lote(valores)
+    for v, iso, sem_data in zip(valores, isos, sem_datas):
+        normalizados.append({"data_hora": v, "data_hora_iso": iso, "sem_data": sem_data})
+
+    def lote_sem_cache() -> None:
+        datahora.parse.cache_clear()
+        datahora.normalizar_lote(valores)
+
+    def escalar_com_cache() -> None:
+        datahora.parse.cache_clear()
+        for v in valores:
+            datahora.normalizar(v)
+
+    return {
+        "n": n,
+        "parse_por_linha_s": _tempo(lambda: [_sort_key_por_linha(v, i) for i, v in enumerate(valores)], repeticoes),
+        "parse_escalar_lru_s": _tempo(escalar_com_cache, repeticoes),
+        "parse_lote_s": _tempo(lote_sem_cache, repeticoes),
+        "ordenar_por_linha_s": _tempo(
+            lambda: sorted(enumerate(valores), key=lambda p: _sort_key_por_linha(p[1], p[0])), repeticoes
+        ),
+        "ordenar_lote_s": _tempo(lambda: datahora.ordem(registros), repeticoes),
+        "ordenar_chaves_gravadas_s": _tempo(lambda: datahora.ordem(normalizados), repeticoes),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tamanhos", nargs="*", type=int, default=[100_000])
+    parser.add_argument("-r", "--repeticoes", type=int, default=3)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    resultados = []
+    for n in args.tamanhos:
+        r = medir(n, args.repeticoes)
+        resultados.append(r)
+        print(f"{n:>9} valores")
+        for chave, valor in r.items():
+            if chave != "n":
+                print(f"    {chave[:-2]:<26} {valor * 1000:10.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "datahora", "resultados": resultados}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
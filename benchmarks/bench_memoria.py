@@ -0,0 +1,64 @@
+"""Memória ocupada pelos estabelecimentos: dicts (formato atual) x models.Estabelecimento.
+
+    python -m benchmarks.bench_memoria               # 10k e 100k
+    python -m benchmarks.bench_memoria 1000 50000 --json resultado.json
+
+Mede com tracemalloc o que fica alocado depois de carregar o JSON em cada
+representação (sem contar o texto do arquivo).
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+
+import models
+from benchmarks.gerador import gerar
+
+def _medir(carregar, texto: str) -> tuple[int, object]:
+    gc.collect()
+    tracemalloc.start()
+    obj = carregar(texto)
+    gc.collect()
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return atual, obj
+
+
+def medir(n: int, seed: int = 42) -> dict:
+    texto = json.dumps(gerar(n, seed), ensure_ascii=False)
+
+    bytes_dict, dados = _medir(json.loads, texto)
+    del dados
+    bytes_slots, registros = _medir(lambda t: models.loads(t)[0], texto)
+    del registros
+
+    return {
+        "estabelecimentos": n,
+        "dict_bytes": bytes_dict,
+        "slots_bytes": bytes_slots,
+        "dict_bytes_por_registro": round(bytes_dict / n, 1),
+        "slots_bytes_por_registro": round(bytes_slots / n, 1),
+        "reducao": round(1 - bytes_slots / bytes_dict, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tamanhos", nargs="*", type=int, default=[10_000, 100_000])
+    parser.add_argument("--json", dest="json_path", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    resultados = [medir(n) for n in args.tamanhos]
+    for r in resultados:
+        print(
+            f"{r['estabelecimentos']:>8} estab.: dict {r['dict_bytes'] / 2**20:7.1f} MiB"
+            f" | slots {r['slots_bytes'] / 2**20:7.1f} MiB | -{r['reducao'] * 100:.0f}%"
+        )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "memoria", "resultados": resultados}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Servidor HTTP local que imita a parte da API do GitHub usada pelo app.
+
+Atende a Contents API (GET com ETag/304, PUT com conflito 409 quando o sha
+não bate) e o suficiente da Git Data API para o layout com um arquivo por
+estabelecimento (GITHUB_SHARD_DIR): refs, commits, trees e blobs. Tudo em
+memória, num único repositório/branch; o nome do repositório é ignorado.
+
+    python -m benchmarks.fake_github --port 8765
+    GITHUB_API_URL=http://127.0.0.1:8765 GITHUB_TOKEN=x GITHUB_REPO=a/b streamlit run app.py
+
+Fala HTTP/1.1 com Content-Length, então o keep-alive do GithubClient vale
+aqui também (`conexoes` conta as conexões TCP abertas).
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import re
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from storage import _git_blob_sha
+
+_RE_CONTENTS = re.compile(r"^/repos/[^/]+/[^/]+/contents/([^?]+)")
+_RE_TREE_DIR = re.compile(r"^/repos/[^/]+/[^/]+/git/trees/([^:/]+):(.+)$")
+_RE_BLOB = re.compile(r"^/repos/[^/]+/[^/]+/git/blobs/(\w+)$")
+_RE_REF = re.compile(r"^/repos/[^/]+/[^/]+/git/refs?/heads/(.+)$")
+_RE_COMMIT = re.compile(r"^/repos/[^/]+/[^/]+/git/commits/(\w+)$")
+
+
+class _Repo:
+    """Estado do repositório falso: blobs, árvores planas (path -> blob sha) e commits."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.blobs: dict[str, bytes] = {}
+        self.trees: dict[str, dict[str, str]] = {}
+        self.commits: dict[str, tuple[str, str | None]] = {}
+        self.refs: dict[str, str] = {}
+        self.requisicoes = 0
+        self.conexoes = 0
+
+    def _tree(self, files: dict[str, str]) -> str:
+        sha = hashlib.sha1(json.dumps(sorted(files.items())).encode()).hexdigest()
+        self.trees[sha] = dict(files)
+        return sha
+
+    def _commit(self, tree: str, parent: str | None, message: str) -> str:
+        sha = hashlib.sha1(f"{tree}{parent}{message}{len(self.commits)}".encode()).hexdigest()
+        self.commits[sha] = (tree, parent)
+        return sha
+
+    def head_files(self, rev: str) -> dict[str, str]:
+        """Arquivos de um branch ou de um commit (sha)."""
+        head = self.refs.get(rev) or (rev if rev in self.commits else None)
+        return dict(self.trees[self.commits[head][0]]) if head else {}
+
+    def write_file(self, branch: str, path: str, content: bytes, message: str) -> str:
+        blob = _git_blob_sha(content)
+        self.blobs[blob] = content
+        files = self.head_files(branch)
+        files[path] = blob
+        self.refs[branch] = self._commit(self._tree(files), self.refs.get(branch), message)
+        return blob
+
+    @staticmethod
+    def listing(files: dict[str, str], prefix: str = "") -> dict | None:
+        """Listagem não recursiva (como a da API) dos arquivos sob `prefix`.
+
+        Subdiretórios viram uma entrada "tree" cujo sha é o da listagem dele,
+        então o sha de um diretório é o mesmo visto de cima ou listado direto.
+        """
+        sub = {p[len(prefix):]: s for p, s in files.items() if p.startswith(prefix)}
+        if not sub:
+            return None
+        entries = [
+            {"path": k, "mode": "100644", "type": "blob", "sha": v} for k, v in sorted(sub.items()) if "/" not in k
+        ]
+        for nome in sorted({k.split("/", 1)[0] for k in sub if "/" in k}):
+            sha = _Repo.listing(sub, f"{nome}/")["sha"]
+            entries.append({"path": nome, "mode": "040000", "type": "tree", "sha": sha})
+        return {
+            "sha": hashlib.sha1(json.dumps(sorted(sub.items())).encode()).hexdigest(),
+            "tree": entries,
+            "truncated": False,
+        }
+
+    def dir_listing(self, rev: str, directory: str) -> dict | None:
+        commit = self.refs.get(rev) or rev
+        if commit not in self.commits:
+            return None
+        return self.listing(self.trees[self.commits[commit][0]], directory.rstrip("/") + "/")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    repo: _Repo
+    branch = "main"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.repo.lock:
+            self.repo.conexoes += 1
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, code: int, body: dict | None = None, headers: dict | None = None) -> None:
+        raw = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(code)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _json_body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _route(self) -> tuple[str, dict]:
+        parts = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(parts.query))
+        with self.repo.lock:
+            self.repo.requisicoes += 1
+        return urllib.parse.unquote(parts.path), query
+
+    def do_GET(self) -> None:
+        path, query = self._route()
+        repo = self.repo
+        with repo.lock:
+            m = _RE_CONTENTS.match(path)
+            if m:
+                branch = query.get("ref", self.branch)
+                blob = repo.head_files(branch).get(m.group(1))
+                if blob is None:
+                    return self._send(404, {"message": "Not Found"})
+                etag = f'"{blob}"'
+                if self.headers.get("If-None-Match") == etag:
+                    return self._send(304, None, {"ETag": etag})
+                content = base64.b64encode(repo.blobs[blob]).decode("ascii")
+                return self._send(200, {"sha": blob, "encoding": "base64", "content": content}, {"ETag": etag})
+            m = _RE_TREE_DIR.match(path)
+            if m:
+                listing = repo.dir_listing(*m.groups())
+                return self._send(200, listing) if listing else self._send(404, {"message": "Not Found"})
+            m = _RE_BLOB.match(path)
+            if m and m.group(1) in repo.blobs:
+                content = base64.b64encode(repo.blobs[m.group(1)]).decode("ascii")
+                return self._send(200, {"sha": m.group(1), "encoding": "base64", "content": content})
+            m = _RE_REF.match(path)
+            if m and m.group(1) in repo.refs:
+                return self._send(200, {"object": {"sha": repo.refs[m.group(1)], "type": "commit"}})
+            m = _RE_COMMIT.match(path)
+            if m and m.group(1) in repo.commits:
+                return self._send(200, {"sha": m.group(1), "tree": {"sha": repo.commits[m.group(1)][0]}})
+        self._send(404, {"message": "Not Found"})
+
+    def do_PUT(self) -> None:
+        path, _ = self._route()
+        payload = self._json_body()
+        m = _RE_CONTENTS.match(path)
+        if not m:
+            return self._send(404, {"message": "Not Found"})
+        branch = payload.get("branch") or self.branch
+        with self.repo.lock:
+            atual = self.repo.head_files(branch).get(m.group(1))
+            if atual and payload.get("sha") != atual:
+                return self._send(409, {"message": f"{m.group(1)} does not match {payload.get('sha')}"})
+            blob = self.repo.write_file(
+                branch, m.group(1), base64.b64decode(payload.get("content") or ""), payload.get("message", "")
+            )
+        self._send(201 if atual is None else 200, {"content": {"sha": blob, "path": m.group(1)}})
+
+    def do_POST(self) -> None:
+        path, _ = self._route()
+        payload = self._json_body()
+        repo = self.repo
+        with repo.lock:
+            if path.endswith("/git/trees"):
+                files = dict(repo.trees.get(payload.get("base_tree"), {}))
+                for entry in payload.get("tree", []):
+                    if "content" in entry:
+                        content = entry["content"].encode("utf-8")
+                        blob = _git_blob_sha(content)
+                        repo.blobs[blob] = content
+                        files[entry["path"]] = blob
+                    elif entry.get("sha") is None:
+                        files.pop(entry["path"], None)
+                    else:
+                        files[entry["path"]] = entry["sha"]
+                sha = repo._tree(files)
+                return self._send(201, {"sha": sha, "tree": (repo.listing(files) or {}).get("tree", [])})
+            if path.endswith("/git/commits"):
+                parents = payload.get("parents") or [None]
+                sha = repo._commit(payload["tree"], parents[0], payload.get("message", ""))
+                return self._send(201, {"sha": sha, "tree": {"sha": payload["tree"]}})
+        self._send(404, {"message": "Not Found"})
+
+    def do_PATCH(self) -> None:
+        path, _ = self._route()
+        payload = self._json_body()
+        m = _RE_REF.match(path)
+        with self.repo.lock:
+            if not m or payload.get("sha") not in self.repo.commits:
+                return self._send(422, {"message": "Invalid request"})
+            branch = m.group(1)
+            if not payload.get("force") and self.repo.commits[payload["sha"]][1] != self.repo.refs.get(branch):
+                return self._send(422, {"message": "Update is not a fast forward"})
+            self.repo.refs[branch] = payload["sha"]
+        self._send(200, {"object": {"sha": payload["sha"], "type": "commit"}})
+
+
+class FakeGithubServer:
+    """Sobe o servidor numa thread; use `url` como GITHUB_API_URL."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, branch: str = "main") -> None:
+        self.repo = _Repo()
+        # Como um repositório de verdade: o branch já existe (commit inicial vazio)
+        self.repo.refs[branch] = self.repo._commit(self.repo._tree({}), None, "Initial commit")
+        handler = type("Handler", (_Handler,), {"repo": self.repo, "branch": branch})
+        self.branch = branch
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def seed_file(self, path: str, content: bytes, message: str = "seed") -> str:
+        """Grava um arquivo direto no branch (sem passar pela API). Retorna o sha do blob."""
+        with self.repo.lock:
+            return self.repo.write_file(self.branch, path, content, message)
+
+    def start(self) -> "FakeGithubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-github", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeGithubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--branch", default="main")
+    parser.add_argument("--dados", help="dados.json inicial (gravado como GITHUB_DATA_PATH)")
+    parser.add_argument("--path", default="dados.json", help="caminho do arquivo no repositório")
+    args = parser.parse_args()
+
+    server = FakeGithubServer(args.host, args.port, args.branch)
+    if args.dados:
+        with open(args.dados, "rb") as f:
+            server.seed_file(args.path, f.read())
+    print(f"GitHub falso em {server.url} (Ctrl+C para sair)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Gerador de dados.json sintéticos para os benchmarks.
+
+    python -m benchmarks.gerador 100000 -o /tmp/dados_100k.json
+    python -m benchmarks.gerador 1000 --legado -o /tmp/dados_1k.json   # lista pura (v0)
+
+Os valores imitam os do app: data_hora como "13/01/2026 - Manhã",
+"16/01/2026 - 07:30", "A Definir"/"A definir" e horário solto ("07:30");
+missões com faixas como "13 - 17 horas". Mesma semente = mesmo arquivo.
+"""
+
+import argparse
+import json
+import random
+import uuid
+
+from models import ETAPAS_PADRAO
+
+SCHEMA_VERSION = 1
+
+_LOCAIS = [
+    "Açougue",
+    "Padaria",
+    "Mercadinho",
+    "Farmácia",
+    "Açaí",
+    "Restaurante",
+    "Lanchonete",
+    "Granja",
+    "Drogaria",
+    "Salgados",
+]
+_PERIODOS = ["Manhã", "Durante o dia", "Fim do dia", "07:30", "14:00", "09:15"]
+_RESPONSAVEIS = ["", "", "Neo", "Frodo", "Troio"]
+_TITULOS = ["Treinamento", "Controle de estoque", "Cadastrar produtos", "Vincular conta", "Retorno"]
+
+
+def _data_hora(rng: random.Random, missao: bool = False) -> str:
+    r = rng.random()
+    if r < 0.15:
+        return rng.choice(["A Definir", "A definir"])
+    if r < 0.2:
+        return rng.choice(["07:30", "13 - 17 horas"] if missao else ["07:30", "Manhã"])
+    return f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2026 - {rng.choice(_PERIODOS)}"
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def registro(i: int, rng: random.Random) -> dict:
+    etapas = {e: rng.random() < 0.5 for e in ETAPAS_PADRAO}
+    feitas = sum(etapas.values())
+    missoes = [
+        {
+            "id": _uuid(rng),
+            "titulo": f"{rng.choice(_TITULOS)} {j + 1}",
+            "data_hora": _data_hora(rng, missao=True),
+            "status": rng.choice(["Pendente", "Feito"]),
+            "notas": "",
+            "ultima_atualizacao": "Por Neo em 13/01/2026 15:52",
+        }
+        for j in range(rng.choice([0, 0, 0, 1, 1, 2, 3]))
+    ]
+    return {
+        "local": f"{rng.choice(_LOCAIS)} {i}",
+        "data_hora": _data_hora(rng),
+        "etapas": etapas,
+        "status": "Concluído" if feitas == len(etapas) else ("Em andamento" if feitas else "Pendente"),
+        "prioridade": rng.choice(["", "Alta", "Média", "Baixa"]),
+        "responsavel": rng.choice(_RESPONSAVEIS),
+        "notas": rng.choice(["", "", "Voltar para fazer o treinamento", "Ligar antes"]),
+        "ultima_atualizacao": rng.choice(["", "Por Neo em 13/01/2026 15:53"]),
+        "id": _uuid(rng),
+        "missoes": missoes,
+    }
+
+
+def gerar(n: int, seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    return [registro(i, rng) for i in range(n)]
+
+
+def gerar_documento(n: int, seed: int = 42, legado: bool = False):
+    data = gerar(n, seed)
+    return data if legado else {"schema_version": SCHEMA_VERSION, "estabelecimentos": data}
+
+
+def gravar(path: str, n: int, seed: int = 42, legado: bool = False) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(gerar_documento(n, seed, legado), f, ensure_ascii=False, indent=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("n", type=int, help="quantidade de estabelecimentos (ex: 1000 a 1000000)")
+    parser.add_argument("-o", "--output", default="dados.json")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--legado", action="store_true", help="grava a lista pura (schema v0)")
+    args = parser.parse_args()
+    gravar(args.output, args.n, args.seed, args.legado)
+    print(f"{args.n} estabelecimentos gravados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
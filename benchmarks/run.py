@@ -0,0 +1,217 @@
+"""Benchmarks dos caminhos quentes do app, com dados sintéticos.
+
+    python -m benchmarks.run                          # 1k e 10k
+    python -m benchmarks.run 1000 100000 --json atual.json
+    python -m benchmarks.run 10000 --comparar base.json --tolerancia 0.2
+
+Casos (cada um com N estabelecimentos de benchmarks.gerador):
+- load_data frio (sem cache) e quente (file_key igual);
+- migrate_data a partir da lista antiga (schema v0);
+- ordenação por data/hora (datahora.ordem, sobre as chaves já gravadas);
+- as duas tabelas do main_ui (build_overview_table/build_missions_table)
+  e a leitura delas já em cache (overview_tables, dados sem mudança);
+- índice de busca (busca.IndiceBusca): montagem completa e uma consulta;
+- GITHUB_SYNC contra o servidor falso (benchmarks.fake_github): leitura
+  fria, leitura com 304 e um save (PUT);
+- gerar_agenda.gerar: a planilha dos N estabelecimentos (write-only);
+- importar.mesclar: reimportar o CSV exportado (leitura em streaming + diff, sem o save).
+
+Roda num DATA_DIR temporário; o dados.json do repositório não é tocado.
+O backend local segue DATA_BACKEND/DATA_JOURNAL, como no app. Com --comparar, sai com
+código 1 se alguma mediana piorou mais que a tolerância.
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.fake_github import FakeGithubServer
+from benchmarks.gerador import gerar
+
+_DATA_DIR = tempfile.mkdtemp(prefix="pedegenda-bench-")
+os.environ["DATA_DIR"] = _DATA_DIR
+# Fora do `streamlit run` o cache_resource avisa a cada chamada; aqui é esperado
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+import app  # noqa: E402  (precisa do DATA_DIR acima)
+import datahora  # noqa: E402
+from busca import IndiceBusca  # noqa: E402
+import exportacoes  # noqa: E402
+import gerar_agenda  # noqa: E402
+import importar  # noqa: E402
+
+
+def _cronometrar(fn, repeticoes: int, preparar=None) -> dict:
+    tempos = []
+    for _ in range(repeticoes):
+        args = (preparar() if preparar else None) or ()
+        gc.collect()
+        inicio = time.perf_counter()
+        fn(*args)
+        tempos.append(time.perf_counter() - inicio)
+    return {
+        "min_s": min(tempos),
+        "mediana_s": statistics.median(tempos),
+        "repeticoes": repeticoes,
+    }
+
+
+def _gravar_dados(data: list[dict]) -> None:
+    with open(app.DATA_FILE, "w", encoding="utf-8") as f:
+        json.dump(app.to_document(data, app.SCHEMA_VERSION), f, ensure_ascii=False, indent=2)
+
+
+def _limpar_local() -> None:
+    for nome in os.listdir(_DATA_DIR):
+        os.remove(os.path.join(_DATA_DIR, nome))
+    app._storage.clear()
+    app._data_cache.clear()
+
+
+@contextlib.contextmanager
+def _github_falso(server: FakeGithubServer):
+    anterior = (app.GITHUB_SYNC, app.GITHUB_TOKEN, app.GITHUB_REPO, app.GITHUB_API_URL, app.GITHUB_SYNC_INTERVAL)
+    app.GITHUB_SYNC, app.GITHUB_TOKEN, app.GITHUB_REPO = True, "bench", "bench/pedegenda"
+    app.GITHUB_API_URL = server.url
+    # O save é medido direto no storage; o worker não deve disparar sozinho
+    app.GITHUB_SYNC_INTERVAL = 3600
+    app._github.clear()
+    app._github_sync.clear()
+    try:
+        yield
+    finally:
+        app._github().client.close()
+        (app.GITHUB_SYNC, app.GITHUB_TOKEN, app.GITHUB_REPO, app.GITHUB_API_URL, app.GITHUB_SYNC_INTERVAL) = anterior
+        app._github.clear()
+        app._github_sync.clear()
+        app._data_cache.clear()
+
+
+def medir(n: int, repeticoes: int, seed: int = 42) -> list[dict]:
+    legado = gerar(n, seed)
+    texto_legado = json.dumps(legado, ensure_ascii=False)
+    atual, _ = app.migrate_data(json.loads(texto_legado), 0)
+    resultados: list[dict] = []
+
+    def caso(nome: str, fn, preparar=None, reps: int | None = None) -> None:
+        r = _cronometrar(fn, reps or repeticoes, preparar)
+        resultados.append({"caso": nome, "n": n, **r})
+        print(f"{n:>9} {nome:<22} min {r['min_s'] * 1000:10.2f} ms | mediana {r['mediana_s'] * 1000:10.2f} ms")
+
+    caso("migrate_data_v0", lambda d: app.migrate_data(d, 0), lambda: (json.loads(texto_legado),))
+
+    _limpar_local()
+    _gravar_dados(atual)
+    caso("load_data_frio", app.load_data, app._data_cache.clear)
+    caso("load_data_quente", app.load_data)
+
+    caso("ordenar_data_hora", lambda: datahora.ordem(atual))
+    caso("tabela_visao_geral", lambda: app.build_overview_table(atual))
+    caso("tabela_missoes", lambda: app.build_missions_table(atual))
+    app.overview_tables()
+    caso("tabelas_em_cache", app.overview_tables)
+    caso("indice_busca", lambda: IndiceBusca.de_registros(atual))
+    indice = IndiceBusca.de_registros(atual)
+    caso("buscar_prefixo", lambda: indice.buscar("acai trein"), reps=max(repeticoes, 20))
+
+    with FakeGithubServer() as server:
+        documento = app.to_document(atual, app.SCHEMA_VERSION)
+        server.seed_file(app.GITHUB_DATA_PATH, json.dumps(documento, ensure_ascii=False, indent=2).encode("utf-8"))
+        with _github_falso(server):
+
+            def frio() -> None:
+                app._github.clear()
+                app._github_sync.clear()
+                app._data_cache.clear()
+
+            caso("github_load_frio", app.load_data, frio)
+            caso("github_load_304", app.load_data)
+
+            def salvar() -> None:
+                worker = app._github_sync()
+                worker.sha = app._github().save(documento, worker.sha, "bench")
+
+            caso("github_save", salvar)
+
+    with tempfile.TemporaryDirectory(prefix="pedegenda-xlsx-") as tmp:
+        saida = os.path.join(tmp, "Agenda_Visitas.xlsx")
+        caso("gerar_agenda", lambda: gerar_agenda.gerar(atual, saida))
+
+    planilha_csv = exportacoes.para_csv(atual)
+    caso("importar_csv", lambda: importar.mesclar(atual, importar.ler(io.BytesIO(planilha_csv), "agenda.csv")))
+
+    _limpar_local()
+    return resultados
+
+
+def comparar(resultados: list[dict], base_path: str, tolerancia: float) -> list[str]:
+    """Casos cuja mediana piorou mais que `tolerancia` (0.2 = 20%) em relação à base."""
+    with open(base_path, "r", encoding="utf-8") as f:
+        base = {(r["caso"], r["n"]): r for r in json.load(f).get("resultados", [])}
+    regressoes = []
+    for r in resultados:
+        anterior = base.get((r["caso"], r["n"]))
+        if not anterior or not anterior["mediana_s"]:
+            continue
+        razao = r["mediana_s"] / anterior["mediana_s"]
+        if razao > 1 + tolerancia:
+            regressoes.append(
+                f"{r['caso']} (n={r['n']}): {anterior['mediana_s'] * 1000:.2f} ms -> "
+                f"{r['mediana_s'] * 1000:.2f} ms (+{(razao - 1) * 100:.0f}%)"
+            )
+    return regressoes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tamanhos", nargs="*", type=int, default=[1_000, 10_000])
+    parser.add_argument("-r", "--repeticoes", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--comparar", help="resultado anterior (--json) para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args()
+
+    resultados: list[dict] = []
+    for n in args.tamanhos:
+        resultados.extend(medir(n, args.repeticoes, args.seed))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "benchmark": "run",
+                    "meta": {
+                        "quando": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "plataforma": platform.platform(),
+                        "backend": app.DATA_BACKEND,
+                        "seed": args.seed,
+                    },
+                    "resultados": resultados,
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+    if args.comparar:
+        regressoes = comparar(resultados, args.comparar, args.tolerancia)
+        for linha in regressoes:
+            print(f"REGRESSÃO: {linha}")
+        if regressoes:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
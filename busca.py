@@ -0,0 +1,154 @@
+"""Índice invertido para a busca da lista de estabelecimentos.
+
+Cobre `local`, `notas` e `responsavel` do estabelecimento e `titulo`/`notas`
+de cada missão (uma missão encontrada devolve o estabelecimento dela).
+Acentos e maiúsculas não contam ("acai" acha "Açaí") e cada palavra da
+consulta casa por prefixo ("trein" acha "treinamento"); com várias palavras,
+o registro precisa ter todas.
+
+O índice fica em memória junto com os dados (app._DataCache) e é atualizado
+por registro a cada save, como os agregados: nada é reconstruído por consulta.
+"""
+
+import bisect
+import contextlib
+import re
+import unicodedata
+
+CAMPOS = ("local", "notas", "responsavel")
+CAMPOS_MISSAO = ("titulo", "notas")
+
+_PALAVRA = re.compile(r"\w+")
+
+
+def dobrar(texto: str | None) -> str:
+    """"Açaí do Vizinho" -> "acai do vizinho"."""
+    decomposto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def termos(texto: str | None) -> list[str]:
+    return _PALAVRA.findall(dobrar(texto))
+
+
+def termos_do_registro(item: dict) -> set[str]:
+    encontrados: set[str] = set()
+    for campo in CAMPOS:
+        encontrados.update(termos(item.get(campo)))
+    for m in item.get("missoes") or []:
+        if isinstance(m, dict):
+            for campo in CAMPOS_MISSAO:
+                encontrados.update(termos(m.get(campo)))
+    return encontrados
+
+
+class IndiceBusca:
+    # A partir de quantos registros alterados atualizar_lista reordena o vocabulário de uma vez
+    LOTE_MIN = 64
+
+    def __init__(self) -> None:
+        # termo -> ids dos estabelecimentos que o contêm
+        self.postings: dict[str, set[str]] = {}
+        # Os mesmos termos, ordenados (prefixo = faixa contígua, via bisect)
+        self.vocabulario: list[str] = []
+        # id -> termos indexados (para tirar o registro antigo sem reprocessá-lo)
+        self.por_id: dict[str, set[str]] = {}
+        # Em lote, `vocabulario` só é refeito no fim (ver _em_lote)
+        self._lote = False
+
+    @classmethod
+    def de_registros(cls, data: list[dict]) -> "IndiceBusca":
+        indice = cls()
+        with indice._em_lote():
+            for item in data:
+                indice.indexar(item)
+        return indice
+
+    @contextlib.contextmanager
+    def _em_lote(self):
+        """Muitos registros de uma vez: um insort por termo novo custaria O(V²);
+        aqui só `postings` é mexido e o vocabulário é ordenado uma vez no fim."""
+        self._lote = True
+        try:
+            yield
+        finally:
+            self._lote = False
+            self.vocabulario = sorted(self.postings)
+
+    def __len__(self) -> int:
+        return len(self.por_id)
+
+    def indexar(self, item: dict | None) -> None:
+        """(Re)indexa um estabelecimento: só os termos que mudaram são mexidos."""
+        if not isinstance(item, dict) or not item.get("id"):
+            return
+        est_id = item["id"]
+        novos = termos_do_registro(item)
+        antigos = self.por_id.get(est_id, set())
+        for termo in antigos - novos:
+            self._tirar(termo, est_id)
+        for termo in novos - antigos:
+            ids = self.postings.get(termo)
+            if ids is None:
+                ids = self.postings[termo] = set()
+                if not self._lote:
+                    bisect.insort(self.vocabulario, termo)
+            ids.add(est_id)
+        self.por_id[est_id] = novos
+
+    def remover(self, est_id: str | None) -> None:
+        for termo in self.por_id.pop(est_id, ()):
+            self._tirar(termo, est_id)
+
+    def _tirar(self, termo: str, est_id: str) -> None:
+        ids = self.postings[termo]
+        ids.discard(est_id)
+        if not ids:
+            del self.postings[termo]
+            if not self._lote:
+                del self.vocabulario[bisect.bisect_left(self.vocabulario, termo)]
+
+    def atualizar(self, anterior: dict | None, novo: dict | None) -> None:
+        """Troca `anterior` por `novo` (None = inexistente), como Agregados.atualizar."""
+        if isinstance(anterior, dict) and (novo is None or anterior.get("id") != novo.get("id")):
+            self.remover(anterior.get("id"))
+        self.indexar(novo)
+
+    def atualizar_lista(self, anteriores: list[dict], novos: list[dict]) -> None:
+        """Aplica a diferença entre duas versões da lista (por id)."""
+        por_id = {item.get("id"): item for item in anteriores if isinstance(item, dict)}
+        mudaram = []
+        for item in novos:
+            if not isinstance(item, dict):
+                continue
+            anterior = por_id.pop(item.get("id"), None)
+            if anterior is None or anterior != item:
+                mudaram.append(item)
+        grande = len(mudaram) + len(por_id) > self.LOTE_MIN
+        with self._em_lote() if grande else contextlib.nullcontext():
+            for item in mudaram:
+                self.indexar(item)
+            for removido in por_id:
+                self.remover(removido)
+
+    def _com_prefixo(self, prefixo: str) -> set[str]:
+        vocabulario = self.vocabulario
+        i = bisect.bisect_left(vocabulario, prefixo)
+        ids: set[str] = set()
+        while i < len(vocabulario) and vocabulario[i].startswith(prefixo):
+            ids |= self.postings[vocabulario[i]]
+            i += 1
+        return ids
+
+    def buscar(self, consulta: str) -> set[str]:
+        """Ids dos estabelecimentos com todas as palavras de `consulta` (por prefixo)."""
+        # Palavras mais longas casam com menos termos: começa por elas
+        palavras = sorted(set(termos(consulta)), key=len, reverse=True)
+        if not palavras:
+            return set()
+        resultado = self._com_prefixo(palavras[0])
+        for palavra in palavras[1:]:
+            if not resultado:
+                break
+            resultado &= self._com_prefixo(palavra)
+        return resultado
@@ -0,0 +1,191 @@
+"""Interpretação do campo livre data_hora (app.py e gerar_agenda.py).
+
+Valores reais: "13/01/2026 - Manhã", "16/01/2026 - 07:30", "A Definir",
+"A Definir - Marcar dia", "07:30", "13 - 17 horas", "18/01/2026 - 14h".
+Cada valor cai numa classe:
+
+- DATADO (0): tem data; a hora vem do horário/faixa (início) ou do período
+  ("manhã", "tarde", ...), e sem nada disso fica meio-dia;
+- SEM_DATA (1): não dá para achar a data (ex: só "07:30");
+- A_DEFINIR (2): vazio ou "A definir ...".
+
+A ordem é sempre: datados (por data e hora), depois sem data, depois "A
+Definir"; empates mantêm a ordem original. `parse` trata um valor (com
+cache); `parse_lote` trata uma coluna inteira de uma vez com pandas, parseando
+só os valores distintos. `ordem`/`ordenar` é a ordenação usada pelo app e
+pela planilha.
+"""
+
+import functools
+import re
+from typing import NamedTuple, Sequence
+
+import numpy as np
+import pandas as pd
+
+DATADO, SEM_DATA, A_DEFINIR = 0, 1, 2
+
+MINUTOS_PADRAO = 12 * 60
+
+# Do mais específico para o mais genérico ("fim da tarde" antes de "tarde")
+PERIODOS = [
+    ("fim do dia", 18 * 60),
+    ("fim da tarde", 17 * 60),
+    ("durante o dia", 13 * 60),
+    ("meio dia", 12 * 60),
+    ("meio-dia", 12 * 60),
+    ("manhã", 9 * 60),
+    ("manha", 9 * 60),
+    ("tarde", 15 * 60),
+    ("noite", 20 * 60),
+]
+
+_RE_DATA = r"^(?P<data>\d{1,2}/\d{1,2}/\d{4})?\s*(?:[-–]\s*)?(?P<resto>.*)$"
+# Horário ou faixa: "07:30", "14h", "9h30", "13 horas", "13 - 17 horas", "13h às 17h"
+_HORA = r"\d{1,2}(?::\d{2}|h\d{0,2}|\s*horas?)?"
+_RE_HORA = (
+    r"^(?P<h>\d{1,2})(?::(?P<m>\d{2})|h(?P<m2>\d{2})?|\s*horas?)?"
+    rf"(?:\s*(?:-|–|até|às|as|a)\s*{_HORA})?\s*(?:h|horas?)?$"
+)
+_DATA = re.compile(_RE_DATA)
+_HORARIO = re.compile(_RE_HORA)
+
+
+class DataHora(NamedTuple):
+    classe: int
+    # "AAAA-MM-DD" (só DATADO)
+    data: str | None
+    # Minutos desde 00:00 (None se não houver hora nem período)
+    minutos: int | None
+
+
+def _minutos_do_texto(resto: str) -> int | None:
+    m = _HORARIO.match(resto)
+    if m:
+        h = int(m.group("h"))
+        mi = int(m.group("m") or m.group("m2") or 0)
+        return h * 60 + mi if h < 24 and mi < 60 else None
+    for palavra, minutos in PERIODOS:
+        if palavra in resto:
+            return minutos
+    return None
+
+
+@functools.lru_cache(maxsize=8192)
+def parse(value: str) -> DataHora:
+    # Quebras de linha/tabs (ex: célula de planilha) viram um espaço, como em _parse_unicos
+    value = " ".join((value or "").split()).lower()
+    if not value or value.startswith("a definir"):
+        return DataHora(A_DEFINIR, None, None)
+
+    m = _DATA.match(value)
+    resto = m.group("resto").strip()
+    minutos = _minutos_do_texto(resto) if resto else None
+    if m.group("data"):
+        dia, mes, ano = (int(p) for p in m.group("data").split("/"))
+        try:
+            data = pd.Timestamp(year=ano, month=mes, day=dia).date().isoformat()
+        except ValueError:
+            return DataHora(SEM_DATA, None, minutos)
+        return DataHora(DATADO, data, MINUTOS_PADRAO if minutos is None else minutos)
+    return DataHora(SEM_DATA, None, minutos)
+
+
+def normalizar(value: str) -> tuple[str, bool]:
+    """"13/01/2026 - Manhã" -> ("2026-01-13T09:00", False); "A Definir" -> ("", True)."""
+    classe, data, minutos = parse(value)
+    if classe != DATADO:
+        return "", classe == A_DEFINIR
+    return f"{data}T{minutos // 60:02d}:{minutos % 60:02d}", False
+
+
+def _parse_unicos(valores: Sequence[str]) -> tuple[np.ndarray, pd.DataFrame]:
+    """(códigos, tabela dos valores distintos): linha i de `valores` = tabela[códigos[i]]."""
+
+    # data_hora tem poucos valores distintos: parseia cada um só uma vez
+    codigos, unicos = pd.factorize(pd.Series(valores, dtype="object"), use_na_sentinel=False)
+    u = (
+        pd.Series(unicos, dtype="object")
+        .fillna("")
+        .astype(str)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+        .str.lower()
+    )
+
+    a_definir = (u == "") | u.str.startswith("a definir")
+    partes = u.str.extract(_RE_DATA)
+    resto = partes["resto"].fillna("").str.strip()
+    data = pd.to_datetime(partes["data"], format="%d/%m/%Y", errors="coerce")
+
+    hora = resto.str.extract(_RE_HORA)
+    h = pd.to_numeric(hora["h"], errors="coerce")
+    mi = pd.to_numeric(hora["m"].fillna(hora["m2"]), errors="coerce").fillna(0)
+    minutos = (h * 60 + mi).where((h < 24) & (mi < 60))
+    sem_hora = minutos.isna()
+    for palavra, valor in PERIODOS:
+        achou = sem_hora & resto.str.contains(palavra, regex=False)
+        minutos = minutos.mask(achou, valor)
+        sem_hora &= ~achou
+
+    datado = ~a_definir & data.notna()
+    classe = np.where(a_definir, A_DEFINIR, np.where(datado, DATADO, SEM_DATA)).astype("int8")
+    minutos = minutos.mask(datado & minutos.isna(), MINUTOS_PADRAO).mask(a_definir)
+    tabela = pd.DataFrame(
+        {"classe": classe, "data": data.where(datado), "minutos": minutos.fillna(-1).astype("int16")}
+    )
+    return codigos, tabela
+
+
+def parse_lote(valores: Sequence[str]) -> pd.DataFrame:
+    """Versão vetorizada de `parse` para uma coluna inteira.
+
+    Retorna um DataFrame (mesma ordem de `valores`) com `classe` (int8),
+    `data` (datetime64, NaT se não DATADO) e `minutos` (int16, -1 se nenhum).
+    """
+
+    codigos, tabela = _parse_unicos(valores)
+    return pd.DataFrame({col: tabela[col].to_numpy()[codigos] for col in tabela.columns})
+
+
+def normalizar_lote(valores: Sequence[str]) -> tuple[list[str], list[bool]]:
+    """`normalizar` para uma coluna inteira: (data_hora_iso, sem_data)."""
+    codigos, tabela = _parse_unicos(valores)
+    minutos = tabela["minutos"].astype("int32")
+    iso = (
+        tabela["data"].dt.strftime("%Y-%m-%d")
+        + "T"
+        + (minutos // 60).astype(str).str.zfill(2)
+        + ":"
+        + (minutos % 60).astype(str).str.zfill(2)
+    ).where(tabela["classe"] == DATADO, "")
+    sem_data = (tabela["classe"] == A_DEFINIR).to_numpy()
+    return iso.to_numpy(dtype=object)[codigos].tolist(), sem_data[codigos].tolist()
+
+
+def ordem(registros: Sequence[dict], campo: str = "data_hora") -> np.ndarray:
+    """Índices que ordenam `registros` por data/hora (estável).
+
+    Usa data_hora_iso/sem_data gravados no registro; só os que não os têm
+    são parseados (em lote) a partir de `campo`.
+    """
+
+    n = len(registros)
+    isos = [r.get("data_hora_iso") for r in registros]
+    sem = [r.get("sem_data") for r in registros]
+    faltando = [i for i in range(n) if isos[i] is None or sem[i] is None]
+    if faltando:
+        novos_iso, novos_sem = normalizar_lote([registros[i].get(campo, "") for i in faltando])
+        for i, iso, s in zip(faltando, novos_iso, novos_sem):
+            isos[i], sem[i] = iso, s
+
+    iso_arr = np.array(isos, dtype="U16")
+    sem_arr = np.array(sem, dtype=bool)
+    classe = np.where(sem_arr, A_DEFINIR, np.where(iso_arr == "", SEM_DATA, DATADO))
+    # lexsort: a última chave é a principal
+    return np.lexsort((np.arange(n), iso_arr, classe))
+
+
+def ordenar(registros: Sequence[dict], campo: str = "data_hora") -> list[dict]:
+    """`registros` ordenados por data/hora: datados, sem data, "A Definir"."""
+    return [registros[i] for i in ordem(registros, campo)]
@@ -0,0 +1,114 @@
+"""Exportações da agenda para download no app (XLSX, CSV e Parquet).
+
+Cada arquivo é gerado em memória numa thread própria (não no rerun da
+página) e guardado junto com a versão dos dados de onde saiu: enquanto nada
+for salvo, baixar de novo só devolve os bytes já prontos. O XLSX é o mesmo
+do gerar_agenda.py (abas, estilos e formatação condicional); CSV e Parquet
+têm as colunas da aba "Agenda Visitas".
+"""
+
+import io
+import threading
+from typing import Callable, Hashable, NamedTuple
+
+import pandas as pd
+
+import gerar_agenda
+
+
+def tabela(data: list[dict]) -> pd.DataFrame:
+    """Aba "Agenda Visitas" como DataFrame (mesma ordem e colunas)."""
+    return pd.DataFrame(list(gerar_agenda.linhas(data)), columns=[nome for nome, _ in gerar_agenda.AGENDA.colunas])
+
+
+def para_xlsx(data: list[dict]) -> bytes:
+    buf = io.BytesIO()
+    gerar_agenda.gerar(data, buf)
+    return buf.getvalue()
+
+
+def para_csv(data: list[dict]) -> bytes:
+    # Com BOM: o Excel abre com os acentos certos
+    return tabela(data).to_csv(index=False).encode("utf-8-sig")
+
+
+def para_parquet(data: list[dict]) -> bytes:
+    """Precisa do pyarrow (ou fastparquet); sem eles, ImportError."""
+    buf = io.BytesIO()
+    tabela(data).to_parquet(buf, index=False)
+    return buf.getvalue()
+
+
+class Formato(NamedTuple):
+    rotulo: str
+    arquivo: str
+    mime: str
+    gerar: Callable[[list[dict]], bytes]
+
+
+FORMATOS = {
+    "xlsx": Formato(
+        "XLSX",
+        gerar_agenda.SAIDA_PADRAO,
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        para_xlsx,
+    ),
+    "csv": Formato("CSV", "Agenda_Visitas.csv", "text/csv", para_csv),
+    "parquet": Formato("Parquet", "Agenda_Visitas.parquet", "application/vnd.apache.parquet", para_parquet),
+}
+
+
+class Exportador:
+    """Gera as exportações em segundo plano e guarda a última de cada formato.
+
+    `versao` é qualquer valor que mude quando os dados mudam (o app usa a
+    versão do cache compartilhado). `data` não pode ser alterado depois de
+    pedido (o app passa a lista em cache, que só é trocada, nunca alterada).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # formato -> (versao, bytes)
+        self._prontas: dict[str, tuple[Hashable, bytes]] = {}
+        # formato -> versão sendo gerada
+        self._gerando: dict[str, Hashable] = {}
+        self.erros: dict[str, str] = {}
+
+    def pronta(self, formato: str, versao: Hashable) -> bytes | None:
+        with self._lock:
+            pronta = self._prontas.get(formato)
+        return pronta[1] if pronta is not None and pronta[0] == versao else None
+
+    def gerando(self, formato: str | None = None) -> bool:
+        with self._lock:
+            return bool(self._gerando) if formato is None else formato in self._gerando
+
+    def pedir(self, formato: str, versao: Hashable, data: list[dict]) -> None:
+        """Começa a gerar `formato` para `versao` (se já não estiver pronto ou em andamento)."""
+        with self._lock:
+            pronta = self._prontas.get(formato)
+            if (pronta is not None and pronta[0] == versao) or self._gerando.get(formato) == versao:
+                return
+            self._gerando[formato] = versao
+            self.erros.pop(formato, None)
+        threading.Thread(
+            target=self._gerar, args=(formato, versao, data), name=f"exportar-{formato}", daemon=True
+        ).start()
+
+    def _gerar(self, formato: str, versao: Hashable, data: list[dict]) -> None:
+        try:
+            conteudo = FORMATOS[formato].gerar(data)
+        except Exception as e:
+            with self._lock:
+                # Erro de um pedido que já foi substituído não vale para o novo
+                if self._gerando.get(formato) == versao:
+                    del self._gerando[formato]
+                    self.erros[formato] = f"{type(e).__name__}: {e}"
+            return
+        with self._lock:
+            # Um pedido mais novo pode ter chegado no meio: só ele substitui
+            if self._gerando.get(formato) == versao:
+                del self._gerando[formato]
+                self._prontas[formato] = (versao, conteudo)
+            elif formato not in self._prontas:
+                self._prontas[formato] = (versao, conteudo)
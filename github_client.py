@@ -0,0 +1,224 @@
+"""Cliente HTTP da API do GitHub com conexões persistentes.
+
+- Pool de conexões keep-alive (http.client): sem handshake TLS a cada chamada.
+- Cache condicional por URL: guarda ETag/Last-Modified dos GETs e manda
+  If-None-Match/If-Modified-Since na próxima vez; um 304 devolve o corpo já
+  guardado (e não conta no rate limit do GitHub). Só vale para URLs relidas
+  (ref, arquivo de dados): recursos endereçados por sha não mudam e pedem
+  `cache=False`. O cache é LRU, limitado a `cache_size` URLs.
+- Respeita Retry-After (429/503 e rate limit secundário) antes de desistir.
+- Registra a latência de cada chamada.
+
+`base_url` pode apontar para um servidor HTTP local (ex: http://127.0.0.1:8765)
+que imite a Contents API, para testar/medir sem acessar o GitHub de verdade.
+"""
+
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict, deque
+from email.utils import parsedate_to_datetime
+from typing import NamedTuple
+
+API_URL = "https://api.github.com"
+
+
+class GithubResponse(NamedTuple):
+    status: int
+    body: dict
+    headers: dict
+    # True quando o servidor respondeu 304 e `body` veio do cache local
+    not_modified: bool = False
+
+
+def _retry_after_seconds(headers: dict) -> float | None:
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return None
+    if headers.get("x-ratelimit-remaining") == "0" and headers.get("x-ratelimit-reset"):
+        try:
+            return max(0.0, float(headers["x-ratelimit-reset"]) - time.time())
+        except ValueError:
+            return None
+    return None
+
+
+class GithubClient:
+    def __init__(
+        self,
+        token: str = "",
+        base_url: str = API_URL,
+        timeout: float = 20.0,
+        pool_size: int = 4,
+        max_retries: int = 2,
+        max_retry_wait: float = 10.0,
+        cache_size: int = 64,
+    ) -> None:
+        parts = urllib.parse.urlsplit(base_url)
+        self.token = token
+        self.scheme = parts.scheme or "https"
+        self.host = parts.hostname or "api.github.com"
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        # Esperas maiores que isso não valem a pena (ex: rate limit de 1h): falha logo
+        self.max_retry_wait = max_retry_wait
+
+        self._lock = threading.Lock()
+        self._idle: list[http.client.HTTPConnection] = []
+        # path -> (etag, last_modified, corpo), do menos para o mais recente
+        self._validators: OrderedDict[str, tuple[str | None, str | None, dict]] = OrderedDict()
+        self.cache_size = cache_size
+        # (quando, método, path, status, ms)
+        self.latencies: deque[tuple[float, str, str, int, float]] = deque(maxlen=500)
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.scheme == "http":
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        payload: dict | None = None,
+        headers: dict | None = None,
+        cache: bool = True,
+    ) -> GithubResponse:
+        """Faz a chamada (path relativo à base, ex: "/repos/o/r/contents/x").
+
+        Erros HTTP viram RuntimeError("GitHub API error <código>: ...").
+        `cache=False` num GET que não vai ser repetido (blob, árvore ou commit
+        pelo sha) para não guardar o corpo.
+        """
+
+        method = method.upper()
+        req_headers = {
+            "Accept": "application/vnd.github+json",
+            "User-Agent": "pedegenda",
+            "Connection": "keep-alive",
+        }
+        if self.token:
+            req_headers["Authorization"] = f"Bearer {self.token}"
+        if headers:
+            req_headers.update(headers)
+
+        body_bytes = None
+        if payload is not None:
+            body_bytes = json.dumps(payload).encode("utf-8")
+            req_headers["Content-Type"] = "application/json"
+
+        cached = None
+        if method == "GET" and cache:
+            with self._lock:
+                cached = self._validators.get(path)
+                if cached:
+                    self._validators.move_to_end(path)
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                req_headers.setdefault("If-None-Match", etag)
+            if last_modified:
+                req_headers.setdefault("If-Modified-Since", last_modified)
+
+        attempt = 0
+        while True:
+            conn, reused = self._acquire()
+            start = time.perf_counter()
+            try:
+                conn.request(method, self.base_path + path, body=body_bytes, headers=req_headers)
+                resp = conn.getresponse()
+                raw = resp.read()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                # Conexão keep-alive que o servidor já fechou: tenta numa nova
+                if reused:
+                    continue
+                if attempt < self.max_retries:
+                    attempt += 1
+                    continue
+                raise RuntimeError(f"GitHub API error: {e}")
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            status = resp.status
+            resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+            with self._lock:
+                self.latencies.append((time.time(), method, path.split("?", 1)[0], status, elapsed_ms))
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+
+            if status in (403, 429, 503) and attempt < self.max_retries:
+                wait = _retry_after_seconds(resp_headers)
+                if wait is not None and wait <= self.max_retry_wait:
+                    attempt += 1
+                    time.sleep(wait)
+                    continue
+            break
+
+        if status == 304 and cached:
+            return GithubResponse(status, cached[2], resp_headers, not_modified=True)
+
+        if status >= 400:
+            details = raw.decode("utf-8", errors="replace")
+            raise RuntimeError(f"GitHub API error {status}: {details or resp.reason}")
+
+        body = json.loads(raw.decode("utf-8")) if raw else {}
+        with self._lock:
+            if method == "GET":
+                etag, last_modified = resp_headers.get("etag"), resp_headers.get("last-modified")
+                if cache and (etag or last_modified):
+                    self._validators[path] = (etag, last_modified, body)
+                    self._validators.move_to_end(path)
+                    while len(self._validators) > self.cache_size:
+                        self._validators.popitem(last=False)
+            else:
+                # Escrita: GETs do mesmo recurso (com qualquer ?ref=) ficam inválidos
+                base = path.split("?", 1)[0]
+                for key in [k for k in self._validators if k.split("?", 1)[0] == base]:
+                    del self._validators[key]
+        return GithubResponse(status, body, resp_headers)
+
+    def latency_stats(self) -> dict:
+        """Resumo das últimas chamadas: quantidade, p50/p95 e última latência (ms)."""
+        with self._lock:
+            ultimas = list(self.latencies)
+        if not ultimas:
+            return {"chamadas": 0, "p50_ms": None, "p95_ms": None, "ultima_ms": None}
+        amostras = sorted(ms for *_, ms in ultimas)
+        return {
+            "chamadas": len(amostras),
+            "p50_ms": amostras[len(amostras) // 2],
+            "p95_ms": amostras[min(len(amostras) - 1, int(len(amostras) * 0.95))],
+            "ultima_ms": ultimas[-1][4],
+        }
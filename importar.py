@@ -0,0 +1,254 @@
+"""Importação em lote de estabelecimentos a partir de uma planilha (XLSX ou CSV).
+
+    python importar.py leads.xlsx
+    python importar.py leads.csv --encoding cp1252 --simular
+
+A primeira linha é o cabeçalho; as colunas reconhecidas são as da planilha
+do gerar_agenda.py ("Local", "Data/Hora", "Prioridade", "Responsável",
+"Status", "Notas", "id") ou os nomes dos campos (local, data_hora, ...),
+sem diferenciar acentos e maiúsculas. As demais são ignoradas.
+
+Cada linha é casada com um estabelecimento existente pelo `id` ou, sem ele,
+pelo `local` sem acentos/maiúsculas/pontuação ("Açaí do Vizinho!" casa com
+"acai do vizinho"); sem par, vira um estabelecimento novo. Células vazias
+não apagam o que já está salvo. O XLSX é lido em modo read-only do openpyxl
+e o CSV linha a linha, então só os registros alterados/novos ficam em
+memória além da lista atual. Tudo vai para um único save (app.importar_planilha).
+"""
+
+import argparse
+import codecs
+import copy
+import csv
+import logging
+import os
+import re
+import zipfile
+from datetime import date, datetime, time
+from typing import IO, Iterable, Iterator, NamedTuple
+
+import openpyxl
+from openpyxl.utils.exceptions import InvalidFileException
+
+from busca import dobrar, termos
+from gerar_agenda import ABA
+
+# Cabeçalho (sem acentos, só letras/números) -> campo
+COLUNAS = {
+    "id": "id",
+    "local": "local",
+    "estabelecimento": "local",
+    "datahora": "data_hora",
+    "data": "data_hora",
+    "prioridade": "prioridade",
+    "responsavel": "responsavel",
+    "status": "status",
+    "notas": "notas",
+    "observacoes": "notas",
+}
+
+# Valores conhecidos, escritos como o app escreve ("media" -> "Média")
+_VALORES = {
+    "prioridade": {dobrar(v): v for v in ("Alta", "Média", "Baixa")},
+    "status": {dobrar(v): v for v in ("Pendente", "Em andamento", "Concluído")},
+}
+
+_NAO_ALFANUMERICO = re.compile(r"[\W_]+")
+
+
+class Resultado(NamedTuple):
+    novos: int
+    alterados: int
+    # Linhas que casaram com um estabelecimento sem mudar nada
+    iguais: int
+    # Linhas sem id conhecido e sem local
+    ignoradas: int
+
+
+def _campo(cabecalho) -> str | None:
+    return COLUNAS.get(_NAO_ALFANUMERICO.sub("", dobrar(str(cabecalho or ""))))
+
+
+def _texto(valor) -> str:
+    """Valor de célula -> texto como o app grava (datas no formato dd/mm/aaaa)."""
+    if valor is None:
+        return ""
+    if isinstance(valor, datetime):
+        if valor.time() == time(0, 0):
+            return valor.strftime("%d/%m/%Y")
+        return valor.strftime("%d/%m/%Y - %H:%M")
+    if isinstance(valor, date):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor).strip()
+
+
+def _registros(linhas: Iterator[Iterable]) -> Iterator[dict]:
+    """Linhas cruas (a primeira é o cabeçalho) -> dicts só com os campos preenchidos."""
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return
+    campos = [_campo(c) for c in cabecalho]
+    if "local" not in campos and "id" not in campos:
+        raise ValueError("a planilha precisa de uma coluna Local ou id")
+    for linha in linhas:
+        registro = {}
+        for campo, valor in zip(campos, linha):
+            texto = _texto(valor)
+            if campo and texto:
+                registro[campo] = _VALORES[campo].get(dobrar(texto), texto) if campo in _VALORES else texto
+        if registro:
+            yield registro
+
+
+def ler_xlsx(arquivo: str | IO[bytes]) -> Iterator[dict]:
+    """Aba "Agenda Visitas" (ou a primeira), em modo read-only."""
+    try:
+        wb = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile) as e:
+        raise ValueError(f"não é um .xlsx válido ({e})")
+    try:
+        ws = wb[ABA] if ABA in wb.sheetnames else wb.worksheets[0]
+        yield from _registros(ws.iter_rows(values_only=True))
+    finally:
+        wb.close()
+
+
+def ler_csv(arquivo: str | IO[bytes], encoding: str = "utf-8-sig") -> Iterator[dict]:
+    """CSV separado por vírgula, ponto e vírgula ou tab (o que aparecer mais no cabeçalho)."""
+    if isinstance(arquivo, str):
+        with open(arquivo, "rb") as f:
+            yield from ler_csv(f, encoding)
+        return
+    texto = codecs.getreader(encoding)(arquivo)
+    primeira = texto.readline()
+    separador = max(",;\t", key=primeira.count)
+    yield from _registros(csv.reader(_com_primeira(primeira, texto), delimiter=separador))
+
+
+def _com_primeira(primeira: str, resto: Iterable[str]) -> Iterator[str]:
+    yield primeira
+    yield from resto
+
+
+def ler(arquivo: str | IO[bytes], nome: str, encoding: str = "utf-8-sig") -> Iterator[dict]:
+    """Registros da planilha `arquivo`; o formato vem da extensão de `nome`."""
+    extensao = os.path.splitext(nome)[1].lower()
+    if extensao in (".xlsx", ".xlsm"):
+        return ler_xlsx(arquivo)
+    if extensao in (".csv", ".txt"):
+        return ler_csv(arquivo, encoding)
+    raise ValueError(f"formato não suportado: {nome!r} (use .xlsx ou .csv)")
+
+
+def chave_local(local: str | None) -> str:
+    """"Açaí do Vizinho!" -> "acai do vizinho" (para casar pelo nome)."""
+    return " ".join(termos(local))
+
+
+def mesclar(
+    atuais: list[dict], registros: Iterable[dict], carimbo: str = ""
+) -> tuple[list[dict], list[dict], Resultado]:
+    """Aplica `registros` sobre `atuais` sem alterar `atuais`.
+
+    Retorna (lista nova, tocados, resultado). `tocados` são os estabelecimentos
+    novos e as cópias dos alterados (os mesmos objetos que estão na lista nova):
+    o chamador ainda precisa normalizá-los (app.migrate_data) antes de salvar.
+    Os demais continuam sendo os objetos de `atuais`. `carimbo`, se vier, vai
+    para a ultima_atualizacao de cada tocado.
+    """
+
+    lista = list(atuais)
+    por_id: dict[str, int] = {}
+    por_local: dict[str, int] = {}
+    for pos, item in enumerate(lista):
+        if isinstance(item, dict):
+            if item.get("id"):
+                por_id.setdefault(item["id"], pos)
+            por_local.setdefault(chave_local(item.get("local")), pos)
+    tocados: dict[int, dict] = {}
+    novos = iguais = ignoradas = 0
+
+    for registro in registros:
+        pos = por_id.get(registro.get("id", ""))
+        if pos is None and registro.get("local"):
+            pos = por_local.get(chave_local(registro["local"]))
+        if pos is None:
+            if not registro.get("local"):
+                ignoradas += 1
+                continue
+            lista.append(dict(registro))
+            pos = len(lista) - 1
+            tocados[pos] = lista[pos]
+            novos += 1
+        else:
+            item = lista[pos]
+            mudancas = {k: v for k, v in registro.items() if k != "id" and item.get(k) != v}
+            # Casou pelo nome: a grafia salva continua valendo
+            if "local" in mudancas and chave_local(mudancas["local"]) == chave_local(item.get("local")):
+                del mudancas["local"]
+            if not mudancas:
+                iguais += 1
+                continue
+            if pos not in tocados:
+                item = lista[pos] = tocados[pos] = copy.deepcopy(item)
+            item.update(mudancas)
+        item = lista[pos]
+        if item.get("id"):
+            por_id[item["id"]] = pos
+        por_local.setdefault(chave_local(item.get("local")), pos)
+
+    if carimbo:
+        for item in tocados.values():
+            item["ultima_atualizacao"] = carimbo
+    return lista, list(tocados.values()), Resultado(novos, len(tocados) - novos, iguais, ignoradas)
+
+
+def diferencas(atuais: list[dict], tocados: list[dict]) -> list[dict]:
+    """O que `mesclar` mudou em cada um dos `tocados`, de volta como linhas.
+
+    Para reaplicar uma importação (com mesclar) sobre uma versão mais nova
+    de `atuais` sem reler a planilha: os alterados voltam só com o id e os
+    campos mudados, os novos voltam inteiros.
+    """
+
+    por_id = {item["id"]: item for item in atuais if isinstance(item, dict) and item.get("id")}
+    linhas = []
+    for item in tocados:
+        anterior = por_id.get(item.get("id"))
+        campos = {k: v for k, v in item.items() if k != "ultima_atualizacao"}
+        if anterior is not None:
+            campos = {"id": item["id"], **{k: v for k, v in campos.items() if anterior.get(k) != v}}
+        linhas.append(campos)
+    return linhas
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Importa estabelecimentos de uma planilha (XLSX ou CSV)")
+    parser.add_argument("arquivo", help="planilha .xlsx ou .csv (primeira linha = cabeçalho)")
+    parser.add_argument("--encoding", default="utf-8-sig", help="encoding do CSV (padrão: utf-8-sig)")
+    parser.add_argument("--usuario", default="importação", help="quem aparece na última atualização")
+    parser.add_argument("--simular", action="store_true", help="só mostra o que mudaria, sem salvar")
+    args = parser.parse_args(argv)
+
+    # Fora do `streamlit run` o cache_resource avisa a cada chamada; aqui é esperado
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    import app  # mesmos DATA_DIR/DATA_BACKEND/GITHUB_SYNC do app
+
+    try:
+        with open(args.arquivo, "rb") as f:
+            resultado = app.importar_planilha(
+                f, args.arquivo, args.usuario, encoding=args.encoding, salvar=not args.simular
+            )
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    acao = "seriam" if args.simular else "foram"
+    print(
+        f"{resultado.novos} novos e {resultado.alterados} alterados {acao} salvos "
+        f"({resultado.iguais} linhas sem mudança, {resultado.ignoradas} ignoradas)."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Persistência em diário (append-only) para o dados.json.
+
+Em vez de reescrever o arquivo inteiro a cada alteração, cada mudança vira uma
+linha JSON pequena no diário (`dados.journal.jsonl`). O estado é o último
+snapshot (`dados.json`) mais a reaplicação do diário; quando o diário passa do
+limite, uma thread em segundo plano grava um snapshot novo e descarta as
+operações já incorporadas.
+
+Operações (uma por linha):
+- {"op": "upsert", "id": ..., "registro": {...}}   estabelecimento novo/inteiro
+- {"op": "patch", "id": ..., "campos": {...}}       campos de um estabelecimento
+- {"op": "missao", "id": ..., "missao": {...}}      missão nova/alterada (por id)
+- {"op": "delete", "id": ...}                       estabelecimento removido
+- {"op": "meta", "meta": {...}}                     resto do documento (ex: agregados);
+                                                    vale o último (ver JournalStorage)
+"""
+
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+
+def _estado_por_id(data: list[dict]) -> dict[str, dict]:
+    return {item.get("id"): item for item in data if isinstance(item, dict) and item.get("id")}
+
+
+_AUSENTE = object()
+
+
+def diff_record(anterior: dict | None, item: dict | None) -> list[dict]:
+    """Operações que levam um estabelecimento de `anterior` a `item` (None = inexistente).
+
+    É o que o app usa quando já sabe qual registro mudou (ex: edição de um
+    card): não precisa comparar a lista inteira como diff_records.
+    """
+
+    if item is None:
+        return [{"op": "delete", "id": anterior["id"]}] if anterior is not None else []
+    est_id = item["id"]
+    if anterior is None:
+        return [{"op": "upsert", "id": est_id, "registro": item}]
+    if anterior == item:
+        return []
+
+    removidos = [k for k in anterior if k not in item]
+    if removidos:
+        # Raro (nenhuma tela remove campos): regrava o registro inteiro
+        return [{"op": "upsert", "id": est_id, "registro": item}]
+    ops: list[dict] = []
+    campos = {k: v for k, v in item.items() if k != "missoes" and anterior.get(k, _AUSENTE) != v}
+    if campos:
+        ops.append({"op": "patch", "id": est_id, "campos": campos})
+
+    missoes_novas = item.get("missoes") or []
+    missoes_antigas = anterior.get("missoes") or []
+    if missoes_novas != missoes_antigas:
+        ids_novos = {m.get("id") for m in missoes_novas if isinstance(m, dict)}
+        removeu = any(isinstance(m, dict) and m.get("id") not in ids_novos for m in missoes_antigas)
+        if removeu or not all(isinstance(m, dict) and m.get("id") for m in missoes_novas):
+            ops.append({"op": "patch", "id": est_id, "campos": {"missoes": missoes_novas}})
+        else:
+            por_id = {m.get("id"): m for m in missoes_antigas if isinstance(m, dict)}
+            for m in missoes_novas:
+                if por_id.get(m["id"]) != m:
+                    ops.append({"op": "missao", "id": est_id, "missao": m})
+    return ops
+
+
+def diff_records(old: list[dict], new: list[dict]) -> list[dict]:
+    """Gera as operações que levam `old` a `new` (comparando por id).
+
+    Percorre as duas listas: para importações e migrações. Com os registros
+    alterados em mãos, use diff_record.
+    """
+
+    ops: list[dict] = []
+    antigos = _estado_por_id(old)
+    vistos: set[str] = set()
+
+    for item in new:
+        if not isinstance(item, dict) or not item.get("id"):
+            continue
+        vistos.add(item["id"])
+        ops.extend(diff_record(antigos.get(item["id"]), item))
+
+    for est_id in antigos:
+        if est_id not in vistos:
+            ops.append({"op": "delete", "id": est_id})
+
+    return ops
+
+
+def apply_ops(data: list[dict], ops) -> list[dict]:
+    """Reaplica operações do diário sobre a lista de estabelecimentos (in-place)."""
+
+    indice = {item.get("id"): i for i, item in enumerate(data) if isinstance(item, dict)}
+    removidos = False
+    for op in ops:
+        tipo = op.get("op")
+        est_id = op.get("id")
+        pos = indice.get(est_id)
+        if tipo == "upsert":
+            registro = op.get("registro") or {}
+            if pos is None:
+                indice[est_id] = len(data)
+                data.append(registro)
+            else:
+                data[pos] = registro
+        elif tipo == "patch" and pos is not None:
+            data[pos].update(op.get("campos") or {})
+        elif tipo == "missao" and pos is not None:
+            missao = op.get("missao") or {}
+            missoes = data[pos].setdefault("missoes", [])
+            for i, m in enumerate(missoes):
+                if isinstance(m, dict) and m.get("id") == missao.get("id"):
+                    missoes[i] = missao
+                    break
+            else:
+                missoes.append(missao)
+        elif tipo == "delete" and pos is not None:
+            data[pos] = None
+            del indice[est_id]
+            removidos = True
+
+    if removidos:
+        data[:] = [item for item in data if item is not None]
+    return data
+
+
+class Journal:
+    """Snapshot + diário de operações, com compactação em segundo plano."""
+
+    def __init__(self, snapshot_path: str, max_bytes: int = 256 * 1024) -> None:
+        base, _ = os.path.splitext(snapshot_path)
+        self.snapshot_path = snapshot_path
+        self.log_path = f"{base}.journal.jsonl"
+        # Diário "congelado" enquanto a compactação grava o snapshot novo
+        self.compacting_path = f"{base}.journal.compacting.jsonl"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def file_key(self) -> tuple | None:
+        """Identifica o estado em disco (mtime/tamanho de snapshot e diários)."""
+        key = []
+        for path in (self.snapshot_path, self.compacting_path, self.log_path):
+            try:
+                info = os.stat(path)
+                key.append((info.st_mtime_ns, info.st_size))
+            except FileNotFoundError:
+                key.append(None)
+        if key[0] is None and key[2] is None:
+            return None
+        return tuple(key)
+
+    def load(self):
+        """Lê o snapshot (documento JSON cru, ou None) e as operações pendentes."""
+        raw = None
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        ops: list[dict] = []
+        for path in (self.compacting_path, self.log_path):
+            ops.extend(self._read_ops(path))
+        return raw, ops
+
+    @staticmethod
+    def _read_ops(path: str) -> list[dict]:
+        ops: list[dict] = []
+        if not os.path.exists(path):
+            return ops
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    ops.append(json.loads(line))
+                except ValueError:
+                    # Linha final truncada (queda no meio da escrita): ignora
+                    continue
+        return ops
+
+    def append(self, ops: list[dict]) -> None:
+        if not ops:
+            return
+        ts = datetime.now().isoformat(timespec="seconds")
+        lines = "".join(json.dumps({"ts": ts, **op}, ensure_ascii=False) + "\n" for op in ops)
+        with self._lock:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+    def write_snapshot(self, document: dict) -> None:
+        """Grava um snapshot completo e zera o diário (uso síncrono)."""
+        with self._lock:
+            os.replace(self._write_tmp(document), self.snapshot_path)
+            for path in (self.log_path, self.compacting_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _write_tmp(self, document: dict) -> str:
+        """Grava `document` num temporário único ao lado do snapshot.
+
+        Nome único por escrita: a compactação (fora do lock) e um
+        write_snapshot síncrono nunca escrevem no mesmo arquivo.
+        """
+        pasta, nome = os.path.split(os.path.abspath(self.snapshot_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{nome}.", suffix=".tmp", dir=pasta)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(document, f, ensure_ascii=False, indent=2)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path
+
+    def needs_compaction(self) -> bool:
+        try:
+            return os.path.getsize(self.log_path) >= self.max_bytes
+        except FileNotFoundError:
+            return False
+
+    def compact_async(self, document: dict) -> bool:
+        """Incorpora o diário atual em um snapshot novo, em outra thread.
+
+        `document` precisa ser o estado completo *neste momento* (snapshot +
+        diário). O diário é congelado antes de retornar; novas operações vão
+        para um diário novo. Retorna False se já há uma compactação rodando.
+        """
+
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return False
+            if not os.path.exists(self.log_path):
+                return False
+            if os.path.exists(self.compacting_path):
+                # Sobra de uma compactação interrompida: junta tudo no congelado
+                with open(self.log_path, "r", encoding="utf-8") as src:
+                    pendente = src.read()
+                with open(self.compacting_path, "a", encoding="utf-8") as dst:
+                    dst.write(pendente)
+                os.remove(self.log_path)
+            else:
+                os.replace(self.log_path, self.compacting_path)
+            self._thread = threading.Thread(
+                target=self._compact, args=(document,), name="journal-compaction", daemon=True
+            )
+            self._thread.start()
+        return True
+
+    def _compact(self, document: dict) -> None:
+        # Se cair no meio, o snapshot antigo + diário congelado continuam
+        # válidos: reaplicar operações já incorporadas não muda o resultado.
+        tmp_path = self._write_tmp(document)
+        with self._lock:
+            if not os.path.exists(self.compacting_path):
+                # Um write_snapshot síncrono já gravou um estado mais novo
+                os.remove(tmp_path)
+                return
+            os.replace(tmp_path, self.snapshot_path)
+            os.remove(self.compacting_path)
@@ -0,0 +1,236 @@
+"""Modelo compacto dos registros (estabelecimentos e missões).
+
+O app trabalha com dicts (é o que vai pro JSON/GitHub), mas para guardar
+muitos registros em memória (cache, exportação, benchmarks) isso custa caro:
+cada dict repete as chaves e carrega um dict de etapas inteiro. Aqui:
+
+- classes com __slots__ (sem __dict__ por instância);
+- etapas como bitmask sobre ETAPAS_PADRAO (bit i = etapa i concluída);
+- strings de baixa cardinalidade (status, prioridade, data_hora,
+  responsável) internadas com sys.intern, então valores repetidos são
+  um único objeto.
+
+Campos desconhecidos vão em `extra` para a conversão ida-e-volta não perder nada.
+
+O app guarda uma lista só (dicts, `_DataCache.local_data`), que também responde
+às leituras com 304 do GitHub; o modelo fica para leituras em massa fora dele
+(ex: benchmarks/bench_memoria.py).
+"""
+
+import json
+import sys
+from dataclasses import dataclass
+
+ETAPAS_PADRAO = ["Captação", "Cadastro Produtos", "Vinculação Conta"]
+
+_BIT_ETAPA = {etapa: 1 << i for i, etapa in enumerate(ETAPAS_PADRAO)}
+_TODAS_ETAPAS = (1 << len(ETAPAS_PADRAO)) - 1
+
+_CAMPOS_MISSAO = {
+    "id",
+    "titulo",
+    "data_hora",
+    "status",
+    "notas",
+    "ultima_atualizacao",
+    "data_hora_iso",
+    "sem_data",
+}
+_CAMPOS_ESTAB = {
+    "id",
+    "local",
+    "data_hora",
+    "etapas",
+    "status",
+    "prioridade",
+    "responsavel",
+    "notas",
+    "ultima_atualizacao",
+    "missoes",
+    "data_hora_iso",
+    "sem_data",
+}
+
+_intern = sys.intern
+
+
+def etapas_to_mask(etapas: dict) -> tuple[int, dict | None]:
+    """{"Captação": True, ...} -> (bitmask, etapas fora do padrão ou None)."""
+    mask = 0
+    extras = None
+    for etapa, feito in etapas.items():
+        bit = _BIT_ETAPA.get(etapa)
+        if bit is None:
+            if extras is None:
+                extras = {}
+            extras[etapa] = bool(feito)
+        elif feito:
+            mask |= bit
+    return mask, extras
+
+
+def mask_to_etapas(mask: int, extras: dict | None = None) -> dict:
+    etapas = {etapa: bool(mask & bit) for etapa, bit in _BIT_ETAPA.items()}
+    if extras:
+        etapas.update(extras)
+    return etapas
+
+
+def _datahora_to_dict(obj, d: dict) -> None:
+    if obj.data_hora_iso is not None:
+        d["data_hora_iso"] = obj.data_hora_iso
+    if obj.sem_data is not None:
+        d["sem_data"] = obj.sem_data
+
+
+@dataclass(slots=True)
+class Missao:
+    id: str
+    titulo: str = ""
+    data_hora: str = "A Definir"
+    status: str = "Pendente"
+    notas: str = ""
+    ultima_atualizacao: str = ""
+    extra: dict | None = None
+    # Data/hora normalizada (ver app._normalizar_datahora); None = não calculada
+    data_hora_iso: str | None = None
+    sem_data: bool | None = None
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Missao":
+        get = d.get
+        desconhecidos = d.keys() - _CAMPOS_MISSAO
+        return cls(
+            get("id") or "",
+            get("titulo", ""),
+            _intern(get("data_hora", "A Definir") or ""),
+            _intern(get("status", "Pendente") or ""),
+            get("notas", ""),
+            get("ultima_atualizacao", ""),
+            {k: d[k] for k in desconhecidos} if desconhecidos else None,
+            _intern(get("data_hora_iso")) if get("data_hora_iso") is not None else None,
+            get("sem_data"),
+        )
+
+    def to_dict(self) -> dict:
+        d = {
+            "id": self.id,
+            "titulo": self.titulo,
+            "data_hora": self.data_hora,
+            "status": self.status,
+            "notas": self.notas,
+            "ultima_atualizacao": self.ultima_atualizacao,
+        }
+        _datahora_to_dict(self, d)
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+
+@dataclass(slots=True)
+class Estabelecimento:
+    id: str
+    local: str = ""
+    data_hora: str = "A Definir"
+    etapas_mask: int = 0
+    status: str = "Pendente"
+    prioridade: str = ""
+    responsavel: str = ""
+    notas: str = ""
+    ultima_atualizacao: str = ""
+    missoes: list[Missao] | None = None
+    etapas_extra: dict | None = None
+    extra: dict | None = None
+    data_hora_iso: str | None = None
+    sem_data: bool | None = None
+
+    @property
+    def etapas(self) -> dict:
+        return mask_to_etapas(self.etapas_mask, self.etapas_extra)
+
+    @property
+    def etapas_concluidas(self) -> int:
+        return self.etapas_mask.bit_count() + sum(1 for v in (self.etapas_extra or {}).values() if v)
+
+    @property
+    def todas_etapas_concluidas(self) -> bool:
+        return self.etapas_mask == _TODAS_ETAPAS and all((self.etapas_extra or {}).values())
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Estabelecimento":
+        get = d.get
+        mask, etapas_extra = etapas_to_mask(get("etapas") or {})
+        missoes_raw = get("missoes")
+        desconhecidos = d.keys() - _CAMPOS_ESTAB
+        return cls(
+            get("id") or "",
+            get("local", ""),
+            _intern(get("data_hora", "A Definir") or ""),
+            mask,
+            _intern(get("status", "Pendente") or ""),
+            _intern(get("prioridade", "") or ""),
+            _intern(get("responsavel", "") or ""),
+            get("notas", ""),
+            get("ultima_atualizacao", ""),
+            # Lista vazia vira None: a maioria dos estabelecimentos não tem missões
+            ([Missao.from_dict(m) for m in missoes_raw if isinstance(m, dict)] or None) if missoes_raw else None,
+            etapas_extra,
+            {k: d[k] for k in desconhecidos} if desconhecidos else None,
+            _intern(get("data_hora_iso")) if get("data_hora_iso") is not None else None,
+            get("sem_data"),
+        )
+
+    def to_dict(self) -> dict:
+        d = {
+            "id": self.id,
+            "local": self.local,
+            "data_hora": self.data_hora,
+            "etapas": mask_to_etapas(self.etapas_mask, self.etapas_extra),
+            "status": self.status,
+            "prioridade": self.prioridade,
+            "responsavel": self.responsavel,
+            "notas": self.notas,
+            "ultima_atualizacao": self.ultima_atualizacao,
+            "missoes": [m.to_dict() for m in self.missoes] if self.missoes else [],
+        }
+        _datahora_to_dict(self, d)
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+
+def from_records(data: list[dict]) -> list[Estabelecimento]:
+    return [Estabelecimento.from_dict(d) for d in data if isinstance(d, dict)]
+
+
+def to_records(estabelecimentos: list[Estabelecimento]) -> list[dict]:
+    return [e.to_dict() for e in estabelecimentos]
+
+
+def loads(text: str | bytes) -> tuple[list[Estabelecimento], int, dict]:
+    """JSON (dados.json, lista antiga ou {schema_version, estabelecimentos}) -> (registros, versão, meta).
+
+    `meta` são as demais chaves do documento (ex: agregados), devolvidas como estão.
+    """
+    raw = json.loads(text)
+    if isinstance(raw, dict):
+        meta = {k: v for k, v in raw.items() if k not in ("schema_version", "estabelecimentos")}
+        return (
+            from_records(raw.get("estabelecimentos") or []),
+            int(raw.get("schema_version") or 0),
+            meta,
+        )
+    return from_records(raw if isinstance(raw, list) else []), 0, {}
+
+
+def dumps(
+    estabelecimentos: list[Estabelecimento],
+    schema_version: int,
+    meta: dict | None = None,
+    indent: int | None = 2,
+) -> str:
+    return json.dumps(
+        {"schema_version": schema_version, **(meta or {}), "estabelecimentos": to_records(estabelecimentos)},
+        ensure_ascii=False,
+        indent=indent,
+    )
@@ -0,0 +1,70 @@
+"""Espera por mudanças numa pasta: inotify no Linux (direto na libc, sem
+dependências), polling nos demais sistemas ou se o inotify não estiver
+disponível (ex: limite de watches, alguns sistemas de arquivos de rede).
+
+O observador só acorda quem espera: pode voltar sem que nada relevante tenha
+mudado (outro arquivo da pasta, ou o próprio polling). Quem chama confere o
+que lhe interessa (ex: Storage.file_key()).
+"""
+
+import ctypes
+import os
+import select
+import sys
+import time
+
+# inotify(7)
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_EVENTOS = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+
+
+def _inotify(pasta: str) -> int | None:
+    """Descritor do inotify vigiando `pasta`, ou None se não der."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(pasta), _EVENTOS) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class Observador:
+    def __init__(self, pasta: str, intervalo: float = 1.0, maximo: float = 60.0) -> None:
+        # Polling: confere a cada `intervalo` segundos. Com inotify, acorda no
+        # evento e, por garantia, pelo menos a cada `maximo` segundos.
+        self.intervalo = intervalo
+        self.maximo = maximo
+        self._fd = _inotify(pasta)
+
+    @property
+    def modo(self) -> str:
+        return "inotify" if self._fd is not None else "polling"
+
+    def esperar(self) -> None:
+        if self._fd is None:
+            time.sleep(self.intervalo)
+            return
+        prontos, _, _ = select.select([self._fd], [], [], self.maximo)
+        if prontos:
+            # Uma rajada de eventos conta como um só
+            try:
+                while os.read(self._fd, 64 * 1024):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def fechar(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,1078 @@
+"""Backends de persistência dos estabelecimentos.
+
+O app (app.py) conversa só com a interface `Storage`; o backend local é
+escolhido pela env var DATA_BACKEND (ou DATA_JOURNAL, ver backend_from_env):
+
+- json    (padrão) dados.json reescrito a cada save
+- journal dados.json + diário append-only (ver journal.py)
+- sqlite  dados.sqlite3 (WAL), uma linha por estabelecimento/etapa/missão
+
+O GitHub (GITHUB_SYNC) continua sendo uma camada remota por cima do backend
+local: `GithubStorage` lê/grava o documento JSON inteiro via Contents API;
+`ShardedGithubStorage` guarda um arquivo por estabelecimento.
+
+Uso como script (importação única de um dados.json para SQLite):
+
+    python storage.py importar dados.json dados.sqlite3
+"""
+
+import argparse
+import atexit
+import base64
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+from typing import NamedTuple
+
+from github_client import GithubClient
+from journal import Journal, apply_ops, diff_record, diff_records
+
+
+def to_document(data: list[dict], schema_version: int, meta: dict | None = None) -> dict:
+    return {"schema_version": schema_version, **(meta or {}), "estabelecimentos": data}
+
+
+def from_document(raw) -> tuple[list[dict], int]:
+    """Aceita o formato atual ({schema_version, estabelecimentos}) e o antigo (lista pura, v0)."""
+    if isinstance(raw, list):
+        return raw, 0
+    if isinstance(raw, dict):
+        return list(raw.get("estabelecimentos") or []), int(raw.get("schema_version") or 0)
+    return [], 0
+
+
+def document_meta(raw) -> dict:
+    """Demais chaves do documento (ex: "agregados"); a lista antiga (v0) não tem nenhuma."""
+    if not isinstance(raw, dict):
+        return {}
+    return {k: v for k, v in raw.items() if k not in ("schema_version", "estabelecimentos")}
+
+
+def _file_stat_key(path: str) -> tuple[int, int] | None:
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+
+class Storage:
+    """Interface comum dos backends locais.
+
+    - file_key(): validador barato do estado persistido (None = nada salvo
+      ainda). Se não mudou, o app reaproveita o que já tem em memória.
+    - load(): (dados, schema_version) ou None se não existir nada salvo.
+    - save(data, previous, changed): grava `data`. `previous` é o último estado
+      salvo, quando conhecido; backends incrementais gravam só a diferença.
+      `changed` são os pares (antes, depois) dos registros que mudaram (None
+      = inexistente), quando quem chama já sabe (ex: edição de um card); sem
+      ele, a diferença é achada comparando `previous` com `data` inteiras.
+    - meta: o resto do documento (ex: "agregados" do painel). load() preenche
+      com o que estava salvo; save() grava o valor atual junto com os dados.
+    """
+
+    name = ""
+
+    def __init__(self, schema_version: int) -> None:
+        self.schema_version = schema_version
+        self.meta: dict = {}
+
+    def file_key(self) -> tuple | None:
+        raise NotImplementedError
+
+    def load(self) -> tuple[list[dict], int] | None:
+        raise NotImplementedError
+
+    def save(
+        self,
+        data: list[dict],
+        previous: list[dict] | None = None,
+        changed: list[tuple[dict | None, dict | None]] | None = None,
+    ) -> None:
+        raise NotImplementedError
+
+
+class JsonFileStorage(Storage):
+    name = "json"
+
+    def __init__(self, path: str, schema_version: int) -> None:
+        super().__init__(schema_version)
+        self.path = path
+
+    def file_key(self) -> tuple | None:
+        return _file_stat_key(self.path)
+
+    def load(self) -> tuple[list[dict], int] | None:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        self.meta = document_meta(raw)
+        return from_document(raw)
+
+    def save(
+        self,
+        data: list[dict],
+        previous: list[dict] | None = None,
+        changed: list[tuple[dict | None, dict | None]] | None = None,
+    ) -> None:
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(to_document(data, self.schema_version, self.meta), f, ensure_ascii=False, indent=2)
+
+
+class JournalStorage(Storage):
+    name = "journal"
+
+    def __init__(self, path: str, schema_version: int, max_bytes: int = 256 * 1024) -> None:
+        super().__init__(schema_version)
+        self.journal = Journal(path, max_bytes=max_bytes)
+        # Último meta gravado (só vai para o diário quando muda)
+        self._meta_salvo: dict | None = None
+
+    def file_key(self) -> tuple | None:
+        return self.journal.file_key()
+
+    def load(self) -> tuple[list[dict], int] | None:
+        if self.journal.file_key() is None:
+            return None
+        raw, ops = self.journal.load()
+        data, version = from_document(raw) if raw is not None else ([], self.schema_version)
+        meta = document_meta(raw)
+        for op in ops:
+            if op.get("op") == "meta":
+                meta = op.get("meta") or {}
+        self.meta = meta
+        self._meta_salvo = copy.deepcopy(meta)
+        return apply_ops(data, ops), version
+
+    def save(
+        self,
+        data: list[dict],
+        previous: list[dict] | None = None,
+        changed: list[tuple[dict | None, dict | None]] | None = None,
+    ) -> None:
+        if previous is None:
+            self.journal.write_snapshot(to_document(data, self.schema_version, self.meta))
+            self._meta_salvo = copy.deepcopy(self.meta)
+            return
+        # Só o que mudou desde o último save vai para o diário
+        if changed is not None:
+            ops = [op for anterior, item in changed for op in diff_record(anterior, item)]
+        else:
+            ops = diff_records(previous, data)
+        if self.meta != self._meta_salvo:
+            ops.append({"op": "meta", "meta": self.meta})
+            self._meta_salvo = copy.deepcopy(self.meta)
+        self.journal.append(ops)
+        if self.journal.needs_compaction():
+            # `data` não pode ser alterado depois (o app grava uma cópia própria)
+            self.journal.compact_async(to_document(data, self.schema_version, copy.deepcopy(self.meta)))
+
+
+# Colunas "simples" de estabelecimentos/missões; o resto vai em `extra` (JSON)
+_COLS_ESTAB = ["local", "data_hora", "status", "prioridade", "responsavel", "notas", "ultima_atualizacao"]
+_COLS_MISSAO = ["titulo", "data_hora", "status", "notas", "ultima_atualizacao"]
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS estabelecimentos (
+    id TEXT PRIMARY KEY,
+    posicao INTEGER NOT NULL,
+    local TEXT NOT NULL DEFAULT '',
+    data_hora TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    prioridade TEXT NOT NULL DEFAULT '',
+    responsavel TEXT NOT NULL DEFAULT '',
+    notas TEXT NOT NULL DEFAULT '',
+    ultima_atualizacao TEXT NOT NULL DEFAULT '',
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS etapas (
+    estabelecimento_id TEXT NOT NULL REFERENCES estabelecimentos(id) ON DELETE CASCADE,
+    etapa TEXT NOT NULL,
+    posicao INTEGER NOT NULL,
+    concluida INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (estabelecimento_id, etapa)
+);
+CREATE TABLE IF NOT EXISTS missoes (
+    estabelecimento_id TEXT NOT NULL REFERENCES estabelecimentos(id) ON DELETE CASCADE,
+    id TEXT NOT NULL,
+    posicao INTEGER NOT NULL,
+    titulo TEXT NOT NULL DEFAULT '',
+    data_hora TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    notas TEXT NOT NULL DEFAULT '',
+    ultima_atualizacao TEXT NOT NULL DEFAULT '',
+    extra TEXT,
+    PRIMARY KEY (estabelecimento_id, id)
+);
+CREATE INDEX IF NOT EXISTS idx_estabelecimentos_data_hora ON estabelecimentos(data_hora);
+CREATE INDEX IF NOT EXISTS idx_estabelecimentos_status ON estabelecimentos(status);
+CREATE INDEX IF NOT EXISTS idx_estabelecimentos_responsavel ON estabelecimentos(responsavel);
+CREATE INDEX IF NOT EXISTS idx_missoes_data_hora ON missoes(data_hora);
+CREATE INDEX IF NOT EXISTS idx_missoes_status ON missoes(status);
+"""
+
+
+def _split_extra(record: dict, cols: list[str], fixos: set[str]) -> tuple[list, str | None]:
+    valores = [record.get(c, "") or "" for c in cols]
+    extra = {k: v for k, v in record.items() if k not in fixos}
+    return valores, (json.dumps(extra, ensure_ascii=False) if extra else None)
+
+
+_FIXOS_ESTAB = set(_COLS_ESTAB) | {"id", "etapas", "missoes"}
+_FIXOS_MISSAO = set(_COLS_MISSAO) | {"id"}
+
+
+class SqliteStorage(Storage):
+    """Backend SQLite: edições viram UPDATEs de uma linha, não reescritas."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, schema_version: int, legacy_json: str | None = None) -> None:
+        super().__init__(schema_version)
+        self.path = path
+        # dados.json antigo importado automaticamente se o banco estiver vazio
+        self.legacy_json = legacy_json
+        self._lock = threading.Lock()
+        # Uma conexão por processo, compartilhada entre as threads das sessões
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA_SQL)
+
+    def file_key(self) -> tuple | None:
+        with self._lock:
+            row = self._conn.execute("SELECT valor FROM meta WHERE chave = 'schema_version'").fetchone()
+            if row is None:
+                return None
+            # data_version muda quando outra conexão (ex: o importador) grava
+            (data_version,) = self._conn.execute("PRAGMA data_version").fetchone()
+        return ("sqlite", data_version)
+
+    def load(self) -> tuple[list[dict], int] | None:
+        with self._lock:
+            row = self._conn.execute("SELECT valor FROM meta WHERE chave = 'schema_version'").fetchone()
+        if row is None:
+            if self.legacy_json and os.path.exists(self.legacy_json):
+                import_json(self.legacy_json, storage=self)
+                return self.load()
+            return None
+
+        with self._lock:
+            cur = self._conn.cursor()
+            meta = cur.execute("SELECT chave, valor FROM meta WHERE chave != 'schema_version'").fetchall()
+            estabs = cur.execute(
+                f"SELECT id, {', '.join(_COLS_ESTAB)}, extra FROM estabelecimentos ORDER BY posicao"
+            ).fetchall()
+            etapas = cur.execute(
+                "SELECT estabelecimento_id, etapa, concluida FROM etapas ORDER BY estabelecimento_id, posicao"
+            ).fetchall()
+            missoes = cur.execute(
+                f"SELECT estabelecimento_id, id, {', '.join(_COLS_MISSAO)}, extra FROM missoes "
+                "ORDER BY estabelecimento_id, posicao"
+            ).fetchall()
+
+        data: list[dict] = []
+        por_id: dict[str, dict] = {}
+        for est_id, *valores, extra in estabs:
+            item = {"id": est_id, **dict(zip(_COLS_ESTAB, valores)), "etapas": {}, "missoes": []}
+            if extra:
+                item.update(json.loads(extra))
+            por_id[est_id] = item
+            data.append(item)
+        for est_id, etapa, concluida in etapas:
+            if est_id in por_id:
+                por_id[est_id]["etapas"][etapa] = bool(concluida)
+        for est_id, mid, *valores, extra in missoes:
+            if est_id in por_id:
+                m = {"id": mid, **dict(zip(_COLS_MISSAO, valores))}
+                if extra:
+                    m.update(json.loads(extra))
+                por_id[est_id]["missoes"].append(m)
+
+        self.meta = {chave: json.loads(valor) for chave, valor in meta}
+        return data, int(row[0])
+
+    def save(
+        self,
+        data: list[dict],
+        previous: list[dict] | None = None,
+        changed: list[tuple[dict | None, dict | None]] | None = None,
+    ) -> None:
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                if previous is None:
+                    cur.execute("DELETE FROM estabelecimentos")
+                    for pos, item in enumerate(data):
+                        if isinstance(item, dict) and item.get("id"):
+                            self._insert_estab(cur, item, pos)
+                elif changed is not None:
+                    # Edição de um card: UPDATEs só do registro, sem olhar a lista
+                    for anterior, item in changed:
+                        for op in diff_record(anterior, item):
+                            self._apply_op(cur, op, anterior)
+                else:
+                    anteriores = {i.get("id"): i for i in previous if isinstance(i, dict)}
+                    for op in diff_records(previous, data):
+                        self._apply_op(cur, op, anteriores.get(op["id"]))
+                cur.executemany(
+                    "INSERT INTO meta (chave, valor) VALUES (?, ?) "
+                    "ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor",
+                    [
+                        ("schema_version", str(self.schema_version)),
+                        *((k, json.dumps(v, ensure_ascii=False)) for k, v in self.meta.items()),
+                    ],
+                )
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+    def _insert_estab(self, cur: sqlite3.Cursor, item: dict, pos: int | None = None) -> None:
+        if pos is None:
+            (pos,) = cur.execute("SELECT COALESCE(MAX(posicao) + 1, 0) FROM estabelecimentos").fetchone()
+        valores, extra = _split_extra(item, _COLS_ESTAB, _FIXOS_ESTAB)
+        cur.execute(
+            f"INSERT INTO estabelecimentos (id, posicao, {', '.join(_COLS_ESTAB)}, extra) "
+            f"VALUES (?, ?, {', '.join('?' for _ in _COLS_ESTAB)}, ?)",
+            (item["id"], pos, *valores, extra),
+        )
+        cur.executemany(
+            "INSERT INTO etapas (estabelecimento_id, etapa, posicao, concluida) VALUES (?, ?, ?, ?)",
+            [(item["id"], etapa, i, int(bool(v))) for i, (etapa, v) in enumerate((item.get("etapas") or {}).items())],
+        )
+        self._insert_missoes(cur, item["id"], item.get("missoes") or [])
+
+    @staticmethod
+    def _insert_missoes(cur: sqlite3.Cursor, est_id: str, missoes: list[dict]) -> None:
+        rows = []
+        for pos, m in enumerate(missoes):
+            if not isinstance(m, dict) or not m.get("id"):
+                continue
+            valores, extra = _split_extra(m, _COLS_MISSAO, _FIXOS_MISSAO)
+            rows.append((est_id, m["id"], pos, *valores, extra))
+        cur.executemany(
+            f"INSERT OR REPLACE INTO missoes (estabelecimento_id, id, posicao, {', '.join(_COLS_MISSAO)}, extra) "
+            f"VALUES (?, ?, ?, {', '.join('?' for _ in _COLS_MISSAO)}, ?)",
+            rows,
+        )
+
+    def _apply_op(self, cur: sqlite3.Cursor, op: dict, anterior: dict | None) -> None:
+        tipo, est_id = op["op"], op["id"]
+        if tipo == "upsert":
+            row = cur.execute("SELECT posicao FROM estabelecimentos WHERE id = ?", (est_id,)).fetchone()
+            cur.execute("DELETE FROM estabelecimentos WHERE id = ?", (est_id,))
+            self._insert_estab(cur, op["registro"], row[0] if row else None)
+        elif tipo == "delete":
+            cur.execute("DELETE FROM estabelecimentos WHERE id = ?", (est_id,))
+        elif tipo == "patch":
+            campos = dict(op["campos"])
+            etapas = campos.pop("etapas", None)
+            missoes = campos.pop("missoes", None)
+            simples = {k: v for k, v in campos.items() if k in _COLS_ESTAB}
+            if simples:
+                cur.execute(
+                    f"UPDATE estabelecimentos SET {', '.join(f'{k} = ?' for k in simples)} WHERE id = ?",
+                    (*((v or "") for v in simples.values()), est_id),
+                )
+            outros = {k: v for k, v in campos.items() if k not in _COLS_ESTAB}
+            if outros:
+                row = cur.execute("SELECT extra FROM estabelecimentos WHERE id = ?", (est_id,)).fetchone()
+                extra = json.loads(row[0]) if row and row[0] else {}
+                extra.update(outros)
+                cur.execute(
+                    "UPDATE estabelecimentos SET extra = ? WHERE id = ?",
+                    (json.dumps(extra, ensure_ascii=False), est_id),
+                )
+            if etapas is not None:
+                etapas_antes = (anterior or {}).get("etapas") or {}
+                cur.executemany(
+                    "INSERT INTO etapas (estabelecimento_id, etapa, posicao, concluida) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(estabelecimento_id, etapa) DO UPDATE SET concluida = excluded.concluida",
+                    [
+                        (est_id, etapa, i, int(bool(v)))
+                        for i, (etapa, v) in enumerate(etapas.items())
+                        if etapas_antes.get(etapa) != v
+                    ],
+                )
+            if missoes is not None:
+                cur.execute("DELETE FROM missoes WHERE estabelecimento_id = ?", (est_id,))
+                self._insert_missoes(cur, est_id, missoes)
+        elif tipo == "missao":
+            m = op["missao"]
+            valores, extra = _split_extra(m, _COLS_MISSAO, _FIXOS_MISSAO)
+            cur.execute(
+                f"INSERT INTO missoes (estabelecimento_id, id, posicao, {', '.join(_COLS_MISSAO)}, extra) "
+                f"VALUES (?, ?, (SELECT COALESCE(MAX(posicao) + 1, 0) FROM missoes WHERE estabelecimento_id = ?), "
+                f"{', '.join('?' for _ in _COLS_MISSAO)}, ?) "
+                "ON CONFLICT(estabelecimento_id, id) DO UPDATE SET "
+                + ", ".join(f"{c} = excluded.{c}" for c in [*_COLS_MISSAO, "extra"]),
+                (est_id, m["id"], est_id, *valores, extra),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def backend_from_env(environ=None) -> tuple[str, int]:
+    """(backend, journal_max_bytes) configurados pelas env vars.
+
+    DATA_BACKEND manda; sem ele, DATA_JOURNAL=1/true/yes escolhe o journal
+    e o padrão é json. O app e o gerar_agenda leem a configuração daqui para
+    abrirem sempre os mesmos arquivos.
+    """
+
+    environ = os.environ if environ is None else environ
+    backend = (environ.get("DATA_BACKEND") or "").strip().lower()
+    journal = (environ.get("DATA_JOURNAL") or "").strip().lower() in {"1", "true", "yes"}
+    max_bytes = int(environ.get("DATA_JOURNAL_MAX_BYTES") or 256 * 1024)
+    return backend or ("journal" if journal else "json"), max_bytes
+
+
+def create_storage(
+    backend: str,
+    data_dir: str,
+    schema_version: int,
+    journal_max_bytes: int = 256 * 1024,
+) -> Storage:
+    """Instancia o backend local configurado (DATA_BACKEND)."""
+
+    json_path = os.path.join(data_dir, "dados.json")
+    backend = (backend or "json").strip().lower()
+    if backend == "json":
+        return JsonFileStorage(json_path, schema_version)
+    if backend == "journal":
+        return JournalStorage(json_path, schema_version, max_bytes=journal_max_bytes)
+    if backend == "sqlite":
+        return SqliteStorage(
+            os.path.join(data_dir, "dados.sqlite3"), schema_version, legacy_json=json_path
+        )
+    raise ValueError(f"DATA_BACKEND inválido: {backend!r} (use json, journal ou sqlite)")
+
+
+def import_json(json_path: str, sqlite_path: str | None = None, storage: SqliteStorage | None = None) -> int:
+    """Importa um dados.json (qualquer versão) para SQLite. Retorna quantos estabelecimentos.
+
+    A schema_version do JSON é preservada: o app roda as migrações pendentes
+    na primeira leitura.
+    """
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    data, version = from_document(raw)
+
+    if storage is None:
+        storage = SqliteStorage(sqlite_path or os.path.splitext(json_path)[0] + ".sqlite3", version)
+    atual = storage.schema_version
+    storage.schema_version = version
+    storage.meta = document_meta(raw)
+    try:
+        storage.save(data)
+    finally:
+        storage.schema_version = atual
+    return len(data)
+
+
+class GithubSnapshot(NamedTuple):
+    # data=None quando o arquivo não mudou desde o sha informado
+    data: list[dict] | dict | None
+    sha: str | None
+
+
+class GithubStorage:
+    """Documento JSON inteiro no GitHub (Contents API)."""
+
+    def __init__(
+        self,
+        client: GithubClient,
+        repo: str,
+        branch: str = "main",
+        path: str = "dados.json",
+    ) -> None:
+        self.client = client
+        self.repo = repo
+        self.branch = branch
+        self.path = path.lstrip("/")
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.client.token and self.repo)
+
+    def _contents_path(self, with_ref: bool = False) -> str:
+        path = f"/repos/{self.repo}/contents/{urllib.parse.quote(self.path)}"
+        if with_ref:
+            path += f"?ref={urllib.parse.quote(self.branch)}"
+        return path
+
+    def load(self, known_sha: str | None = None) -> GithubSnapshot | None:
+        """Carrega o documento do GitHub. Retorna None se não existir.
+
+        O cliente faz GET condicional: se nada mudou o GitHub responde 304. Nesse
+        caso, ou se o sha do arquivo for igual a `known_sha`, não decodifica nada.
+        """
+
+        try:
+            resp = self.client.request("GET", self._contents_path(with_ref=True))
+        except RuntimeError as e:
+            # 404 = arquivo não existe ainda
+            if "404" in str(e):
+                return None
+            raise
+
+        sha = resp.body.get("sha")
+        if known_sha and sha == known_sha:
+            return GithubSnapshot(data=None, sha=sha)
+
+        content_b64 = (resp.body.get("content") or "").encode("utf-8")
+        if not content_b64:
+            return None
+
+        decoded = base64.b64decode(content_b64).decode("utf-8")
+        return GithubSnapshot(data=json.loads(decoded), sha=sha)
+
+    def save(self, document: dict, sha: str | None, commit_message: str) -> str | None:
+        """Grava o documento no GitHub. Retorna o sha novo do arquivo."""
+
+        payload = {
+            "message": commit_message,
+            "content": base64.b64encode(
+                json.dumps(document, ensure_ascii=False, indent=2).encode("utf-8")
+            ).decode("utf-8"),
+            "branch": self.branch,
+        }
+        if sha:
+            payload["sha"] = sha
+
+        resp = self.client.request("PUT", self._contents_path(), payload=payload)
+        return (resp.body.get("content") or {}).get("sha") or sha
+
+
+def _git_blob_sha(content: bytes) -> str:
+    """sha que o git daria para um arquivo com este conteúdo (sem precisar enviar)."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class ShardedGithubStorage:
+    """Um arquivo por estabelecimento no GitHub: `<dir>/<id>.json` + `<dir>/_manifest.json`.
+
+    O manifesto guarda schema_version e o resto do documento (ex: agregados).
+
+    - load(): uma listagem da árvore do diretório (Git Trees API) e download
+      só dos arquivos cujo blob sha mudou desde a última leitura.
+    - save(): envia só os estabelecimentos alterados, em um único commit (Git
+      Data API: tree com base_tree + commit + avanço da ref). Se a branch andou
+      no meio, refaz em cima da nova ponta; só é conflito se alguém alterou o
+      *mesmo* estabelecimento (conferido só nos arquivos enviados, e nem isso
+      se a ponta é o último commit deste processo). O sha novo do diretório
+      vem da resposta do POST da árvore, sem listar o diretório de novo.
+
+    Sem ordem global no manifesto (ele ficaria do tamanho da base): os
+    registros voltam ordenados por id e o app ordena por data/hora.
+    """
+
+    MANIFEST = "_manifest.json"
+    # Acima disso, conferir conflitos com uma listagem sai mais barato que um GET por arquivo
+    CHECK_PATHS_MAX = 20
+
+    def __init__(
+        self,
+        client: GithubClient,
+        repo: str,
+        branch: str = "main",
+        directory: str = "dados",
+        legacy: GithubStorage | None = None,
+    ) -> None:
+        self.client = client
+        self.repo = repo
+        self.branch = branch
+        self.directory = directory.strip("/")
+        # Arquivo único antigo, lido uma vez se o diretório ainda não existir
+        self.legacy = legacy
+        self._lock = threading.Lock()
+        # id -> (blob sha, registro) do que já conhecemos do GitHub
+        self._shards: dict[str, tuple[str, dict]] = {}
+        self._manifest: tuple[str, dict] | None = None
+        # Commit que `_shards` espelha, quando foi este processo que o criou
+        self._head: str | None = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.client.token and self.repo)
+
+    def _api(self, path: str) -> str:
+        return f"/repos/{self.repo}{path}"
+
+    def _list_dir(self, rev: str) -> tuple[str, dict[str, str]] | None:
+        """(sha da árvore do diretório, {nome do arquivo: blob sha}) em `rev`."""
+        treeish = urllib.parse.quote(f"{rev}:{self.directory}", safe="")
+        try:
+            # Só a listagem pela branch é relida; por sha de commit, não guarda
+            resp = self.client.request(
+                "GET", self._api(f"/git/trees/{treeish}"), cache=rev == self.branch
+            )
+        except RuntimeError as e:
+            if "404" in str(e):
+                return None
+            raise
+        entries = {e["path"]: e["sha"] for e in resp.body.get("tree") or [] if e.get("type") == "blob"}
+        return resp.body.get("sha"), entries
+
+    def _get_blob(self, sha: str) -> bytes:
+        resp = self.client.request("GET", self._api(f"/git/blobs/{sha}"), cache=False)
+        return base64.b64decode((resp.body.get("content") or "").encode("utf-8"))
+
+    def load(self, known_sha: str | None = None) -> GithubSnapshot | None:
+        listing = self._list_dir(self.branch)
+        if listing is None:
+            if self.legacy is None:
+                return None
+            # O primeiro save cria o diretório com tudo; até lá, o sha do arquivo
+            # antigo (prefixado) evita redecodificá-lo a cada leitura
+            legacy_sha = known_sha[len("legacy:"):] if known_sha and known_sha.startswith("legacy:") else None
+            snap = self.legacy.load(known_sha=legacy_sha)
+            if snap is None:
+                return None
+            return GithubSnapshot(data=snap.data, sha=f"legacy:{snap.sha}")
+
+        tree_sha, entries = listing
+        if known_sha and tree_sha == known_sha:
+            return GithubSnapshot(data=None, sha=tree_sha)
+
+        with self._lock:
+            conhecidos = dict(self._shards)
+            manifest = self._manifest
+
+        shards: dict[str, tuple[str, dict]] = {}
+        for name, blob_sha in entries.items():
+            if name == self.MANIFEST or not name.endswith(".json"):
+                continue
+            est_id = name[: -len(".json")]
+            atual = conhecidos.get(est_id)
+            if atual and atual[0] == blob_sha:
+                shards[est_id] = atual
+            else:
+                shards[est_id] = (blob_sha, json.loads(self._get_blob(blob_sha).decode("utf-8")))
+
+        manifest_sha = entries.get(self.MANIFEST)
+        if manifest_sha and not (manifest and manifest[0] == manifest_sha):
+            manifest = (manifest_sha, json.loads(self._get_blob(manifest_sha).decode("utf-8")))
+
+        with self._lock:
+            self._shards = shards
+            self._manifest = manifest
+            self._head = None
+
+        manifesto = manifest[1] if manifest else {}
+        version = int(manifesto.get("schema_version") or 0)
+        registros = [copy.deepcopy(shards[k][1]) for k in sorted(shards)]
+        return GithubSnapshot(
+            data=to_document(registros, version, document_meta(copy.deepcopy(manifesto))), sha=tree_sha
+        )
+
+    def _remote_blob(self, rev: str, est_id: str) -> str | None:
+        """Blob sha de `<dir>/<id>.json` em `rev` (None = não existe)."""
+        path = urllib.parse.quote(f"{self.directory}/{est_id}.json")
+        try:
+            resp = self.client.request(
+                "GET", self._api(f"/contents/{path}?ref={urllib.parse.quote(rev)}"), cache=False
+            )
+        except RuntimeError as e:
+            if "404" in str(e):
+                return None
+            raise
+        return resp.body.get("sha")
+
+    def _remote_blobs(self, rev: str, ids: list[str]) -> dict[str, str | None]:
+        """Blob sha atual de cada id em `rev`: um GET por arquivo, ou uma listagem se forem muitos."""
+        if len(ids) <= self.CHECK_PATHS_MAX:
+            return {est_id: self._remote_blob(rev, est_id) for est_id in ids}
+        listing = self._list_dir(rev)
+        entries = listing[1] if listing else {}
+        return {est_id: entries.get(f"{est_id}.json") for est_id in ids}
+
+    def _dir_sha(self, tree: dict) -> str | None:
+        """sha do diretório dentro da árvore recém-criada (resposta do POST /git/trees)."""
+        entries = tree.get("tree") or []
+        partes = self.directory.split("/")
+        for i, parte in enumerate(partes):
+            sha = next(
+                (e.get("sha") for e in entries if e.get("path") == parte and e.get("type") == "tree"), None
+            )
+            if sha is None or i == len(partes) - 1:
+                return sha
+            # Diretório aninhado: lista só o nível de cima (pequeno), não os arquivos
+            treeish = urllib.parse.quote(f"{tree['sha']}:{'/'.join(partes[: i + 1])}", safe="")
+            resp = self.client.request("GET", self._api(f"/git/trees/{treeish}"), cache=False)
+            entries = resp.body.get("tree") or []
+        return None
+
+    @staticmethod
+    def _encode(obj: dict) -> bytes:
+        return (json.dumps(obj, ensure_ascii=False, indent=2) + "\n").encode("utf-8")
+
+    def save(self, document: dict, sha: str | None, commit_message: str) -> str | None:
+        data, version = from_document(document)
+        manifesto = {"schema_version": version, **document_meta(document)}
+        manifest_bytes = self._encode(manifesto)
+
+        with self._lock:
+            base = dict(self._shards)
+            manifest_base = self._manifest[0] if self._manifest else None
+
+        # Só entra no commit o que mudou em relação ao que o GitHub já tem
+        novos: dict[str, tuple[str, dict, bytes]] = {}
+        for item in data:
+            if not isinstance(item, dict) or not item.get("id"):
+                continue
+            content = self._encode(item)
+            blob_sha = _git_blob_sha(content)
+            if base.get(item["id"], (None,))[0] != blob_sha:
+                novos[item["id"]] = (blob_sha, copy.deepcopy(item), content)
+        ids = {item.get("id") for item in data if isinstance(item, dict)}
+        removidos = [est_id for est_id in base if est_id not in ids]
+        manifest_sha = _git_blob_sha(manifest_bytes)
+        manifest_mudou = manifest_sha != manifest_base
+
+        if not novos and not removidos and not manifest_mudou:
+            return sha
+
+        for _ in range(3):
+            ref = self.client.request("GET", self._api(f"/git/ref/heads/{urllib.parse.quote(self.branch)}"))
+            parent = ref.body["object"]["sha"]
+            commit = self.client.request("GET", self._api(f"/git/commits/{parent}"), cache=False)
+
+            with self._lock:
+                # Ponta = último commit nosso: o GitHub tem exatamente `base`
+                conferir = parent != self._head
+            remotos = (
+                self._remote_blobs(parent, [*novos, *removidos])
+                if conferir
+                else {est_id: base[est_id][0] for est_id in removidos}
+            )
+            for est_id in [*novos, *removidos] if conferir else []:
+                esperado = base.get(est_id, (None,))[0]
+                novo = novos[est_id][0] if est_id in novos else None
+                if remotos[est_id] not in {esperado, novo}:
+                    raise RuntimeError(
+                        f"GitHub API error 409: estabelecimento {est_id} foi alterado por outra pessoa"
+                    )
+
+            entries = [
+                {
+                    "path": f"{self.directory}/{est_id}.json",
+                    "mode": "100644",
+                    "type": "blob",
+                    "content": content.decode("utf-8"),
+                }
+                for est_id, (_, _, content) in novos.items()
+            ]
+            entries += [
+                {"path": f"{self.directory}/{est_id}.json", "mode": "100644", "type": "blob", "sha": None}
+                for est_id in removidos
+                if remotos.get(est_id)
+            ]
+            if manifest_mudou:
+                entries.append(
+                    {
+                        "path": f"{self.directory}/{self.MANIFEST}",
+                        "mode": "100644",
+                        "type": "blob",
+                        "content": manifest_bytes.decode("utf-8"),
+                    }
+                )
+
+            tree = self.client.request(
+                "POST",
+                self._api("/git/trees"),
+                payload={"base_tree": commit.body["tree"]["sha"], "tree": entries},
+            )
+            new_commit = self.client.request(
+                "POST",
+                self._api("/git/commits"),
+                payload={"message": commit_message, "tree": tree.body["sha"], "parents": [parent]},
+            )
+            try:
+                self.client.request(
+                    "PATCH",
+                    self._api(f"/git/refs/heads/{urllib.parse.quote(self.branch)}"),
+                    payload={"sha": new_commit.body["sha"], "force": False},
+                )
+            except RuntimeError as e:
+                # 422 = não é fast-forward (a branch andou): refaz em cima da nova ponta
+                if "422" in str(e):
+                    continue
+                raise
+            break
+        else:
+            raise RuntimeError("GitHub API error 409: a branch mudou durante o envio, tente de novo")
+
+        with self._lock:
+            for est_id, (blob_sha, item, _) in novos.items():
+                self._shards[est_id] = (blob_sha, item)
+            for est_id in removidos:
+                self._shards.pop(est_id, None)
+            self._manifest = (manifest_sha, copy.deepcopy(manifesto))
+            self._head = new_commit.body["sha"]
+
+        return self._dir_sha(tree.body)
+
+
+def _record_hashes(document) -> dict[str, bytes]:
+    """id -> hash do conteúdo de cada estabelecimento (para o merge de 3 vias)."""
+    hashes = {}
+    for item in from_document(document)[0]:
+        if isinstance(item, dict) and item.get("id"):
+            texto = json.dumps(item, ensure_ascii=False, sort_keys=True)
+            hashes[item["id"]] = hashlib.sha1(texto.encode("utf-8")).digest()
+    return hashes
+
+
+def merge_documents(base: dict[str, bytes] | None, local: dict, remote) -> tuple[dict, set[str]]:
+    """Junta por id as alterações locais ainda não enviadas com o documento do GitHub.
+
+    `base` são os hashes (ver _record_hashes) do que o GitHub tinha quando o
+    local foi editado. Registro alterado só de um lado fica com aquele lado;
+    alterado dos dois lados (ou sem `base` para decidir) fica com a versão
+    local e o id volta em `conflitos`. O resto do documento (ex: agregados)
+    vem do local.
+    """
+
+    base = base or {}
+    local_data, local_version = from_document(local)
+    remote_data, remote_version = from_document(remote)
+    locais = _record_hashes(local)
+    remotos = _record_hashes(remote)
+    por_id = {item["id"]: item for item in local_data if isinstance(item, dict) and item.get("id")}
+
+    merged: list[dict] = []
+    conflitos: set[str] = set()
+    for item in remote_data:
+        est_id = item.get("id") if isinstance(item, dict) else None
+        if not est_id:
+            continue
+        local_mudou = locais.get(est_id) != base.get(est_id)
+        remoto_mudou = remotos.get(est_id) != base.get(est_id)
+        if est_id not in por_id:
+            if est_id in base and not remoto_mudou:
+                continue  # removido aqui
+            if est_id in base:
+                conflitos.add(est_id)  # removido aqui, alterado lá: fica o de lá
+            merged.append(item)
+        elif not local_mudou:
+            merged.append(item)
+        else:
+            if remoto_mudou and locais[est_id] != remotos[est_id]:
+                conflitos.add(est_id)
+            merged.append(por_id[est_id])
+
+    for item in local_data:
+        est_id = item.get("id") if isinstance(item, dict) else None
+        if not est_id:
+            merged.append(item)  # sem id não dá para casar: mantém o local
+        elif est_id not in remotos:
+            if est_id in base:
+                if locais[est_id] == base[est_id]:
+                    continue  # removido lá
+                conflitos.add(est_id)  # removido lá, alterado aqui: fica o daqui
+            merged.append(item)
+
+    version = max(local_version, remote_version)
+    return to_document(merged, version, document_meta(local)), conflitos
+
+
+class GithubSyncWorker:
+    """Write-behind: junta os saves e manda um único PUT a cada `interval` segundos.
+
+    O save local continua síncrono; aqui só entra o documento mais recente
+    (cada save já tem o estado completo, então "juntar" = ficar com o último).
+    `sha` é o sha atual do arquivo no GitHub, usado no PUT e nas leituras.
+    Quem chama não altera o documento depois do submit(): o último enviado
+    fica guardado como base do merge, sem hash por envio.
+
+    Em conflito (409/422: alguém gravou antes) o documento pendente não é
+    descartado: o worker relê o GitHub e reenvia o local juntado com ele por
+    id (merge_documents). Enquanto o app não reler o GitHub (`needs_reload`),
+    todo envio seguinte é juntado do mesmo jeito, porque os dados locais
+    ainda não têm as alterações de lá.
+    """
+
+    def __init__(self, github: GithubStorage, interval: float = 10.0) -> None:
+        self.github = github
+        self.interval = interval
+        self.sha: str | None = None
+        self._cond = threading.Condition()
+        self._pending: dict | None = None
+        self._pending_since = 0.0
+        self._pending_count = 0
+        self._in_flight = 0
+        self._thread: threading.Thread | None = None
+        # Hashes por id do GitHub de onde vieram os dados locais (base do merge)
+        self._base: dict[str, bytes] | None = None
+        # Último documento enviado, quando ele é a base: os hashes só são
+        # calculados se houver um merge (um save não paga pela lista inteira)
+        self._base_doc: dict | None = None
+        # Documento do GitHub quando ele divergiu da base (None = não divergiu)
+        self._remote: dict | None = None
+        self.conflicts: set[str] = set()
+        self.last_sync_at: float | None = None
+        self.last_error: str | None = None
+
+    @property
+    def needs_reload(self) -> bool:
+        """O GitHub tem alterações que os dados locais ainda não têm."""
+        with self._cond:
+            return self._remote is not None
+
+    def set_remote(self, sha: str | None, document) -> None:
+        """Registra o que o app leu do GitHub (chamar antes de migrar/alterar `document`)."""
+        base = _record_hashes(document)
+        with self._cond:
+            self.sha = sha
+            self._base, self._base_doc = base, None
+            self._remote = None
+
+    def submit(self, document: dict) -> None:
+        with self._cond:
+            if self._pending is None:
+                self._pending_since = time.monotonic()
+            self._pending = document
+            self._pending_count += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="github-sync", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+            self._cond.notify_all()
+
+    @property
+    def busy(self) -> bool:
+        """Há alterações locais ainda não enviadas (na fila ou no PUT em andamento)."""
+        with self._cond:
+            return self._pending is not None or self._in_flight > 0
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "fila": self._pending_count + self._in_flight,
+                "ultimo_sync": self.last_sync_at,
+                "erro": self.last_error,
+                "conflitos": sorted(self.conflicts),
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                # Debounce: espera completar o intervalo desde o 1º save pendente
+                while self._pending is not None:
+                    restante = self._pending_since + self.interval - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+            self._push()
+
+    def _requeue(self, document: dict, count: int, imediato: bool = False) -> None:
+        """Devolve um envio que falhou para a fila. Chamar com `_cond` na mão."""
+        self._in_flight = 0
+        if self._pending is None:
+            self._pending, self._pending_count = document, count
+            # Conflito: reenvia no próximo ciclo, sem esperar o intervalo de novo
+            self._pending_since = time.monotonic() - (self.interval if imediato else 0)
+        else:
+            # Já há um documento mais novo (que também tem estas alterações)
+            self._pending_count += count
+        self._cond.notify_all()
+
+    def _push(self) -> None:
+        with self._cond:
+            document, count = self._pending, self._pending_count
+            if document is None:
+                return
+            self._pending, self._pending_count = None, 0
+            self._in_flight = count
+            base, base_doc, remote, sha = self._base, self._base_doc, self._remote, self.sha
+
+        enviado, conflitos = document, set()
+        if remote is not None:
+            if base_doc is not None:
+                base = _record_hashes(base_doc)
+            enviado, conflitos = merge_documents(base, document, remote)
+
+        message = "Update dados.json" if count == 1 else f"Update dados.json ({count} alterações)"
+        try:
+            new_sha = self.github.save(enviado, sha, message)
+        except Exception as e:
+            erro = str(e)
+            if "409" in erro or "422" in erro:
+                # sha desatualizado: alguém gravou antes. Relê o GitHub; o
+                # documento continua na fila e é juntado com ele no reenvio.
+                try:
+                    snap = self.github.load()
+                except Exception as e2:
+                    erro = f"{erro} (releitura do GitHub falhou: {e2})"
+                    snap = None
+                    conflito = False
+                else:
+                    conflito = True
+            else:
+                snap, conflito = None, False
+            with self._cond:
+                self.last_error = erro
+                if conflito:
+                    # Arquivo apagado lá (snap None): recria com o local inteiro
+                    self.sha = snap.sha if snap is not None else None
+                    self._remote = snap.data if snap is not None else None
+                # Falha de rede/API (ou releitura): tenta de novo no próximo ciclo
+                self._requeue(document, count, imediato=conflito)
+            return
+
+        with self._cond:
+            self.sha = new_sha
+            if remote is None:
+                # O app não altera um documento depois de enviá-lo (só troca a lista)
+                self._base, self._base_doc = None, enviado
+                self.conflicts.clear()
+            else:
+                # Os dados locais continuam sem as alterações de lá até o app reler
+                self._remote = enviado
+                self.conflicts |= conflitos
+                if self._base_doc is base_doc:
+                    # Os próximos envios juntam com a mesma base: não recalcula
+                    self._base, self._base_doc = base, None
+            self._in_flight = 0
+            self.last_sync_at = time.time()
+            self.last_error = None
+
+    def flush(self) -> None:
+        """Envia agora o que estiver pendente (usado no atexit)."""
+        self._push()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ferramentas de persistência da Agenda de Visitas")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    imp = sub.add_parser("importar", help="importa um dados.json para SQLite")
+    imp.add_argument("json_path")
+    imp.add_argument("sqlite_path", nargs="?")
+    args = parser.parse_args()
+
+    if args.comando == "importar":
+        total = import_json(args.json_path, args.sqlite_path)
+        print(f"{total} estabelecimentos importados.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import io
+import json
+import logging
+
+import pytest
+
+# Fora do `streamlit run` o cache_resource avisa a cada chamada; aqui é esperado
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+import app  # noqa: E402
+import importar  # noqa: E402
+from benchmarks.fake_github import FakeGithubServer  # noqa: E402
+from storage import to_document  # noqa: E402
+
+
+@pytest.fixture
+def dados(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(app, "DATA_BACKEND", "json")
+    monkeypatch.setattr(app, "GITHUB_SYNC", False)
+    app._storage.clear()
+    app._data_cache.clear()
+    registros = [
+        {"id": "a", "local": "Escola A", "data_hora": "A Definir", "notas": ""},
+        {"id": "b", "local": "Escola B", "data_hora": "A Definir", "notas": ""},
+    ]
+    app.save_data(app.migrate_data(registros, 0)[0])
+    yield
+    app._storage.clear()
+    app._data_cache.clear()
+
+
+def test_importar_planilha_nao_perde_save_feito_durante_a_leitura(dados, monkeypatch):
+    ler = importar.ler
+
+    def ler_com_save_no_meio(*args, **kwargs):
+        for i, registro in enumerate(ler(*args, **kwargs)):
+            if i == 0:
+                # Outra sessão salva o mesmo estabelecimento enquanto a planilha é lida
+                outro = app.load_record("a")
+                outro["notas"] = "editado na outra sessão"
+                app.save_record(outro)
+            yield registro
+
+    monkeypatch.setattr(importar, "ler", ler_com_save_no_meio)
+    csv = "id,Local,Prioridade\na,Escola A,Alta\n,Escola C,Baixa\n".encode("utf-8")
+    resultado = app.importar_planilha(io.BytesIO(csv), "planilha.csv", "Teste")
+
+    assert (resultado.novos, resultado.alterados) == (1, 1)
+    app._data_cache.clear()
+    por_local = {item["local"]: item for item in app.load_data()}
+    assert por_local["Escola A"]["notas"] == "editado na outra sessão"
+    assert por_local["Escola A"]["prioridade"] == "Alta"
+    assert "Escola C" in por_local
+
+
+def test_sincronizar_github_sem_mudanca_nao_monta_registros(dados, monkeypatch):
+    registros = app.migrate_data([{"id": "g", "local": "Escola G", "data_hora": "A Definir"}], 0)[0]
+    with FakeGithubServer() as server:
+        server.seed_file("dados.json", json.dumps(to_document(registros, app.SCHEMA_VERSION)).encode("utf-8"))
+        monkeypatch.setattr(app, "GITHUB_SYNC", True)
+        monkeypatch.setattr(app, "GITHUB_TOKEN", "teste")
+        monkeypatch.setattr(app, "GITHUB_REPO", "teste/pedegenda")
+        monkeypatch.setattr(app, "GITHUB_API_URL", server.url)
+        app._github.clear()
+        app._github_sync.clear()
+        try:
+            assert [r["local"] for r in app.sincronizar_github()] == ["Escola G"]
+
+            montados = []
+            for nome in ("migrate_data", "_copy_records"):
+                original = getattr(app, nome)
+                monkeypatch.setattr(app, nome, lambda *a, f=original: montados.append(f) or f(*a))
+            # GitHub inalterado: só o GET condicional, nenhum registro montado
+            assert app.sincronizar_github() is None
+            assert montados == []
+            assert [r["local"] for r in app.load_data()] == ["Escola G"]
+        finally:
+            app._github.clear()
+            app._github_sync.clear()
+
+
+def test_documento_v0_migra_ate_a_versao_atual(monkeypatch):
+    normalizados = []
+    normalizar_lote = app.datahora.normalizar_lote
+    monkeypatch.setattr(
+        app.datahora, "normalizar_lote", lambda valores: normalizados.append(valores) or normalizar_lote(valores)
+    )
+    v0 = [
+        {"local": "Escola A", "data_hora": "13/01/2026 -\nManhã", "missoes": [{"titulo": "Retorno"}]},
+        {"local": "Escola B", "etapas": {"Captação": True}},
+    ]
+
+    data, sujo = app.migrate_data(v0, 0)
+
+    assert sujo and app.SCHEMA_VERSION == 4
+    # v2, v3 e v4 renormalizam a data/hora: uma passada só
+    assert len(normalizados) == 1
+    a, b = data
+    assert a["id"] and a["etapas"] == {etapa: False for etapa in app.ETAPAS_PADRAO}
+    assert (a["data_hora_iso"], a["sem_data"]) == ("2026-01-13T09:00", False)
+    missao = a["missoes"][0]
+    assert missao["id"] and (missao["status"], missao["data_hora"], missao["sem_data"]) == ("Pendente", "A Definir", True)
+    assert (b["data_hora"], b["data_hora_iso"], b["sem_data"]) == ("A Definir", "", True)
+    assert b["etapas"]["Captação"] and b["status"] == app._status_from_etapas(b["etapas"])
+    assert app.migrate_data(data, app.SCHEMA_VERSION) == (data, False)
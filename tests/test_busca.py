@@ -0,0 +1,29 @@
+from benchmarks.gerador import gerar
+from busca import IndiceBusca
+
+
+def _incremental(data):
+    indice = IndiceBusca()
+    for item in data:
+        indice.indexar(item)
+    return indice
+
+
+def test_montagem_em_lote_igual_a_incremental():
+    data = gerar(300, seed=7)
+    data.append(dict(data[0], local="Açaí Repetido"))  # id repetido: vale o último
+    lote, incremental = IndiceBusca.de_registros(data), _incremental(data)
+    assert lote.vocabulario == incremental.vocabulario == sorted(lote.postings)
+    assert lote.postings == incremental.postings
+    assert lote.buscar("acai repet") == {data[0]["id"]}
+
+
+def test_atualizar_lista_grande_mantem_vocabulario_ordenado():
+    antes = gerar(200, seed=1)
+    depois = [dict(item, local=f"Novo Lugar {i}") for i, item in enumerate(antes[:150])]
+    indice = IndiceBusca.de_registros(antes)
+    indice.atualizar_lista(antes, depois)
+    esperado = IndiceBusca.de_registros(depois)
+    assert indice.vocabulario == esperado.vocabulario
+    assert indice.postings == esperado.postings
+    assert indice.buscar("novo lugar 149") == {depois[149]["id"]}
@@ -0,0 +1,28 @@
+import datahora
+
+VALORES = [
+    "20/01/2026 - Manhã\n(confirmar)",
+    "20/01/2026\n14h",
+    "20/01/2026 -\r\n 07:30",
+    "\n21/01/2026 - Tarde\t",
+    "A Definir\nMarcar dia",
+    "07:30\n",
+    "\n",
+    "13/01/2026 - Manhã",
+    "13 - 17 horas",
+]
+
+
+def test_parse_e_parse_lote_concordam_em_valores_com_quebra_de_linha():
+    lote = datahora.parse_lote(VALORES)
+    for i, valor in enumerate(VALORES):
+        classe, data, minutos = datahora.parse(valor)
+        assert lote["classe"][i] == classe, valor
+        assert (lote["data"][i].date().isoformat() if classe == datahora.DATADO else None) == data, valor
+        assert lote["minutos"][i] == (-1 if minutos is None else minutos), valor
+
+
+def test_normalizar_e_normalizar_lote_concordam():
+    isos, sem_data = datahora.normalizar_lote(VALORES)
+    assert list(zip(isos, sem_data)) == [datahora.normalizar(v) for v in VALORES]
+    assert datahora.normalizar("20/01/2026 - Manhã\n(confirmar)") == ("2026-01-20T09:00", False)
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+import exportacoes
+
+
+def _esperar(exportador: exportacoes.Exportador, formato: str) -> None:
+    limite = time.monotonic() + 10
+    while exportador.gerando(formato):
+        assert time.monotonic() < limite, "exportação não terminou"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def formato(monkeypatch):
+    """Formato "teste" que conta as gerações; `falhar(data)` e `segurar` controlam as próximas."""
+    chamadas = []
+    controle = {"falhar": lambda data: False, "segurar": None}
+
+    def gerar(data):
+        chamadas.append(list(data))
+        if controle["segurar"] is not None:
+            controle["segurar"].wait(10)
+        if controle["falhar"](data):
+            raise ValueError("sem pyarrow")
+        return repr(data).encode("utf-8")
+
+    monkeypatch.setitem(exportacoes.FORMATOS, "teste", exportacoes.Formato("Teste", "t.txt", "text/plain", gerar))
+    return chamadas, controle
+
+
+def test_reaproveita_a_pronta_e_gera_de_novo_quando_a_versao_muda(formato):
+    chamadas, _ = formato
+    exportador = exportacoes.Exportador()
+
+    exportador.pedir("teste", 1, ["a"])
+    _esperar(exportador, "teste")
+    assert exportador.pronta("teste", 1) == b"['a']"
+    exportador.pedir("teste", 1, ["a"])
+    assert not exportador.gerando("teste")
+    assert len(chamadas) == 1
+
+    # Dados salvos de novo: a versão antiga não serve mais
+    assert exportador.pronta("teste", 2) is None
+    exportador.pedir("teste", 2, ["a", "b"])
+    _esperar(exportador, "teste")
+    assert exportador.pronta("teste", 2) == b"['a', 'b']"
+    assert exportador.pronta("teste", 1) is None
+    assert len(chamadas) == 2
+
+
+def test_falha_aparece_em_erros_e_libera_o_botao(formato):
+    _, controle = formato
+    controle["falhar"] = lambda data: True
+    exportador = exportacoes.Exportador()
+
+    exportador.pedir("teste", 1, ["a"])
+    _esperar(exportador, "teste")
+    assert exportador.erros["teste"] == "ValueError: sem pyarrow"
+    assert exportador.pronta("teste", 1) is None
+
+    # Pedir de novo tenta outra vez e limpa o erro
+    controle["falhar"] = lambda data: False
+    exportador.pedir("teste", 1, ["a"])
+    _esperar(exportador, "teste")
+    assert "teste" not in exportador.erros
+    assert exportador.pronta("teste", 1) == b"['a']"
+
+
+def test_falha_de_pedido_substituido_nao_vale_para_o_novo(formato):
+    _, controle = formato
+    # Só a geração da versão 1 falha, e só depois que a 2 foi pedida
+    controle["falhar"] = lambda data: data == ["a"]
+    controle["segurar"] = threading.Event()
+    exportador = exportacoes.Exportador()
+
+    exportador.pedir("teste", 1, ["a"])
+    exportador.pedir("teste", 2, ["a", "b"])
+    controle["segurar"].set()
+    _esperar(exportador, "teste")
+
+    assert "teste" not in exportador.erros
+    assert exportador.pronta("teste", 2) == b"['a', 'b']"
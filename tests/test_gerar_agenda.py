@@ -0,0 +1,145 @@
+import contextlib
+import os
+import threading
+
+import openpyxl
+import pytest
+
+import gerar_agenda
+from storage import JournalStorage, backend_from_env
+
+
+def _journal_com_edicao(pasta) -> None:
+    storage = JournalStorage(str(pasta / "dados.json"), 4)
+    antigo = [{"id": "a", "local": "Escola A", "data_hora": "A Definir", "missoes": []}]
+    storage.save(antigo)  # snapshot
+    novo = [dict(antigo[0], local="Escola A (editada)")]
+    storage.save(novo, antigo)  # só no diário
+
+
+def test_backend_from_env():
+    assert backend_from_env({}) == ("json", 256 * 1024)
+    assert backend_from_env({"DATA_JOURNAL": "true", "DATA_JOURNAL_MAX_BYTES": "10"}) == ("journal", 10)
+    assert backend_from_env({"DATA_JOURNAL": "true", "DATA_BACKEND": "SQLite"})[0] == "sqlite"
+
+
+def test_carregar_segue_data_journal_como_o_app(tmp_path, monkeypatch):
+    _journal_com_edicao(tmp_path)
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    monkeypatch.delenv("DATA_BACKEND", raising=False)
+    monkeypatch.setenv("DATA_JOURNAL", "true")
+
+    assert [r["local"] for r in gerar_agenda.carregar()] == ["Escola A (editada)"]
+
+
+def test_carregar_com_data_backend_sqlite_nao_cria_nem_importa_o_banco(tmp_path, monkeypatch):
+    _journal_com_edicao(tmp_path)
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("DATA_BACKEND", "sqlite")
+
+    with pytest.raises(FileNotFoundError):
+        gerar_agenda.carregar()
+    assert not [nome for nome in os.listdir(tmp_path) if nome.startswith("dados.sqlite3")]
+
+def test_watch_com_data_journal_gera_de_novo_a_cada_edicao_do_diario(tmp_path, monkeypatch):
+    _journal_com_edicao(tmp_path)
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    monkeypatch.delenv("DATA_BACKEND", raising=False)
+    monkeypatch.setenv("DATA_JOURNAL", "true")
+    geradas = []
+
+    class Parar(Exception):
+        pass
+
+    def exportar(data):
+        geradas.append([r["local"] for r in data])
+        if len(geradas) == 2:
+            raise Parar
+        # O app grava mais uma edição, de novo só no diário
+        storage = JournalStorage(str(tmp_path / "dados.json"), 4)
+        anterior = storage.load()[0]
+        storage.save([dict(anterior[0], local="Escola A (de novo)")], anterior)
+
+    def rodar():
+        with contextlib.suppress(Parar):
+            gerar_agenda.vigiar(None, list, exportar, espera=0.01)
+
+    # Sem o diário a segunda edição nunca é vista e o --watch não para sozinho
+    vigia = threading.Thread(target=rodar, daemon=True)
+    vigia.start()
+    vigia.join(timeout=10)
+    assert geradas == [["Escola A (editada)"], ["Escola A (de novo)"]]
+
+
+def test_separar_apaga_agendas_de_particoes_que_sumiram(tmp_path):
+    pasta = tmp_path / "agendas"
+    data = [
+        {"id": "a", "local": "Escola A", "responsavel": "Ana", "data_hora": "13/01/2026 - Manhã", "missoes": []},
+        {"id": "b", "local": "Escola B", "responsavel": "Bia", "data_hora": "A Definir", "missoes": []},
+        {"id": "c", "local": "Escola C", "responsavel": "ana", "data_hora": "A Definir", "missoes": []},
+    ]
+    gerados = gerar_agenda.exportar_partes(data, ["responsavel"], str(pasta), processos=1)
+    assert sorted((os.path.basename(arquivo), total) for arquivo, total in gerados) == [
+        ("Agenda_responsavel_ana.xlsx", 2),
+        ("Agenda_responsavel_bia.xlsx", 1),
+    ]
+    (pasta / "leia-me.txt").write_text("não é agenda")
+
+    # Bia sai: o arquivo dela não pode continuar lá parecendo atual
+    gerar_agenda.exportar_partes(data[:1], ["responsavel"], str(pasta), processos=1)
+    assert sorted(os.listdir(pasta)) == ["Agenda_responsavel_ana.xlsx", "leia-me.txt"]
+    ws = openpyxl.load_workbook(pasta / "Agenda_responsavel_ana.xlsx")[gerar_agenda.ABA]
+    assert [linha[0] for linha in ws.iter_rows(min_row=2, values_only=True)] == ["Escola A"]
+
+
+def test_separar_nao_aceita_atualizar(capsys):
+    with pytest.raises(SystemExit):
+        gerar_agenda.main(["--separar", "dia", "--atualizar"])
+    assert "--atualizar" in capsys.readouterr().err
+
+
+def _registro(est_id: str, local: str, data_hora: str, status: str = "Pendente") -> dict:
+    return {"id": est_id, "local": local, "data_hora": data_hora, "status": status, "missoes": []}
+
+
+def _faixas_cf(ws) -> list[str]:
+    return sorted(str(cf.sqref) for cf in ws.conditional_formatting)
+
+
+def test_atualizar_mantem_coluna_manual_e_ajusta_tabela_e_formatacao(tmp_path):
+    saida = str(tmp_path / "Agenda.xlsx")
+    a = _registro("a", "Escola A", "13/01/2026 - Manhã")
+    b = _registro("b", "Escola B", "14/01/2026 - Manhã")
+    c = _registro("c", "Escola C", "15/01/2026 - Manhã")
+    gerar_agenda.gerar([a, b, c], saida)
+
+    # Coluna acrescentada à mão, fora da tabela
+    wb = openpyxl.load_workbook(saida)
+    ws = wb[gerar_agenda.ABA]
+    ws["I1"] = "Contato"
+    for linha in range(2, 5):
+        ws.cell(linha, 9, f"contato {ws.cell(linha, 8).value}")
+    wb.save(saida)
+
+    # a sai, b muda, d entra
+    b2 = dict(b, status="Concluído")
+    d = _registro("d", "Escola D", "A Definir")
+    assert gerar_agenda.atualizar([b2, c, d], saida) == (1, 1, 1)
+
+    ws = openpyxl.load_workbook(saida)[gerar_agenda.ABA]
+    linhas = [(r[0], r[5], r[7], r[8]) for r in ws.iter_rows(min_row=2, values_only=True)]
+    assert linhas == [
+        ("Escola B", "Concluído", "b", "contato b"),
+        ("Escola C", "Pendente", "c", "contato c"),
+        ("Escola D", "Pendente", "d", None),
+    ]
+    assert ws.tables[gerar_agenda.TABELA].ref == "A1:H4"
+    # Prioridade (D) e status (F)
+    assert _faixas_cf(ws) == ["D2:D4", "F2:F4"]
+
+    # Mais uma linha: tabela e formatação condicional acompanham
+    e = _registro("e", "Escola E", "A Definir")
+    assert gerar_agenda.atualizar([b2, c, d, e], saida) == (0, 1, 0)
+    ws = openpyxl.load_workbook(saida)[gerar_agenda.ABA]
+    assert ws.tables[gerar_agenda.TABELA].ref == "A1:H5"
+    assert _faixas_cf(ws) == ["D2:D5", "F2:F5"]
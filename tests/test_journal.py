@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+
+import storage
+from journal import Journal, apply_ops, diff_record, diff_records
+from storage import JournalStorage
+
+
+def _estado(journal: Journal) -> list[dict]:
+    raw, ops = journal.load()
+    data = list((raw or {}).get("estabelecimentos") or [])
+    return apply_ops([dict(item) for item in data], ops)
+
+
+def _doc(data: list[dict]) -> dict:
+    return {"schema_version": 1, "estabelecimentos": data}
+
+
+def _base() -> list[dict]:
+    return [
+        {"id": "a", "nome": "Escola A", "missoes": []},
+        {"id": "b", "nome": "Escola B", "missoes": [{"id": "m1", "status": "Pendente"}]},
+    ]
+
+
+def test_replay_apos_queda_com_linha_truncada(tmp_path):
+    journal = Journal(str(tmp_path / "dados.json"))
+    data = _base()
+    journal.write_snapshot(_doc(data))
+
+    novo = json.loads(json.dumps(data))
+    novo[0]["nome"] = "Escola A2"
+    novo[1]["missoes"][0]["status"] = "Concluída"
+    novo.append({"id": "c", "nome": "Escola C", "missoes": []})
+    journal.append(diff_records(data, novo))
+    # Queda no meio de um append: última linha pela metade
+    with open(journal.log_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "patch", "id": "a", "cam')
+
+    assert _estado(Journal(journal.snapshot_path)) == novo
+
+
+def test_replay_apos_queda_durante_compactacao(tmp_path):
+    journal = Journal(str(tmp_path / "dados.json"))
+    data = _base()
+    journal.write_snapshot(_doc(data))
+    meio = json.loads(json.dumps(data))
+    meio[0]["nome"] = "Escola A2"
+    journal.append(diff_records(data, meio))
+    # Queda depois de congelar o diário, antes do snapshot novo
+    os.replace(journal.log_path, journal.compacting_path)
+    fim = json.loads(json.dumps(meio))
+    fim[1]["nome"] = "Escola B2"
+    journal.append(diff_records(meio, fim))
+
+    reaberto = Journal(journal.snapshot_path)
+    assert _estado(reaberto) == fim
+    assert reaberto.compact_async(_doc(fim))
+    reaberto._thread.join()
+    assert not os.path.exists(reaberto.compacting_path)
+    assert not os.path.exists(reaberto.log_path)
+    assert _estado(reaberto) == fim
+
+
+def test_replay_durante_compactacao(tmp_path, monkeypatch):
+    journal = Journal(str(tmp_path / "dados.json"))
+    data = _base()
+    journal.write_snapshot(_doc(data))
+    meio = json.loads(json.dumps(data))
+    meio[0]["nome"] = "Escola A2"
+    journal.append(diff_records(data, meio))
+
+    gravando = threading.Event()
+    liberar = threading.Event()
+    write_tmp = journal._write_tmp
+
+    def _write_tmp_lento(document):
+        gravando.set()
+        liberar.wait(5)
+        return write_tmp(document)
+
+    monkeypatch.setattr(journal, "_write_tmp", _write_tmp_lento)
+    assert journal.compact_async(_doc(meio))
+    assert gravando.wait(5)
+
+    # Enquanto a compactação roda: novas operações e leitura de outro processo
+    fim = json.loads(json.dumps(meio))
+    fim[1]["missoes"][0]["status"] = "Concluída"
+    journal.append(diff_records(meio, fim))
+    assert _estado(Journal(journal.snapshot_path)) == fim
+    assert not journal.compact_async(_doc(fim))
+
+    liberar.set()
+    journal._thread.join(5)
+    assert not os.path.exists(journal.compacting_path)
+    assert _estado(journal) == fim
+
+
+def test_compactacao_nao_sobrescreve_snapshot_sincrono(tmp_path, monkeypatch):
+    journal = Journal(str(tmp_path / "dados.json"))
+    data = _base()
+    journal.write_snapshot(_doc(data))
+    journal.append(diff_records(data, data[:1]))
+
+    gravando = threading.Event()
+    liberar = threading.Event()
+    write_tmp = journal._write_tmp
+
+    def _write_tmp_lento(document):
+        if threading.current_thread().name == "journal-compaction":
+            gravando.set()
+            liberar.wait(5)
+        return write_tmp(document)
+
+    monkeypatch.setattr(journal, "_write_tmp", _write_tmp_lento)
+    assert journal.compact_async(_doc(data[:1]))
+    assert gravando.wait(5)
+    novo = [{"id": "z", "nome": "Escola Z", "missoes": []}]
+    journal.write_snapshot(_doc(novo))
+
+    liberar.set()
+    journal._thread.join(5)
+    assert _estado(journal) == novo
+    assert not [nome for nome in os.listdir(tmp_path) if nome.endswith(".tmp")]
+
+
+def test_diff_record_bate_com_diff_records():
+    data = _base()
+    novo = json.loads(json.dumps(data))
+    novo[1]["nome"] = "Escola B2"
+    novo[1]["missoes"].append({"id": "m2", "status": "Pendente"})
+    assert diff_record(data[1], novo[1]) == diff_records(data, novo)
+    assert diff_record(None, novo[0]) == [{"op": "upsert", "id": "a", "registro": novo[0]}]
+    assert diff_record(data[0], None) == [{"op": "delete", "id": "a"}]
+    assert diff_record(data[0], data[0]) == []
+
+
+def test_save_com_changed_nao_compara_a_lista_inteira(tmp_path, monkeypatch):
+    journal_storage = JournalStorage(str(tmp_path / "dados.json"), 1)
+    data = _base()
+    journal_storage.save(data)
+
+    def _diff_lista(old, new):
+        raise AssertionError("diff_records na edição de um registro")
+
+    monkeypatch.setattr(storage, "diff_records", _diff_lista)
+    editado = dict(data[0], nome="Escola A2")
+    novo = [editado, data[1]]
+    journal_storage.save(novo, previous=data, changed=[(data[0], editado)])
+
+    assert JournalStorage(journal_storage.journal.snapshot_path, 1).load() == (novo, 1)
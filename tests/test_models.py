@@ -0,0 +1,26 @@
+import json
+
+import models
+from benchmarks.gerador import gerar
+
+
+def test_loads_dumps_preserva_o_documento_inteiro():
+    registros = gerar(50, seed=3)
+    registros[0]["campo_novo"] = {"x": 1}
+    registros[1]["etapas"]["Etapa extra"] = True
+    documento = {
+        "schema_version": 3,
+        "agregados": {"meta": 20, "status": {"Pendente": 50}},
+        "outra_chave": [1, 2],
+        "estabelecimentos": registros,
+    }
+
+    estabelecimentos, versao, meta = models.loads(json.dumps(documento))
+    assert versao == 3
+    assert meta == {"agregados": documento["agregados"], "outra_chave": [1, 2]}
+    assert json.loads(models.dumps(estabelecimentos, versao, meta)) == json.loads(json.dumps(documento))
+
+
+def test_loads_lista_antiga():
+    estabelecimentos, versao, meta = models.loads(json.dumps([{"id": "a", "local": "A"}]))
+    assert (len(estabelecimentos), versao, meta) == (1, 0, {})
@@ -0,0 +1,205 @@
+import json
+
+import pytest
+
+import storage
+
+from benchmarks.fake_github import FakeGithubServer
+from github_client import GithubClient
+from storage import (
+    GithubStorage,
+    GithubSyncWorker,
+    ShardedGithubStorage,
+    SqliteStorage,
+    _record_hashes,
+    merge_documents,
+    to_document,
+)
+
+
+def _doc(*registros: dict) -> dict:
+    return to_document([dict(r) for r in registros], 3)
+
+
+@pytest.fixture
+def github():
+    with FakeGithubServer() as server:
+        client = GithubClient("teste", base_url=server.url)
+        try:
+            yield server, GithubStorage(client, "teste/pedegenda")
+        finally:
+            client.close()
+
+
+def test_merge_documents_por_id():
+    base = _doc({"id": "a", "v": 1}, {"id": "b", "v": 1}, {"id": "c", "v": 1}, {"id": "d", "v": 1})
+    local = _doc({"id": "a", "v": 2}, {"id": "b", "v": 1}, {"id": "c", "v": 2}, {"id": "n", "v": 1})
+    remoto = _doc({"id": "a", "v": 1}, {"id": "b", "v": 3}, {"id": "c", "v": 3}, {"id": "d", "v": 1})
+
+    merged, conflitos = merge_documents(_record_hashes(base), local, remoto)
+
+    por_id = {item["id"]: item["v"] for item in merged["estabelecimentos"]}
+    # a: só local; b: só remoto; c: os dois (fica o local); d: removido aqui; n: novo aqui
+    assert por_id == {"a": 2, "b": 3, "c": 2, "n": 1}
+    assert conflitos == {"c"}
+
+
+def test_conflito_no_envio_junta_e_reenvia_sem_perder_edicao_local(github):
+    server, gh = github
+    base = _doc({"id": "a", "nome": "A"}, {"id": "b", "nome": "B"})
+    server.seed_file("dados.json", json.dumps(base).encode("utf-8"))
+
+    worker = GithubSyncWorker(gh, interval=3600)
+    snap = gh.load()
+    worker.set_remote(snap.sha, snap.data)
+
+    # Outra pessoa grava antes de nós
+    outro = _doc({"id": "a", "nome": "A"}, {"id": "b", "nome": "B de lá"})
+    gh.save(outro, snap.sha, "outro")
+
+    worker.submit(_doc({"id": "a", "nome": "A daqui"}, {"id": "b", "nome": "B"}))
+    worker.flush()
+    assert worker.busy  # continua na fila, com o GitHub relido
+    assert "409" in worker.status()["erro"]
+    worker.flush()
+
+    assert not worker.busy
+    assert worker.needs_reload
+    assert worker.status()["erro"] is None
+    remoto = {item["id"]: item["nome"] for item in gh.load().data["estabelecimentos"]}
+    assert remoto == {"a": "A daqui", "b": "B de lá"}
+
+    # Novo save antes do app reler: continua juntando com o que está lá
+    worker.submit(_doc({"id": "a", "nome": "A daqui 2"}, {"id": "b", "nome": "B"}))
+    worker.flush()
+    remoto = {item["id"]: item["nome"] for item in gh.load().data["estabelecimentos"]}
+    assert remoto == {"a": "A daqui 2", "b": "B de lá"}
+
+
+def test_conflito_no_mesmo_registro_fica_o_local_e_avisa(github):
+    server, gh = github
+    server.seed_file("dados.json", json.dumps(_doc({"id": "a", "nome": "A"})).encode("utf-8"))
+    worker = GithubSyncWorker(gh, interval=3600)
+    snap = gh.load()
+    worker.set_remote(snap.sha, snap.data)
+    gh.save(_doc({"id": "a", "nome": "A de lá"}), snap.sha, "outro")
+
+    worker.submit(_doc({"id": "a", "nome": "A daqui"}))
+    worker.flush()
+    worker.flush()
+
+    assert worker.status()["conflitos"] == ["a"]
+    assert gh.load().data["estabelecimentos"] == [{"id": "a", "nome": "A daqui"}]
+
+
+def test_envio_sem_conflito_nao_calcula_hashes_e_o_enviado_vira_base(github, monkeypatch):
+    server, gh = github
+    server.seed_file("dados.json", json.dumps(_doc({"id": "a", "nome": "A"}, {"id": "b", "nome": "B"})).encode("utf-8"))
+    worker = GithubSyncWorker(gh, interval=3600)
+    snap = gh.load()
+    worker.set_remote(snap.sha, snap.data)
+
+    calculados = []
+    record_hashes = storage._record_hashes
+    monkeypatch.setattr(storage, "_record_hashes", lambda doc: calculados.append(doc) or record_hashes(doc))
+    for nome in ("A1", "A2"):
+        worker.submit(_doc({"id": "a", "nome": nome}, {"id": "b", "nome": "B"}))
+        worker.flush()
+    assert calculados == []
+
+    # Conflito depois: a base do merge é o último documento enviado
+    gh.save(_doc({"id": "a", "nome": "A2"}, {"id": "b", "nome": "B de lá"}), worker.sha, "outro")
+    worker.submit(_doc({"id": "a", "nome": "A3"}, {"id": "b", "nome": "B"}))
+    worker.flush()
+    worker.flush()
+    remoto = {item["id"]: item["nome"] for item in gh.load().data["estabelecimentos"]}
+    assert remoto == {"a": "A3", "b": "B de lá"}
+    assert worker.status()["conflitos"] == []
+
+
+def test_cache_do_cliente_guarda_so_o_que_e_relido(github):
+    server, gh = github
+    for nome in ("dados.json", "a.json", "b.json", "c.json"):
+        server.seed_file(nome, json.dumps(_doc({"id": "a"})).encode("utf-8"))
+    client = gh.client
+    client.cache_size = 2
+    contents = "/repos/teste/pedegenda/contents/"
+
+    assert gh.load() is not None
+    assert gh.load(known_sha="x").data is not None  # 304: corpo do cache
+    client.request("GET", contents + "a.json", cache=False)
+    assert list(client._validators) == [contents + "dados.json?ref=main"]
+
+    # LRU: o arquivo de dados, relido por último, fica; o mais antigo sai
+    client.request("GET", contents + "b.json")
+    assert gh.load(known_sha="x").data is not None
+    client.request("GET", contents + "c.json")
+    assert list(client._validators) == [contents + "dados.json?ref=main", contents + "c.json"]
+
+
+def test_sharded_save_nao_lista_o_diretorio(github):
+    server, gh = github
+    sharded = ShardedGithubStorage(gh.client, "teste/pedegenda")
+    registros = [{"id": f"e{i:03d}", "nome": f"E{i}"} for i in range(25)]
+    sha = sharded.save(to_document(registros, 3), None, "inicial")
+    assert sharded.load(known_sha=sha).data is None  # sha do POST = sha da listagem
+
+    chamadas = []
+    request = gh.client.request
+
+    def _request(method, path, *args, **kwargs):
+        chamadas.append((method, path))
+        return request(method, path, *args, **kwargs)
+
+    gh.client.request = _request
+    registros[7] = {"id": "e007", "nome": "E7 novo"}
+    sha = sharded.save(to_document(registros, 3), sha, "um")
+    assert not [p for m, p in chamadas if "/git/trees/" in p or "/contents/" in p]
+
+    # Outra pessoa altera outro estabelecimento: confere só o arquivo enviado
+    outro = ShardedGithubStorage(gh.client, "teste/pedegenda")
+    remoto = outro.load().data
+    remoto["estabelecimentos"][1]["nome"] = "E1 de lá"
+    outro.save(remoto, None, "outro")
+    chamadas.clear()
+    registros[3] = {"id": "e003", "nome": "E3 novo"}
+    sharded.save(to_document(registros, 3), sha, "dois")
+    assert [p for m, p in chamadas if m == "GET" and "/git/trees/" in p] == []
+    conferidos = [p for m, p in chamadas if "/contents/" in p]
+    assert len(conferidos) == 1 and "/contents/dados/e003.json?ref=" in conferidos[0]
+    nomes = {r["id"]: r["nome"] for r in sharded.load().data["estabelecimentos"]}
+    assert (nomes["e001"], nomes["e003"], nomes["e007"]) == ("E1 de lá", "E3 novo", "E7 novo")
+
+    # O mesmo estabelecimento dos dois lados: conflito
+    remoto = outro.load().data
+    remoto["estabelecimentos"][5]["nome"] = "E5 de lá"
+    outro.save(remoto, None, "outro")
+    registros[5] = {"id": "e005", "nome": "E5 daqui"}
+    with pytest.raises(RuntimeError, match="409"):
+        sharded.save(to_document(registros, 3), None, "tres")
+
+
+def test_sqlite_edicao_com_changed_so_mexe_no_registro(tmp_path, monkeypatch):
+    sqlite = SqliteStorage(str(tmp_path / "dados.sqlite3"), 3)
+    data = [
+        {"id": "a", "local": "A", "etapas": {"Captação": False}, "missoes": []},
+        {"id": "b", "local": "B", "etapas": {}, "missoes": [{"id": "m1", "titulo": "Visita"}]},
+    ]
+    sqlite.save(data)
+
+    def _diff_lista(old, new):
+        raise AssertionError("diff_records na edição de um registro")
+
+    monkeypatch.setattr(storage, "diff_records", _diff_lista)
+    a = dict(data[0], local="A2", etapas={"Captação": True})
+    b = dict(data[1], missoes=[{"id": "m1", "titulo": "Visita 2"}])
+    novo = [a, b]
+    sqlite.save(novo, previous=data, changed=[(data[0], a), (data[1], b)])
+    sqlite.save([a], previous=novo, changed=[(b, None)])
+
+    carregados, versao = sqlite.load()
+    assert versao == 3
+    assert [(r["id"], r["local"], r["etapas"], r["missoes"]) for r in carregados] == [
+        ("a", "A2", {"Captação": True}, [])
+    ]
+    sqlite.close()